@@ -0,0 +1 @@
+'''Benchmarks for prox_imager.'''
@@ -0,0 +1,108 @@
+'''Compares image records kept as dicts with the columnar ImageCatalog.
+
+Usage: python benchmarks/bench_image_model.py [--records N] [--queries N]
+
+Builds N records shaped like extract_image_data output (decoded from JSON,
+so no strings are shared up front), then reports the memory each form holds
+(tracemalloc) and the time of release/arch queries, listing every match and
+picking the newest build: a scan over the dicts against the catalog indexes.
+'''
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from prox_imager.image_model import ImageCatalog  # noqa: E402  pylint: disable=wrong-import-position
+
+RELEASES = [("focal", "20.04"), ("jammy", "22.04"), ("noble", "24.04"), ("oracular", "24.10"), ("plucky", "25.04")]
+ARCHES = ["amd64", "arm64", "armhf", "ppc64el", "s390x", "riscv64"]
+
+
+def make_document(count: int) -> str:
+    '''Returns a JSON document with count image records.'''
+    images = {}
+    for i in range(count):
+        release, version = RELEASES[i % len(RELEASES)]
+        arch = ARCHES[(i // len(RELEASES)) % len(ARCHES)]
+        build_date = f"2025{1 + i % 12:02d}{1 + i % 28:02d}"
+        images[f"com.ubuntu.cloud:server:{version}:{arch}:{i}"] = {
+            "release": release, "version": version, "build_date": build_date,
+            "image_url": f"https://cloud-images.ubuntu.com/server/releases/{release}/release-{build_date}/"
+                         f"ubuntu-{version}-server-cloudimg-{arch}.img",
+            "sha256": f"{i:064x}",
+        }
+    return json.dumps(images)
+
+
+def measure(build) -> tuple:
+    '''Returns what build() returns and the bytes it keeps allocated.'''
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def time_queries(query, queries: int) -> float:
+    '''Returns the seconds per query, cycling through every release and arch.'''
+    start = time.perf_counter()
+    for i in range(queries):
+        release, _ = RELEASES[i % len(RELEASES)]
+        query(release, ARCHES[i % len(ARCHES)])
+    return (time.perf_counter() - start) / queries
+
+
+def main() -> None:
+    '''Builds both forms and prints their memory and query times as JSON.'''
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    document = make_document(args.records)
+    images, dict_bytes = measure(lambda: json.loads(document))
+    catalog, catalog_bytes = measure(lambda: ImageCatalog(json.loads(document)))
+
+    def scan(release, arch):
+        return [key for key, image in images.items()
+                if image["release"] == release and key.split(":")[3] == arch]
+
+    def scan_latest(release, arch):
+        return max(scan(release, arch), key=lambda key: images[key]["build_date"])
+
+    def lookup(release, arch):
+        return [record.key for record in catalog.select(release, arch)]
+
+    def lookup_latest(release, arch):
+        return catalog.latest(release, arch).key
+
+    assert scan("jammy", "arm64") == lookup("jammy", "arm64")
+    assert images[scan_latest("jammy", "arm64")] == catalog[lookup_latest("jammy", "arm64")]
+    dict_query = time_queries(scan, args.queries)
+    catalog_query = time_queries(lookup, args.queries)
+    dict_latest = time_queries(scan_latest, args.queries)
+    catalog_latest = time_queries(lookup_latest, args.queries)
+    print(json.dumps({
+        "records": args.records,
+        "dict_mib": round(dict_bytes / 2 ** 20, 1),
+        "catalog_mib": round(catalog_bytes / 2 ** 20, 1),
+        "memory_ratio": round(dict_bytes / catalog_bytes, 2),
+        "dict_query_ms": round(dict_query * 1000, 3),
+        "catalog_query_ms": round(catalog_query * 1000, 3),
+        "query_speedup": round(dict_query / catalog_query, 1),
+        "dict_latest_ms": round(dict_latest * 1000, 3),
+        "catalog_latest_ms": round(catalog_latest * 1000, 3),
+        "latest_speedup": round(dict_latest / catalog_latest, 1),
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+'''Times and memory-profiles the metadata stages on synthetic simplestreams documents.
+
+Usage: python benchmarks/bench_metadata.py [--products N] [--versions N] [--items N]
+                                           [--repeat N] [--output FILE] [--compare FILE]
+
+The document is served from a local HTTP server. fetch_ubuntu_metadata,
+extract_image_data and save_metadata are measured separately and end to end;
+wall time is taken as the min and median of --repeat runs and memory as the
+tracemalloc peak of one extra run. Results are written as JSON, and --compare
+reports stages that got slower than --threshold times a previous result file.
+'''
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# pylint: disable=wrong-import-position
+from benchmarks.server import LocalServer  # noqa: E402
+from benchmarks.simplestreams import generate_document  # noqa: E402
+from prox_imager.fetch_ubuntu_images import (  # noqa: E402
+    extract_image_data,
+    fetch_ubuntu_metadata,
+    save_metadata,
+)
+
+
+def measure(stage: str, func, repeat: int) -> dict:
+    '''Runs func repeat times for timing and once more under tracemalloc.'''
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "stage": stage,
+        "seconds_min": round(min(timings), 6),
+        "seconds_median": round(statistics.median(timings), 6),
+        "peak_bytes": peak,
+    }
+
+
+def git_commit() -> str:
+    '''Returns the current commit of the repository, if available.'''
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args: argparse.Namespace) -> dict:
+    '''Generates and serves the document, then measures every stage.'''
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "download.json"), "w", encoding="utf-8") as f:
+            json.dump(generate_document(args.products, args.versions, args.items), f)
+        document_bytes = os.path.getsize(os.path.join(tmp, "download.json"))
+        output_file = os.path.join(tmp, "images.json")
+        base_url = "https://cloud-images.example.com"
+
+        with LocalServer(tmp) as server:
+            url = server.url + "/download.json"
+            metadata = fetch_ubuntu_metadata(url)
+            images = extract_image_data(metadata, base_url)
+
+            def end_to_end():
+                save_metadata(extract_image_data(fetch_ubuntu_metadata(url), base_url), output_file)
+
+            results = [
+                measure("fetch_ubuntu_metadata", lambda: fetch_ubuntu_metadata(url), args.repeat),
+                measure("extract_image_data", lambda: extract_image_data(metadata, base_url), args.repeat),
+                measure("save_metadata", lambda: save_metadata(images, output_file), args.repeat),
+                measure("end_to_end", end_to_end, args.repeat),
+            ]
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": int(time.time()),
+            "products": args.products,
+            "versions": args.versions,
+            "items": args.items,
+            "repeat": args.repeat,
+            "document_bytes": document_bytes,
+            "images": len(images),
+        },
+        "results": results,
+    }
+
+
+def compare(report: dict, baseline_file: str, threshold: float) -> list:
+    '''Returns the stages whose best time exceeds threshold times the baseline.'''
+    with open(baseline_file, "r", encoding="utf-8") as f:
+        baseline = {r["stage"]: r for r in json.load(f)["results"]}
+    regressions = []
+    for result in report["results"]:
+        old = baseline.get(result["stage"])
+        if old is None or not old["seconds_min"]:
+            continue
+        ratio = result["seconds_min"] / old["seconds_min"]
+        result["ratio_to_baseline"] = round(ratio, 3)
+        if ratio > threshold:
+            regressions.append(result["stage"])
+    return regressions
+
+
+def main() -> int:
+    '''Parses arguments, runs the benchmark and writes the JSON report.'''
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--versions", type=int, default=30)
+    parser.add_argument("--items", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout.")
+    parser.add_argument("--compare", help="Previous JSON report to compare against.")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args()
+
+    report = run(args)
+    regressions = compare(report, args.compare, args.threshold) if args.compare else []
+    report["regressions"] = regressions
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+'''Measures the startup cost of the CLI and enforces a budget.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--budget-ms MS] [--top N]
+
+Imports prox_imager.fetch_ubuntu_images in fresh interpreters under
+``-X importtime`` and reports the median cumulative import time, the modules
+that take the most time themselves, and the wall time of ``--help``. The run
+exits with status 1 when the median import time exceeds the budget or when a
+dependency that is meant to be loaded lazily (requests, toml, sqlite3, ...)
+is imported at startup.
+'''
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULE = "prox_imager.fetch_ubuntu_images"
+LAZY_MODULES = ("requests", "urllib3", "toml", "sqlite3", "http.server", "multiprocessing", "cProfile",
+                "icecream", "zstandard")
+
+
+def import_times() -> dict:
+    '''Imports MODULE in a fresh interpreter and returns {module: (self us, cumulative us)}.'''
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {MODULE}"],
+                            cwd=ROOT, check=True, capture_output=True, text=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit():
+            times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def loaded_modules() -> list:
+    '''Returns the LAZY_MODULES present after importing MODULE.'''
+    code = f"import json, sys, {MODULE}; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True)
+    modules = set(json.loads(result.stdout))
+    return [name for name in LAZY_MODULES if name in modules]
+
+
+def help_seconds() -> float:
+    '''Returns the wall time of running the CLI with --help.'''
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-m", MODULE, "--help"], cwd=ROOT, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    '''Runs the measurements and exits with status 1 when the budget is exceeded.'''
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=120.0,
+                        help="Maximum median cumulative import time of the CLI module.")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest modules to list.")
+    args = parser.parse_args()
+
+    runs = [import_times() for _ in range(args.runs)]
+    import_ms = statistics.median(run[MODULE][1] for run in runs) / 1000
+    self_ms = {}
+    for run in runs:
+        for name, (self_us, _) in run.items():
+            self_ms.setdefault(name, []).append(self_us / 1000)
+    slowest = sorted(((statistics.median(values), name) for name, values in self_ms.items()), reverse=True)
+    eager = loaded_modules()
+    report = {
+        "import_ms": round(import_ms, 1),
+        "budget_ms": args.budget_ms,
+        "help_ms": round(statistics.median(help_seconds() for _ in range(args.runs)) * 1000, 1),
+        "slowest_modules_ms": {name: round(ms, 2) for ms, name in slowest[:args.top]},
+        "eager_lazy_modules": eager,
+        "ok": import_ms <= args.budget_ms and not eager,
+    }
+    print(json.dumps(report, indent=2))
+    if not report["ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
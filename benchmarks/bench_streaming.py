@@ -0,0 +1,71 @@
+'''Compares peak RSS and wall time of the streaming and dict-based metadata paths.
+
+Usage: python benchmarks/bench_streaming.py [--products N] [--versions N] [--items N]
+
+A synthetic simplestreams document is served from a local HTTP server and
+each mode is run in a fresh interpreter so that peak RSS is not shared.
+'''
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# pylint: disable=wrong-import-position
+from benchmarks.server import LocalServer  # noqa: E402
+from benchmarks.simplestreams import generate_document  # noqa: E402
+
+
+def run_child(mode: str, url: str) -> None:
+    '''Runs one extraction mode and prints its measurements as JSON.'''
+    from prox_imager import fetch_ubuntu_images as fui  # pylint: disable=import-outside-toplevel
+
+    start = time.perf_counter()
+    if mode == "stream":
+        images = fui.fetch_image_data_streaming(url, "http://base")
+    else:
+        images = fui.extract_image_data(fui.fetch_ubuntu_metadata(url), "http://base")
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        "mode": mode,
+        "seconds": round(elapsed, 4),
+        "peak_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "images": len(images),
+    }))
+
+
+def main() -> None:
+    '''Generates the document, serves it and runs both modes.'''
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=400)
+    parser.add_argument("--versions", type=int, default=60)
+    parser.add_argument("--items", type=int, default=4)
+    parser.add_argument("--child", choices=["dict", "stream"], help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.child, args.url)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "download.json"), "w", encoding="utf-8") as f:
+            json.dump(generate_document(args.products, args.versions, args.items), f)
+        size = os.path.getsize(os.path.join(tmp, "download.json"))
+        with LocalServer(tmp) as server:
+            url = server.url + "/download.json"
+            for mode in ("dict", "stream"):
+                out = subprocess.run([sys.executable, __file__, "--child", mode, "--url", url],
+                                     check=True, capture_output=True, text=True).stdout
+                result = json.loads(out)
+                result["document_bytes"] = size
+                print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
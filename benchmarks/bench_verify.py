@@ -0,0 +1,93 @@
+'''Compares cold and warm verification of a directory of synthetic images.
+
+Usage: python benchmarks/bench_verify.py [--files N] [--size-mb N] [--dir PATH]
+
+The cold run starts with an empty hash cache and hashes every file in a
+process pool; the warm run reuses the cache and should not read any file.
+Pass --drop-caches (as root) to also evict the page cache before the cold run.
+'''
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from prox_imager.verify import HashCache, verify_files  # noqa: E402  pylint: disable=wrong-import-position
+
+BLOCK = 1024 * 1024
+
+
+def make_files(directory: str, count: int, size_mb: int) -> dict:
+    '''Writes count files of size_mb MiB and returns their expected digests.'''
+    expected = {}
+    for i in range(count):
+        path = os.path.join(directory, f"image{i}.img")
+        block = os.urandom(BLOCK)
+        hasher = hashlib.sha256()
+        with open(path, "wb") as f:
+            for _ in range(size_mb):
+                f.write(block)
+                hasher.update(block)
+        expected[path] = hasher.hexdigest()
+    return expected
+
+
+def drop_caches() -> bool:
+    '''Asks the kernel to drop the page cache; needs root.'''
+    try:
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w", encoding="ascii") as f:
+            f.write("3\n")
+        return True
+    except OSError:
+        return False
+
+
+def timed(label: str, expected: dict, cache: HashCache, workers: int) -> dict:
+    '''Runs verify_files once and returns its measurements.'''
+    start = time.perf_counter()
+    results = verify_files(expected, cache, workers)
+    elapsed = time.perf_counter() - start
+    total_bytes = sum(os.path.getsize(p) for p in expected)
+    return {
+        "run": label,
+        "files": len(expected),
+        "bytes": total_bytes,
+        "seconds": round(elapsed, 4),
+        "mib_per_s": round(total_bytes / BLOCK / elapsed, 1) if elapsed else None,
+        "all_ok": all(results.values()),
+    }
+
+
+def main() -> None:
+    '''Creates the files and runs the cold and warm verification.'''
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--size-mb", type=int, default=2048)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--dir", default=None, help="Directory for the synthetic files (default: a temp dir).")
+    parser.add_argument("--drop-caches", action="store_true")
+    args = parser.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp(prefix="bench_verify_")
+    os.makedirs(directory, exist_ok=True)
+    try:
+        expected = make_files(directory, args.files, args.size_mb)
+        cache_file = os.path.join(directory, "hashes.json")
+        if args.drop_caches and not drop_caches():
+            print(json.dumps({"warning": "could not drop page cache"}))
+        print(json.dumps(timed("cold", expected, HashCache(cache_file), args.workers)))
+        print(json.dumps(timed("warm", expected, HashCache(cache_file), args.workers)))
+    finally:
+        if args.dir is None:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
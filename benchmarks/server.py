@@ -0,0 +1,31 @@
+'''Local HTTP server serving benchmark fixtures from a directory.'''
+import functools
+import http.server
+import threading
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    '''Static file handler that does not log every request.'''
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+class LocalServer:
+    '''Serves a directory over HTTP on a free localhost port while in use as a context manager.'''
+
+    def __init__(self, directory: str):
+        handler = functools.partial(QuietHandler, directory=directory)
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,60 @@
+'''Generates synthetic simplestreams documents of configurable size.'''
+import hashlib
+
+ITEM_NAMES = ("disk1.img", "root.tar.xz", "lxd.tar.xz", "squashfs", "manifest",
+              "vmlinuz", "initrd", "disk-kvm.img", "uefi1.img", "qcow2")
+ARCHES = ("amd64", "arm64", "ppc64el", "s390x")
+
+
+def build_name(index: int) -> str:
+    '''Returns a serial like 20250314 or 20250314.1 for the index-th build.'''
+    day = index // 2
+    serial = f"2025{day // 28 % 12 + 1:02d}{day % 28 + 1:02d}"
+    return serial if index % 2 == 0 else serial + ".1"
+
+
+def generate_document(products: int, versions: int, items: int = 4,
+                      base_path: str = "server/releases") -> dict:
+    '''Builds a products:1.0 document with products x versions x items entries.
+
+    Products cycle through ARCHES, so only every len(ARCHES)-th product is
+    amd64, like the real multi-arch streams.
+    '''
+    item_names = ITEM_NAMES[:max(1, min(items, len(ITEM_NAMES)))]
+    document = {
+        "content_id": "com.example.bench:released:download",
+        "datatype": "image-downloads",
+        "format": "products:1.0",
+        "updated": "Fri, 14 Mar 2025 00:00:00 +0000",
+        "products": {},
+    }
+    for p in range(products):
+        arch = ARCHES[p % len(ARCHES)]
+        release = f"rel{p // len(ARCHES)}"
+        builds = {}
+        for v in range(versions):
+            build = build_name(v)
+            builds[build] = {
+                "label": "release",
+                "pubname": f"{release}-{build}-{arch}",
+                "items": {
+                    name: {
+                        "ftype": name.rsplit(".", 1)[-1],
+                        "path": f"/{base_path}/{release}/release-{build}/{release}-{arch}-{name}",
+                        "sha256": hashlib.sha256(f"{p}/{build}/{name}".encode()).hexdigest(),
+                        "md5": hashlib.md5(f"{p}/{build}/{name}".encode()).hexdigest(),  # nosec
+                        "size": 600000000 + v,
+                    }
+                    for name in item_names
+                },
+            }
+        document["products"][f"com.example.bench:server:{p // len(ARCHES)}.04:{arch}"] = {
+            "aliases": f"{release},{p // len(ARCHES)}.04",
+            "arch": arch,
+            "os": "ubuntu",
+            "release": release,
+            "release_title": f"{p // len(ARCHES)}.04 LTS",
+            "version": f"{p // len(ARCHES)}.04",
+            "versions": builds,
+        }
+    return document
@@ -0,0 +1,141 @@
+'''SQLite catalog keeping every image build seen across runs.
+
+extract_image_data only keeps the newest build of each product. The catalog
+records all builds of every fetched stream, indexed by product, release,
+arch and build date, so older builds can be looked up without network
+access, e.g. to roll a template back.
+'''
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = "~/.cache/prox_imager/catalog.sqlite"
+DEFAULT_ITEM_TYPES = ("disk1.img",)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    product TEXT NOT NULL,
+    release TEXT NOT NULL,
+    version TEXT NOT NULL,
+    arch TEXT NOT NULL,
+    build_date TEXT NOT NULL,
+    item TEXT NOT NULL,
+    image_url TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    source TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    PRIMARY KEY (product, build_date, item)
+);
+CREATE INDEX IF NOT EXISTS builds_release ON builds (release, arch, build_date);
+CREATE INDEX IF NOT EXISTS builds_version ON builds (version, arch, build_date);
+CREATE INDEX IF NOT EXISTS builds_build_date ON builds (build_date);
+"""
+_COLUMNS = ("product", "release", "version", "arch", "build_date", "item", "image_url", "sha256", "source")
+
+
+def _row_to_image(row: tuple) -> dict:
+    """Turns a builds row into an image record shaped like extract_image_data output."""
+    record = dict(zip(_COLUMNS, row))
+    return {
+        "product": record["product"],
+        "release": record["release"],
+        "version": record["version"],
+        "arch": record["arch"],
+        "build_date": record["build_date"],
+        "image_url": record["image_url"],
+        "sha256": record["sha256"],
+    }
+
+
+class BuildCatalog:
+    """Persistent, indexed history of image builds."""
+
+    def __init__(self, path: str = DEFAULT_CATALOG_PATH, item_types: tuple = DEFAULT_ITEM_TYPES):
+        self.path = os.path.expanduser(path)
+        self.item_types = tuple(item_types)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        import sqlite3  # pylint: disable=import-outside-toplevel
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """Closes the catalog database."""
+        self._db.close()
+
+    def _product_rows(self, product: str, details: dict, base_url: str, source: str, now: float) -> list:
+        rows = []
+        for build_date, build in details.get("versions", {}).items():
+            items = build.get("items", {})
+            for item in self.item_types:
+                data = items.get(item)
+                if not data:
+                    continue
+                rows.append((product, details.get("release", "unknown"), details.get("version", "unknown"),
+                             details.get("arch", "unknown"), build_date, item,
+                             base_url + data.get("path", ""), data.get("sha256", "unknown"), source, now))
+        return rows
+
+    def record_product(self, product: str, details: dict, base_url: str, source: str = "") -> int:
+        """Records every build of one product; returns the number of new builds."""
+        return self._insert(self._product_rows(product, details, base_url, source, time.time()))
+
+    def record_metadata(self, metadata: dict, base_url: str, source: str = "") -> int:
+        """Records every build of every product of a fetched document; returns the number of new builds."""
+        now = time.time()
+        rows = []
+        for product, details in metadata.get("products", {}).items():
+            rows.extend(self._product_rows(product, details, base_url, source, now))
+        added = self._insert(rows)
+        log.info("✅ Recorded %s new builds in the catalog", added)
+        return added
+
+    def _insert(self, rows: list) -> int:
+        with self._lock, self._db:
+            before = self._db.total_changes
+            self._db.executemany(
+                f"INSERT OR IGNORE INTO builds ({', '.join(_COLUMNS)}, first_seen) "
+                f"VALUES ({', '.join('?' * (len(_COLUMNS) + 1))})", rows)
+            return self._db.total_changes - before
+
+    def _query_one(self, where: str, params: tuple) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM builds WHERE {where} "
+                "ORDER BY build_date DESC LIMIT 1", params).fetchone()
+        return _row_to_image(row) if row is not None else None
+
+    def latest(self, release: str, arch: str = "amd64") -> Optional[dict]:
+        """Returns the newest build of a release, given as codename or version number."""
+        return self._query_one("(release = ? OR version = ?) AND arch = ? AND item = ?",
+                               (release, release, arch, self.item_types[0]))
+
+    def as_of(self, release: str, date: str, arch: str = "amd64") -> Optional[dict]:
+        """Returns the newest build of a release published on or before date (YYYYMMDD)."""
+        # Respins such as 20250301.1 sort after 20250301 but belong to the same day
+        return self._query_one("(release = ? OR version = ?) AND arch = ? AND item = ? AND build_date < ?",
+                               (release, release, arch, self.item_types[0], date + "~"))
+
+    def history(self, product: str) -> list:
+        """Returns every recorded build of a product, newest first."""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM builds WHERE product = ? AND item = ? "
+                "ORDER BY build_date DESC", (product, self.item_types[0])).fetchall()
+        return [_row_to_image(row) for row in rows]
+
+
+def build_catalog(config: dict) -> Optional[BuildCatalog]:
+    """Creates a BuildCatalog from the [catalog] section, or None if it is not configured."""
+    section = config.get("catalog")
+    if section is None:
+        return None
+    return BuildCatalog(section.get("path", DEFAULT_CATALOG_PATH),
+                        tuple(section.get("item_types", DEFAULT_ITEM_TYPES)))
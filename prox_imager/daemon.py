@@ -0,0 +1,303 @@
+'''Long-running mode that polls the metadata sources on an adaptive schedule.
+
+The daemon keeps the configuration, HTTP connections, metadata cache and the
+last images of every source in memory. Each source is polled on its own
+schedule: the interval grows while nothing changes and shrinks to the minimum
+around the times of day at which the source usually publishes new builds.
+The configuration is reloaded when config.toml changes or on SIGHUP, and the
+downstream steps (snapshot, change set, downloads, template builds, hook
+command) only run when new builds appear.
+'''
+import logging
+import os
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from prox_imager import fetch_ubuntu_images as fui
+from prox_imager.catalog import build_catalog
+from prox_imager.delta import changed_images, changes_path, diff_images, keep_missing, load_previous
+from prox_imager.http_client import configure
+from prox_imager.image_filter import compile_filter
+from prox_imager.image_model import ImageCatalog
+from prox_imager.metadata_cache import build_cache
+from prox_imager.metrics import METRICS, export_metrics
+from prox_imager.output import DEFAULT_OUTPUT_FORMAT, output_settings
+from prox_imager.stream_index import build_index_state
+
+
+log = logging.getLogger(__name__)
+
+DAY = 24 * 3600
+DEFAULT_DAEMON_CONFIG = {
+    "min_interval": 300,
+    "max_interval": 3600,
+    "backoff": 2.0,
+    "publish_window": 1800,
+    "history": 30,
+    "download": False,
+    "on_change_command": "",
+}
+
+
+def _schedule_settings(settings: dict) -> tuple:
+    return (settings["min_interval"], settings["max_interval"], settings["backoff"], settings["publish_window"])
+
+
+class AdaptiveSchedule:
+    """Poll interval of one source.
+
+    Every poll without changes multiplies the interval by backoff, up to
+    max_interval; a change resets it to min_interval. The times of day at
+    which changes were seen are remembered, and polls are pulled forward to
+    min_interval while inside publish_window of one of them.
+    """
+
+    def __init__(self, min_interval: float, max_interval: float, backoff: float,
+                 publish_window: float, history: int = 30):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.publish_window = publish_window
+        self.interval = min_interval
+        self.publish_times = deque(maxlen=history)
+
+    def update(self, min_interval: float, max_interval: float, backoff: float, publish_window: float) -> None:
+        """Applies new settings, keeping the current interval within the new bounds."""
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.publish_window = publish_window
+        self.interval = max(min_interval, min(max_interval, self.interval))
+
+    def record(self, changed: bool, now: float) -> None:
+        """Updates the interval after a poll that did or did not find new builds."""
+        if changed:
+            self.interval = self.min_interval
+            self.publish_times.append(now % DAY)
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+
+    def _seconds_until_window(self, now: float) -> Optional[float]:
+        """Returns 0 inside a usual publish window, else the seconds until the next one."""
+        if not self.publish_times:
+            return None
+        time_of_day = now % DAY
+        best = None
+        for publish_time in self.publish_times:
+            start = (publish_time - self.publish_window / 2) % DAY
+            offset = (time_of_day - start) % DAY
+            if offset <= self.publish_window:
+                return 0.0
+            wait = DAY - offset
+            best = wait if best is None else min(best, wait)
+        return best
+
+    def next_delay(self, now: float) -> float:
+        """Returns how long to wait before the next poll."""
+        until_window = self._seconds_until_window(now)
+        if until_window is None:
+            return self.interval
+        if until_window == 0:
+            return self.min_interval
+        return max(self.min_interval, min(self.interval, until_window))
+
+
+class Daemon:
+    """Polls all configured sources until stopped."""
+
+    def __init__(self, config_path: str, stream: bool = False, no_cache: bool = False, download: bool = False,
+                 index: bool = False, build_templates: bool = False):
+        self.config_path = config_path
+        self.stream = stream
+        self.no_cache = no_cache
+        self.download = download
+        self.index = index
+        self.build_templates = build_templates
+        self.config = {}
+        self.settings = dict(DEFAULT_DAEMON_CONFIG)
+        self.sources = []
+        self.schedules = {}
+        self.next_poll = {}
+        self.source_images = {}
+        self.snapshot = ImageCatalog()
+        self.cache = None
+        self.catalog = None
+        self.index_state = None
+        self.image_filter = None
+        self.output_format = DEFAULT_OUTPUT_FORMAT
+        self._config_mtime = None
+        self._reload = threading.Event()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def load(self) -> bool:
+        """(Re)loads the configuration; keeps the running one if the new one is invalid."""
+        try:
+            self._config_mtime = os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            self._config_mtime = None
+        config = fui.load_config(self.config_path)
+        if not config or not fui.validate_config(config):
+            log.error("❌ Keeping the previous configuration")
+            return False
+        try:
+            configure(config)
+            image_filter = compile_filter(config)
+            output_format = output_settings(config)
+        except ValueError as e:
+            log.error("❌ Invalid configuration, keeping the previous one: %s", e)
+            return False
+
+        first_load = not self.config
+        self.config = config
+        self.settings = {**DEFAULT_DAEMON_CONFIG, **config.get("daemon", {})}
+        self.image_filter = image_filter
+        self.output_format = output_format
+        self.cache = None if self.stream or self.no_cache else build_cache(config)
+        if self.catalog is not None:
+            self.catalog.close()
+        self.catalog = build_catalog(config)
+        self.index_state = build_index_state(config) if self.index else None
+        self.sources = fui.get_sources(config)
+        names = {source["name"] for source in self.sources}
+        now = time.time()
+        for name in names:
+            if name in self.schedules:
+                self.schedules[name].update(*_schedule_settings(self.settings))
+                # Do not wait out a delay computed from the old settings
+                self.next_poll[name] = min(self.next_poll.get(name, now),
+                                           now + self.schedules[name].next_delay(now))
+            else:
+                self.schedules[name] = AdaptiveSchedule(*_schedule_settings(self.settings), self.settings["history"])
+                self.next_poll[name] = now
+        for name in set(self.schedules) - names:
+            del self.schedules[name]
+            self.next_poll.pop(name, None)
+            self.source_images.pop(name, None)
+        if first_load:
+            self.snapshot = ImageCatalog(load_previous(config["files"]["output_file"]))
+        log.info("✅ Loaded configuration with %s sources", len(self.sources))
+        return True
+
+    def request_reload(self, *_args) -> None:
+        """Asks the loop to reload the configuration (SIGHUP handler)."""
+        self._reload.set()
+        self._wake.set()
+
+    def stop(self, *_args) -> None:
+        """Asks the loop to exit (SIGTERM/SIGINT handler)."""
+        self._stop.set()
+        self._wake.set()
+
+    def _config_changed(self) -> bool:
+        try:
+            return os.stat(self.config_path).st_mtime_ns != self._config_mtime
+        except OSError:
+            return False
+
+    def poll(self, source: dict, now: float) -> bool:
+        """Fetches one source; returns True if its images changed."""
+        if self.index_state is not None:
+            images = fui.fetch_sources_indexed([source], self.index_state, self.cache, 1, self.stream,
+                                               self.catalog, self.image_filter)[0][1]
+        else:
+            images = fui.fetch_source(source, self.cache, self.stream, self.catalog, self.image_filter)
+        schedule = self.schedules[source["name"]]
+        if not images:
+            log.info("⚠️ No images from %s, keeping its previous state", source["name"])
+            schedule.record(False, now)
+            return False
+        previous = self.source_images.get(source["name"])
+        changed = previous != images
+        if changed:
+            # Kept for the life of the process, so stored in the compact form
+            self.source_images[source["name"]] = ImageCatalog(images)
+        if previous is not None:  # the first poll only sets the baseline
+            schedule.record(changed, now)
+        return changed
+
+    def publish(self) -> dict:
+        """Writes the merged snapshot and change set and runs the downstream steps.
+
+        Returns the change set; nothing is written when it is empty.
+        """
+        merged = fui.merge_images([(source["name"], self.source_images.get(source["name"], {}))
+                                   for source in self.sources])
+        pending = [source["base_url"] for source in self.sources if source["name"] not in self.source_images]
+        if pending:
+            # Sources not fetched successfully since startup keep their products from the last snapshot
+            merged = keep_missing(self.snapshot, merged, pending)
+        changes = diff_images(self.snapshot, merged)
+        if not any(changes.values()):
+            return changes
+        output_file = self.config["files"]["output_file"]
+        changes_file = self.config["files"].get("changes_file", changes_path(output_file))
+        fui.save_metadata(merged, output_file, self.output_format)
+        fui.save_metadata(changes, changes_file, self.output_format)
+        self.snapshot = ImageCatalog(merged)
+        METRICS.set("images", len(merged))
+        targets = changed_images(changes)
+        if (self.download or self.settings["download"]) and targets:
+            fui.download_configured(targets, self.config)
+        if self.build_templates and targets:
+            from prox_imager.pipeline import build_templates  # pylint: disable=import-outside-toplevel
+            build_templates(targets, self.config)
+        command = self.settings["on_change_command"]
+        if command:
+            log.info("Running %s", command)
+            env = {**os.environ, "PROX_IMAGER_OUTPUT": output_file, "PROX_IMAGER_CHANGES": changes_file}
+            result = subprocess.run(command, shell=True, env=env, check=False)  # nosec - trusted config
+            if result.returncode != 0:
+                log.error("❌ %s exited with status %s", command, result.returncode)
+        return changes
+
+    def run_once(self, now: Optional[float] = None) -> float:
+        """Polls every due source, publishes changes and returns the seconds until the next poll."""
+        now = time.time() if now is None else now
+        polled = changed = False
+        for source in self.sources:
+            name = source["name"]
+            if self.next_poll.get(name, now) > now:
+                continue
+            polled = True
+            try:
+                changed = self.poll(source, now) or changed
+            except Exception as e:  # pylint: disable=broad-except
+                log.error("❌ Failed to poll source %s: %s", name, e)
+                self.schedules[name].record(False, now)
+            self.next_poll[name] = now + self.schedules[name].next_delay(now)
+        if changed:
+            try:
+                self.publish()
+            except Exception as e:  # pylint: disable=broad-except
+                log.error("❌ Failed to publish changes: %s", e)
+        if polled:
+            export_metrics(self.config)
+        if not self.next_poll:
+            return self.settings["min_interval"]
+        return max(0.0, min(self.next_poll.values()) - now)
+
+    def run(self, reload_check: float = 5.0) -> None:
+        """Runs until stop() is called, reloading the configuration when needed."""
+        if not self.config and not self.load():
+            return
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP, self.request_reload)
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+        log.info("Daemon started")
+        while not self._stop.is_set():
+            if self._reload.is_set() or self._config_changed():
+                self._reload.clear()
+                log.info("Reloading %s", self.config_path)
+                self.load()
+            delay = self.run_once()
+            self._wake.wait(min(delay, reload_check))
+            self._wake.clear()
+        if self.catalog is not None:
+            self.catalog.close()
+        log.info("Daemon stopped")
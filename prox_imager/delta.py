@@ -0,0 +1,72 @@
+'''Computes what changed between two image metadata snapshots.'''
+import logging
+import os
+from typing import Iterable, Optional
+
+from prox_imager.output import read_output
+
+
+log = logging.getLogger(__name__)
+
+
+def changes_path(output_file: str) -> str:
+    """Returns the default change set path next to a snapshot, e.g. images.changes.json."""
+    root, ext = os.path.splitext(output_file)
+    return root + ".changes" + (ext or ".json")
+
+
+def load_previous(output_file: str) -> dict:
+    """Loads the previous snapshot written by save_metadata, or {} if there is none."""
+    if not os.path.exists(output_file):
+        log.info("⚠️ No previous metadata at %s, treating every image as new", output_file)
+        return {}
+    try:
+        previous = read_output(output_file)
+    except (OSError, ValueError) as e:
+        log.error("❌ Failed to load previous metadata from %s: %s", output_file, e)
+        return {}
+    if not isinstance(previous, dict):
+        log.error("❌ Unexpected previous metadata format in %s", output_file)
+        return {}
+    return previous
+
+
+def diff_images(previous: dict, current: dict) -> dict:
+    """Compares two image maps by build_date and sha256.
+
+    Returns a change set with the added and updated records keyed by product
+    and the sorted list of removed products.
+    """
+    added = {}
+    updated = {}
+    for product, image in current.items():
+        old = previous.get(product)
+        if old is None:
+            added[product] = image
+        elif (old.get("build_date"), old.get("sha256")) != (image.get("build_date"), image.get("sha256")):
+            updated[product] = image
+    removed = sorted(product for product in previous if product not in current)
+    log.info("✅ %s added, %s updated, %s removed images", len(added), len(updated), len(removed))
+    return {"added": added, "updated": updated, "removed": removed}
+
+
+def keep_missing(previous: dict, current: dict, base_urls: Optional[Iterable[str]] = None) -> dict:
+    """Returns current plus the previous records it lacks.
+
+    Used when a source failed, so its products are not reported as removed
+    because of a transient outage. With base_urls (those of the failed
+    sources), only records whose image URL lies under one of them are kept;
+    products that a source which did answer no longer lists stay removed.
+    """
+    prefixes = None if base_urls is None else tuple(base_urls)
+    kept = {product: image for product, image in previous.items()
+            if product not in current
+            and (prefixes is None or image.get("image_url", "").startswith(prefixes))}
+    if kept:
+        log.info("⚠️ Keeping %s previous images that were not fetched", len(kept))
+    return {**current, **kept}
+
+
+def changed_images(changes: dict) -> dict:
+    """Returns the added and updated records of a change set as one image map."""
+    return {**changes.get("added", {}), **changes.get("updated", {})}
@@ -0,0 +1,243 @@
+'''Downloads cloud images with parallel HTTP Range requests and SHA-256 verification.
+
+An image is fetched as a sequence of fixed-size blocks. Up to ``segments``
+blocks are in flight at once, but they are appended to the ``.part`` file and
+fed to the hash strictly in order, so the partial file is always a contiguous
+prefix of the image and the checksum is computed while streaming. A restarted
+download resumes at the end of the ``.part`` file; only that prefix is read
+back once to restore the hash state. The finished file is moved into place
+atomically, and only if its checksum matches.
+'''
+import hashlib
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Optional, Tuple
+from urllib.parse import urlparse
+
+from prox_imager.http_client import get_client
+from prox_imager.image_store import ImageStore
+from prox_imager.output import fsync_directory
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_SEGMENTS = 4
+DEFAULT_BLOCK_SIZE = 8 * 1024 * 1024
+DEFAULT_TIMEOUT = 30
+DEFAULT_DOWNLOAD_DIR = "./images"
+PART_SUFFIX = ".part"
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def _probe(url: str, timeout: float) -> Tuple[Optional[int], bool]:
+    """Returns the size of the remote file and whether it accepts Range requests."""
+    response = get_client().head(url, timeout=timeout)
+    response.raise_for_status()
+    length = response.headers.get("Content-Length")
+    size = int(length) if length is not None and length.isdigit() else None
+    accepts_ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+    return size, accepts_ranges
+
+
+def _fetch_range(url: str, start: int, end: int, timeout: float) -> bytes:
+    """Fetches the inclusive byte range start-end of a remote file."""
+    import requests  # pylint: disable=import-outside-toplevel
+    response = get_client().get(url, timeout=timeout, headers={"Range": f"bytes={start}-{end}"})
+    response.raise_for_status()
+    if response.status_code != 206:
+        raise requests.HTTPError(f"Server ignored Range request for {url}", response=response)
+    data = response.content
+    if len(data) != end - start + 1:
+        raise requests.HTTPError(f"Short range read for {url}: got {len(data)} bytes, "
+                                 f"expected {end - start + 1}", response=response)
+    return data
+
+
+def _hash_prefix(path: str, hasher) -> int:
+    """Feeds an existing partial file into the hasher and returns its size."""
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+            size += len(chunk)
+    return size
+
+
+def _download_ranges(url: str, f, hasher, offset: int, size: int,
+                     segments: int, block_size: int, timeout: float) -> None:
+    """Downloads bytes offset..size with up to ``segments`` concurrent Range requests."""
+    blocks = ((start, min(start + block_size, size) - 1) for start in range(offset, size, block_size))
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        pending = deque(executor.submit(_fetch_range, url, start, end, timeout)
+                        for start, end in islice(blocks, 2 * segments))
+        try:
+            while pending:
+                data = pending.popleft().result()
+                f.write(data)
+                hasher.update(data)
+                for start, end in islice(blocks, 1):
+                    pending.append(executor.submit(_fetch_range, url, start, end, timeout))
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _download_stream(url: str, f, hasher, timeout: float) -> None:
+    """Downloads a whole file in a single request."""
+    with get_client().stream(url, timeout=timeout) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(READ_CHUNK_SIZE):
+            f.write(chunk)
+            hasher.update(chunk)
+
+
+def _is_verified(path: str, sha256: str, hash_cache=None) -> bool:
+    """Tells whether an existing file matches sha256, using the hash cache if given."""
+    try:
+        st = os.stat(path)
+        digest = hash_cache.get(path, st) if hash_cache is not None else None
+        if digest is None:
+            hasher = hashlib.sha256()
+            _hash_prefix(path, hasher)
+            digest = hasher.hexdigest()
+            if hash_cache is not None:
+                hash_cache.put(path, st, digest)
+    except OSError as e:
+        log.error("❌ Failed to read %s: %s", path, e)
+        return False
+    return digest == sha256.lower()
+
+
+def _remember(path: str, sha256: str, hash_cache=None) -> None:
+    """Records the digest of a file that was just downloaded and verified."""
+    if hash_cache is None:
+        return
+    try:
+        hash_cache.put(path, os.stat(path), sha256.lower())
+    except OSError:
+        pass
+
+
+def _present(dest: str, sha256: str, hash_cache=None) -> bool:
+    """Tells whether dest already holds the image; a stale or corrupt file is logged."""
+    if not os.path.exists(dest):
+        return False
+    if _is_verified(dest, sha256, hash_cache):
+        log.info("✅ %s already present", dest)
+        return True
+    log.info("⚠️ %s does not match the expected checksum, downloading it again", dest)
+    return False
+
+
+def download_image(url: str, dest: str, sha256: str,
+                   segments: int = DEFAULT_SEGMENTS,
+                   block_size: int = DEFAULT_BLOCK_SIZE,
+                   timeout: Optional[float] = DEFAULT_TIMEOUT,
+                   hash_cache=None,
+                   store: Optional[ImageStore] = None) -> bool:
+    """Downloads an image to dest and verifies it against its SHA-256 checksum.
+
+    Returns True once dest holds the verified image. An existing dest is only
+    kept if it matches sha256 (looked up in hash_cache, a verify.HashCache,
+    when given). On failure the partial download is kept for resuming,
+    unless its checksum did not match. With an image store, an image it holds
+    is hardlinked instead of downloaded and a new download is added to it;
+    the store is not trimmed here, callers evict once they are done.
+    """
+    if not sha256 or sha256 == "unknown":
+        log.error("❌ Refusing to download %s without a SHA-256 checksum", url)
+        return False
+    if _present(dest, sha256, hash_cache):
+        return True
+    if store is not None and store.link(sha256, dest):
+        log.info("✅ %s found in the image store", dest)
+        return True
+    if not _download(url, dest, sha256, segments, block_size, timeout, hash_cache):
+        return False
+    if store is not None:
+        store.add(dest, sha256, evict=False)
+    return True
+
+
+def _download(url: str, dest: str, sha256: str, segments: int, block_size: int,
+              timeout: Optional[float], hash_cache=None) -> bool:
+    """Downloads and verifies an image, replacing whatever is at dest."""
+    import requests  # pylint: disable=import-outside-toplevel
+    part = dest + PART_SUFFIX
+    hasher = hashlib.sha256()
+    try:
+        size, accepts_ranges = _probe(url, timeout)
+        offset = 0
+        if os.path.exists(part):
+            if accepts_ranges and size is not None and os.path.getsize(part) <= size:
+                offset = _hash_prefix(part, hasher)
+                log.info("Resuming %s at %d of %d bytes", url, offset, size)
+            else:
+                os.remove(part)
+
+        log.info("Downloading %s to %s...", url, dest)
+        with open(part, "ab") as f:
+            if accepts_ranges and size is not None:
+                _download_ranges(url, f, hasher, offset, size, max(1, segments), block_size, timeout)
+            else:
+                _download_stream(url, f, hasher, timeout)
+            f.flush()
+            os.fsync(f.fileno())
+    except requests.RequestException as e:
+        log.error("❌ An error occurred while downloading %s: %s", url, e)
+        return False
+    except OSError as e:
+        log.error("❌ Failed to write %s - %s: %s", part, e.errno, e.strerror)
+        return False
+
+    digest = hasher.hexdigest()
+    if digest != sha256.lower():
+        log.error("❌ Checksum mismatch for %s: expected %s, got %s", url, sha256, digest)
+        os.remove(part)
+        return False
+
+    os.replace(part, dest)
+    fsync_directory(os.path.dirname(os.path.abspath(dest)))
+    _remember(dest, sha256, hash_cache)
+    log.info("✅ Downloaded and verified %s", dest)
+    return True
+
+
+def image_filename(image_url: str) -> str:
+    """Returns the local file name for an image URL."""
+    return os.path.basename(urlparse(image_url).path)
+
+
+def download_images(images: dict, dest_dir: str,
+                    segments: int = DEFAULT_SEGMENTS,
+                    block_size: int = DEFAULT_BLOCK_SIZE,
+                    timeout: Optional[float] = DEFAULT_TIMEOUT,
+                    store: Optional[ImageStore] = None,
+                    hash_cache=None) -> dict:
+    """Downloads every image from extract_image_data into dest_dir.
+
+    Files already in dest_dir are kept only if they match the image checksum.
+    With an image store, images it already holds are hardlinked instead of
+    downloaded, and files downloaded and verified by this call are added to it.
+    The store is trimmed to its budget once at the end, never evicting the
+    images of this batch. Returns a mapping of product to local path for the
+    verified images.
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    paths = {}
+    digests = []
+    for product, image in images.items():
+        dest = os.path.join(dest_dir, image_filename(image["image_url"]))
+        sha256 = image.get("sha256", "")
+        if download_image(image["image_url"], dest, sha256, segments, block_size, timeout, hash_cache, store):
+            paths[product] = dest
+            digests.append(sha256)
+    if store is not None:
+        store.evict(keep=digests)
+    if hash_cache is not None:
+        hash_cache.save()
+    log.info("✅ Downloaded %s of %s images", len(paths), len(images))
+    return paths
@@ -1,17 +1,38 @@
 '''Fetches Ubuntu cloud images metadata and extracts relevant image URLs.'''
 import argparse
+import copy
+import functools
 import json
 import logging
 import os
-from typing import Callable
-
-import requests
-import toml
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional
+
+from prox_imager.catalog import BuildCatalog, build_catalog
+from prox_imager.delta import changed_images, changes_path, diff_images, keep_missing, load_previous
+from prox_imager.downloader import DEFAULT_BLOCK_SIZE, DEFAULT_DOWNLOAD_DIR, DEFAULT_SEGMENTS, download_images
+from prox_imager.http_client import configure, get_client
+from prox_imager.image_filter import DEFAULT_FILTER, ImageFilter, compile_filter
+from prox_imager.image_store import build_store
+from prox_imager.metadata_cache import MetadataCache, build_cache
+from prox_imager.metrics import METRICS, export_metrics, profiled, timed
+from prox_imager.output import DEFAULT_OUTPUT_FORMAT, output_settings, write_output
+from prox_imager.stream_index import IndexState, build_index_state, index_url, stream_updated
+from prox_imager.stream_parser import iter_products
+from prox_imager.verify import DEFAULT_HASH_CACHE, HashCache, verify_images
 
 
 # Configure logging
 log = logging.getLogger(__name__)
 
+STREAM_CHUNK_SIZE = 64 * 1024
+DEFAULT_TIMEOUT = 10
+DEFAULT_MAX_WORKERS = 4
+CONFIG_CACHE_MIN_AGE = 2  # seconds; younger files may still change within the same mtime tick
+
+_config_cache = {}
+
 
 def lazy_ic_import() -> Callable:
     '''Import icecream only when needed.'''
@@ -28,104 +49,487 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("-c", "--config",
                         default="./etc/config.toml",
                         help="Path to the configuration file.")
+    parser.add_argument("--no-cache",
+                        action="store_true",
+                        help="Ignore the metadata cache and always download the full stream.")
+    parser.add_argument("--stream",
+                        action="store_true",
+                        help="Parse the metadata incrementally to bound memory use (bypasses the cache).")
+    parser.add_argument("--incremental",
+                        action="store_true",
+                        help="Also write the changes since the previous output file and only "
+                             "download changed images.")
+    parser.add_argument("--index",
+                        action="store_true",
+                        help="Read streams/v1/index.json first and only fetch the streams updated "
+                             "since the last run ([index] section).")
+    parser.add_argument("--daemon",
+                        action="store_true",
+                        help="Keep running and poll the sources on an adaptive schedule ([daemon] section); "
+                             "implies --incremental.")
+    parser.add_argument("--mirror",
+                        action="store_true",
+                        help="Serve a caching mirror of the upstream metadata and images ([mirror] section).")
+    parser.add_argument("--latest",
+                        metavar="RELEASE",
+                        help="Print the newest cataloged build of RELEASE (codename or version) and exit.")
+    parser.add_argument("--as-of",
+                        metavar="YYYYMMDD",
+                        help="With --latest, print the newest build published on or before this date.")
+    parser.add_argument("--arch",
+                        default="amd64",
+                        help="Architecture for --latest queries.")
+    parser.add_argument("--download",
+                        action="store_true",
+                        help="Download and verify the images into [download] directory.")
+    parser.add_argument("--build-templates",
+                        action="store_true",
+                        help="Download, verify, convert and import the images as Proxmox templates "
+                             "([pipeline] section); with --incremental or --daemon only changed images.")
+    parser.add_argument("--verify",
+                        action="store_true",
+                        help="Re-verify the images in [download] directory against their checksums.")
+    parser.add_argument("--profile",
+                        metavar="FILE",
+                        help="Run under cProfile and write the stats to FILE.")
     return parser.parse_args()
 
 
+def _parse_toml(text: str) -> dict:
+    """Parses TOML with the stdlib tomllib, or the toml package before Python 3.11."""
+    try:
+        from tomllib import loads  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        from toml import loads  # pylint: disable=import-outside-toplevel
+    return loads(text)
+
+
+@timed("load_config")
 def load_config(config_path: str) -> dict:
-    """Loads configuration from a TOML file."""
+    """Loads configuration from a TOML file.
+
+    The parsed configuration is remembered per path and a copy is returned
+    while the file keeps its mtime, size and inode.
+    """
     if not os.path.exists(config_path):
         log.error("❌ Configuration file not found: %s", config_path)
         return {}
     if not os.access(config_path, os.R_OK):
         log.error("❌ Permission denied to read configuration file: %s", config_path)
         return {}
+    try:
+        st = os.stat(config_path)
+        identity = (st.st_mtime_ns, st.st_size, st.st_ino)
+    except OSError:
+        identity = None
+    cached = _config_cache.get(config_path)
+    if identity is not None and cached is not None and cached[0] == identity:
+        return copy.deepcopy(cached[1])
     try:
         with open(config_path, "r", encoding="utf-8") as f:
-            return toml.load(f)
-    except toml.TomlDecodeError:
+            config = _parse_toml(f.read())
+    except ValueError:
         log.error("❌ Failed to decode TOML file: %s", config_path)
         return {}
     except IOError as e:
         log.error("❌ Failed to open configuration file: %s - %d: %s",
                   config_path, e.errno, e.strerror)
         return {}
+    if identity is not None and time.time() - identity[0] / 1e9 > CONFIG_CACHE_MIN_AGE:
+        _config_cache[config_path] = (identity, copy.deepcopy(config))
+    return config
 
 
 def validate_config(config: dict) -> bool:
     """Validates the configuration file."""
-    required_sections = ['image_urls', 'files']
+    required_sections = ['files']
     for section in required_sections:
         if section not in config:
             log.error("❌ Missing required section in configuration file: %s", section)
             return False
+    if 'image_urls' not in config and 'sources' not in config:
+        log.error("❌ Missing required section in configuration file: %s", 'image_urls')
+        return False
+    for source in config.get('sources', []):
+        for key in ('name', 'base_url', 'metadata_url'):
+            if key not in source:
+                log.error("❌ Missing required key in [[sources]] entry: %s", key)
+                return False
     return True
 
 
-def fetch_ubuntu_metadata(ubuntu_json_url: str) -> dict:
-    """Fetches Ubuntu cloud images metadata and extracts relevant image URLs."""
+def _mirrored_url(base_url: str, config: dict) -> str:
+    """Applies mirrored_url; the mirror module (and http.server) is only loaded when a mirror is set."""
+    if not config.get('mirror', {}).get('url'):
+        return base_url
+    from prox_imager.mirror import mirrored_url  # pylint: disable=import-outside-toplevel
+    return mirrored_url(base_url, config)
+
+
+def get_sources(config: dict) -> list:
+    """Returns the metadata sources declared in the configuration.
+
+    Each [[sources]] entry needs a name, base_url and metadata_url and may set
+    its own read timeout; without one the [http] read_timeout applies. The
+    legacy [image_urls] section is read as one source. Base URLs under the
+    upstream of a [mirror] with a url are rewritten to point at the mirror.
+    """
+    sources = []
+    if 'image_urls' in config:
+        sources.append({
+            "name": "ubuntu",
+            "base_url": _mirrored_url(config['image_urls']['ubuntu_base_url'], config),
+            "metadata_url": config['image_urls']['ubuntu_metadata_url'],
+            "timeout": config['image_urls'].get('timeout'),
+        })
+    for source in config.get('sources', []):
+        sources.append({
+            "name": source['name'],
+            "base_url": _mirrored_url(source['base_url'], config),
+            "metadata_url": source['metadata_url'],
+            "timeout": source.get('timeout'),
+        })
+    return sources
+
+
+def fetch_ubuntu_metadata(ubuntu_json_url: str, cache: Optional[MetadataCache] = None,
+                          timeout: Optional[float] = DEFAULT_TIMEOUT,
+                          parse_not_modified: bool = True) -> Optional[dict]:
+    """Fetches Ubuntu cloud images metadata and extracts relevant image URLs.
+
+    When a cache is given the request is made conditional on the stored ETag /
+    Last-Modified, and a 304 answer returns the cached document. With
+    parse_not_modified=False a 304 returns None instead, for callers that
+    keep their own copy of what they derived from the document.
+    """
+    with METRICS.timer("fetch_ubuntu_metadata", url=ubuntu_json_url):
+        return _fetch_ubuntu_metadata(ubuntu_json_url, cache, timeout, parse_not_modified)
+
+
+def _fetch_ubuntu_metadata(ubuntu_json_url: str, cache: Optional[MetadataCache],
+                           timeout: Optional[float], parse_not_modified: bool = True) -> Optional[dict]:
+    import requests  # pylint: disable=import-outside-toplevel
     log.info("Fetching metadata from %s...", ubuntu_json_url)
+    request_kwargs = {"timeout": timeout}
+    if cache is not None:
+        headers = cache.conditional_headers(ubuntu_json_url)
+        if headers:
+            request_kwargs["headers"] = headers
     try:
-        response = requests.get(ubuntu_json_url, timeout=10)
+        response = get_client().get(ubuntu_json_url, **request_kwargs)
+        METRICS.inc("http_responses_total", url=ubuntu_json_url, status=response.status_code)
         response.raise_for_status()  # Raise an HTTPError for bad responses (4xx and 5xx)
     except requests.RequestException as e:
+        if e.response is None:
+            METRICS.inc("http_responses_total", url=ubuntu_json_url, status="error")
         log.error("❌ An error occurred while fetching metadata: %s", e)
         return {}
 
+    if cache is not None and response.status_code == 304:
+        cache.revalidated(ubuntu_json_url)
+        if not parse_not_modified and cache.lookup(ubuntu_json_url) is not None:
+            METRICS.inc("metadata_cache_total", result="hit")
+            log.info("✅ Metadata not modified: %s", ubuntu_json_url)
+            return None
+        cached = cache.load(ubuntu_json_url)
+        if cached is not None:
+            METRICS.inc("metadata_cache_total", result="hit")
+            log.info("✅ Metadata not modified, using cached copy of %s", ubuntu_json_url)
+            return cached
+        log.info("⚠️ Got 304 but cache entry is gone, refetching %s", ubuntu_json_url)
+        return _fetch_ubuntu_metadata(ubuntu_json_url, None, timeout)
+    if cache is not None:
+        METRICS.inc("metadata_cache_total", result="miss")
+    METRICS.inc("metadata_bytes_total", len(response.content), url=ubuntu_json_url)
+
     try:
-        return_content = response.json()
+        with METRICS.timer("parse_metadata"):
+            return_content = response.json()
     except ValueError as e:
         log.error("❌ Failed to parse JSON response: %s", e)
         return {}
 
+    if cache is not None:
+        cache.store(ubuntu_json_url, response.content,
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                    return_content)
     return return_content
 
 
-def extract_image_data(metadata: dict, base_url) -> dict:
-    """Extracts image details from the fetched JSON data."""
-    images = {}
+def _extract_product(product: str, details: dict, base_url: str,
+                     image_filter: ImageFilter = DEFAULT_FILTER) -> list:
+    """Returns (key, image record) pairs for the newest matching build of a product."""
+    if not image_filter.match_product(details):
+        return []  # Skip unwanted architectures and releases
+    release = details.get("release", "unknown")
+    version = details.get("version", "unknown")
+    versions = details.get("versions", {})
 
-    for product, details in metadata.get("products", {}).items():
-        if details.get("arch") != "amd64":
-            continue  # Skip non-amd64 architectures
-        release = details.get("release", "unknown")
-        version = details.get("version", "unknown")
-        versions = details.get("versions", {})
-
-        if not versions:
-            log.info("⚠️ Skipping %s: No available builds", product)
-            continue
+    latest_version = image_filter.latest_build(versions)  # Find latest available build
+    if latest_version is None:
+        log.info("⚠️ Skipping %s: No available builds", product)
+        return []
 
-        latest_version = max(versions.keys())  # Find latest available build
-        disk_data = versions[latest_version]["items"].get("disk1.img", {})
-
-        if not disk_data:
-            log.info("⚠️ Skipping %s: No disk1.img found", product)
-            continue
+    selected = image_filter.select_items(product, versions[latest_version].get("items", {}))
+    if not selected:
+        log.info("⚠️ Skipping %s: No %s found", product, " or ".join(image_filter.item_types))
+        return []
 
+    records = []
+    for key, disk_data in selected:
         # Get the download and checksum URLs
         image_url = base_url + disk_data.get("path", "")
         sha256_hash = disk_data.get("sha256", "unknown")
 
         log.info("✅ Found %s %s %s %s %s",
-                 product, release, version, latest_version, image_url)
+                 key, release, version, latest_version, image_url)
 
-        images[product] = {
+        records.append((key, {
             "release": release,
             "version": version,
             "build_date": latest_version,
             "image_url": image_url,
             "sha256": sha256_hash
-        }
+        }))
+    return records
+
+
+def _count_products(scanned: int, kept: int) -> None:
+    """Adds the products seen by one extraction pass to the metrics."""
+    METRICS.inc("products_scanned_total", scanned)
+    METRICS.inc("products_skipped_total", scanned - kept)
+    METRICS.inc("products_kept_total", kept)
+
+
+@timed("extract_image_data")
+def extract_image_data(metadata: dict, base_url, image_filter: ImageFilter = DEFAULT_FILTER) -> dict:
+    """Extracts image details from the fetched JSON data.
 
+    By default the newest amd64 disk1.img of every product is kept; a
+    compiled ImageFilter selects other arches, releases and artifacts.
+    """
+    images = {}
+    scanned = kept = 0
+
+    for product, details in metadata.get("products", {}).items():
+        records = _extract_product(product, details, base_url, image_filter)
+        scanned += 1
+        kept += bool(records)
+        images.update(records)
+
+    _count_products(scanned, kept)
     log.info("✅ Extracted %s images", len(images))
     return images
 
 
-def save_metadata(metadata: dict, output_file: str) -> None:
-    """Saves extracted metadata to a local JSON file."""
+def stream_image_data(chunks: Iterable[bytes], base_url: str,
+                      on_product: Optional[Callable[[str, dict], None]] = None,
+                      image_filter: ImageFilter = DEFAULT_FILTER) -> dict:
+    """Extracts image details from a metadata document read chunk by chunk.
+
+    Produces the same result as extract_image_data, but only one product of
+    the document is decoded at a time. on_product, if given, is called with
+    every decoded product before it is discarded.
+    """
+    images = {}
+    scanned = kept = 0
+
+    for product, details in iter_products(chunks):
+        if on_product is not None:
+            on_product(product, details)
+        records = _extract_product(product, details, base_url, image_filter)
+        scanned += 1
+        kept += bool(records)
+        images.update(records)
+
+    _count_products(scanned, kept)
+    log.info("✅ Extracted %s images", len(images))
+    return images
+
+
+def _count_bytes(chunks: Iterable[bytes], url: str) -> Iterator[bytes]:
+    """Passes chunks through, adding their size to the metadata bytes metric."""
+    received = 0
+    try:
+        for chunk in chunks:
+            received += len(chunk)
+            yield chunk
+    finally:
+        METRICS.inc("metadata_bytes_total", received, url=url)
+
+
+def fetch_image_data_streaming(ubuntu_json_url: str, base_url: str,
+                               chunk_size: int = STREAM_CHUNK_SIZE,
+                               timeout: Optional[float] = DEFAULT_TIMEOUT,
+                               on_product: Optional[Callable[[str, dict], None]] = None,
+                               image_filter: ImageFilter = DEFAULT_FILTER) -> dict:
+    """Fetches Ubuntu cloud images metadata and extracts image details while downloading."""
+    import requests  # pylint: disable=import-outside-toplevel
+    log.info("Streaming metadata from %s...", ubuntu_json_url)
+    try:
+        with METRICS.timer("fetch_image_data_streaming", url=ubuntu_json_url), \
+                get_client().stream(ubuntu_json_url, timeout=timeout) as response:
+            METRICS.inc("http_responses_total", url=ubuntu_json_url, status=response.status_code)
+            response.raise_for_status()
+            return stream_image_data(_count_bytes(response.iter_content(chunk_size), ubuntu_json_url),
+                                     base_url, on_product, image_filter)
+    except requests.RequestException as e:
+        if e.response is None:
+            METRICS.inc("http_responses_total", url=ubuntu_json_url, status="error")
+        log.error("❌ An error occurred while fetching metadata: %s", e)
+        return {}
+    except ValueError as e:
+        log.error("❌ Failed to parse JSON response: %s", e)
+        return {}
+
+
+def fetch_source(source: dict, cache: Optional[MetadataCache] = None, stream: bool = False,
+                 catalog: Optional[BuildCatalog] = None,
+                 image_filter: ImageFilter = DEFAULT_FILTER) -> dict:
+    """Fetches one metadata source and extracts its image details.
+
+    With a catalog, every build of the source is recorded in it as well.
+    """
+    json_url = source['base_url'] + source['metadata_url']
+    if stream:
+        on_product = None
+        if catalog is not None:
+            on_product = functools.partial(catalog.record_product,
+                                           base_url=source['base_url'], source=source['name'])
+        return fetch_image_data_streaming(json_url, source['base_url'], timeout=source['timeout'],
+                                          on_product=on_product, image_filter=image_filter)
+    extract_key = cached_images = None
+    if cache is not None:
+        extract_key = _extract_key(source['base_url'], image_filter)
+        cached_images = cache.load_extracted(json_url, extract_key)
+    metadata = fetch_ubuntu_metadata(json_url, cache, timeout=source['timeout'],
+                                     parse_not_modified=cached_images is None)
+    if metadata is None:
+        # Not modified: every build was already recorded in the catalog when the document was stored
+        log.info("✅ Reusing %s extracted images of %s", len(cached_images), source['name'])
+        return cached_images
+    if not metadata:
+        return {}
+    if catalog is not None:
+        catalog.record_metadata(metadata, source['base_url'], source['name'])
+    images = extract_image_data(metadata, source['base_url'], image_filter)
+    if cache is not None:
+        cache.store_extracted(json_url, extract_key, images)
+    return images
+
+
+def _extract_key(base_url: str, image_filter: ImageFilter) -> str:
+    """Identifies the extract_image_data result of one document for a base URL and filter."""
+    return json.dumps([base_url, sorted(image_filter.arches),
+                       sorted(image_filter.releases) if image_filter.releases is not None else None,
+                       image_filter.item_types, image_filter.min_build_date, image_filter.all_item_types])
+
+
+def fetch_all_sources(sources: list, cache: Optional[MetadataCache] = None,
+                      max_workers: int = DEFAULT_MAX_WORKERS, stream: bool = False,
+                      catalog: Optional[BuildCatalog] = None,
+                      image_filter: ImageFilter = DEFAULT_FILTER) -> dict:
+    """Fetches and extracts all sources concurrently and merges their images.
+
+    A failing source only contributes no images. Results are merged in
+    configuration order, so the first source wins if two share a product.
+    """
+    return merge_images(fetch_sources(sources, cache, max_workers, stream, catalog, image_filter))
+
+
+def fetch_sources(sources: list, cache: Optional[MetadataCache] = None,
+                  max_workers: int = DEFAULT_MAX_WORKERS, stream: bool = False,
+                  catalog: Optional[BuildCatalog] = None,
+                  image_filter: ImageFilter = DEFAULT_FILTER) -> list:
+    """Fetches and extracts all sources concurrently.
+
+    Returns (source name, images) pairs in configuration order; a failing
+    source has no images.
+    """
+    if not sources:
+        return []
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sources)))) as executor:
+        futures = [executor.submit(fetch_source, source, cache, stream, catalog, image_filter)
+                   for source in sources]
+        for source, future in zip(sources, futures):
+            try:
+                results.append((source['name'], future.result()))
+            except Exception as e:  # pylint: disable=broad-except
+                log.error("❌ Failed to process source %s: %s", source['name'], e)
+                results.append((source['name'], {}))
+    return results
+
+
+def fetch_sources_indexed(sources: list, state: IndexState, cache: Optional[MetadataCache] = None,
+                          max_workers: int = DEFAULT_MAX_WORKERS, stream: bool = False,
+                          catalog: Optional[BuildCatalog] = None,
+                          image_filter: ImageFilter = DEFAULT_FILTER) -> list:
+    """Like fetch_sources, but skips the streams the simplestreams index lists as unchanged.
+
+    The index.json of every base URL is fetched once. A source whose stream
+    has the same ``updated`` value as when its images were last extracted
+    reuses those images from state; the others are fetched as usual. A
+    missing index or stream entry just means the source is fetched.
+    """
+    indexes = {}
+    for source in sources:
+        url = index_url(source)
+        if url not in indexes:
+            indexes[url] = fetch_ubuntu_metadata(url, cache, timeout=source['timeout']) or {}
+
+    results = [None] * len(sources)
+    pending = []
+    for position, source in enumerate(sources):
+        json_url = source['base_url'] + source['metadata_url']
+        updated = stream_updated(indexes[index_url(source)], source['metadata_url'])
+        key = _extract_key(source['base_url'], image_filter)
+        images = state.unchanged(json_url, key, updated)
+        if images is not None:
+            METRICS.inc("streams_total", result="unchanged")
+            log.info("✅ Stream of %s unchanged since %s, reusing %s images", source['name'], updated, len(images))
+            results[position] = (source['name'], images)
+        else:
+            METRICS.inc("streams_total", result="changed")
+            pending.append((position, json_url, key, updated))
+
+    fetched = fetch_sources([sources[position] for position, _, _, _ in pending],
+                            cache, max_workers, stream, catalog, image_filter)
+    for (position, json_url, key, updated), (name, images) in zip(pending, fetched):
+        results[position] = (name, images)
+        if images and updated is not None:
+            state.put(json_url, key, updated, images)
+    state.save()
+    return results
+
+
+def merge_images(results: list) -> dict:
+    """Merges (source name, images) pairs; the first source providing a product wins."""
+    images = {}
+    for name, source_images in results:
+        if not source_images:
+            log.info("⚠️ No images from source %s", name)
+            continue
+        for product, image in source_images.items():
+            if product in images:
+                log.info("⚠️ Skipping %s from %s: already provided by another source", product, name)
+                continue
+            images[product] = image
+    log.info("✅ Collected %s images from %s sources", len(images), len(results))
+    return images
+
+
+@timed("save_metadata")
+def save_metadata(metadata: dict, output_file: str, output_format: Optional[dict] = None) -> None:
+    """Saves extracted metadata to a local file, atomically.
+
+    output_format holds the format and compression from output_settings;
+    by default the file is indented JSON.
+    """
+    output_format = output_format or DEFAULT_OUTPUT_FORMAT
     try:
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(metadata, f, indent=4)
+        write_output(metadata, output_file, output_format["format"], output_format["compression"])
         log.info("✅ Saved metadata to %s", output_file)
     except PermissionError:
         log.error("❌ Permission denied when trying to save metadata to %s", output_file)
@@ -133,28 +537,129 @@ def save_metadata(metadata: dict, output_file: str) -> None:
         errno = e.errno if e.errno is not None else "Unknown"
         strerror = e.strerror if e.strerror is not None else "Unknown error"
         log.error("❌ Failed to save metadata to %s - %s: %s", output_file, errno, strerror)
-    except TypeError as e:
+    except (TypeError, ValueError) as e:
         log.error("❌ Failed to serialize metadata to JSON: %s", e)
 
 
+def download_configured(images: dict, config: dict) -> dict:
+    """Downloads images with the [download] and [store] settings of the configuration."""
+    download_config = config.get('download', {})
+    return download_images(images,
+                           download_config.get('directory', DEFAULT_DOWNLOAD_DIR),
+                           download_config.get('segments', DEFAULT_SEGMENTS),
+                           download_config.get('block_size', DEFAULT_BLOCK_SIZE),
+                           download_config.get('timeout'),
+                           store=build_store(config),
+                           hash_cache=HashCache(config.get('verify', {}).get('cache_file', DEFAULT_HASH_CACHE)))
+
+
+def query_catalog(catalog: BuildCatalog, release: str, as_of: Optional[str] = None,
+                  arch: str = "amd64") -> Optional[dict]:
+    """Prints the newest (or newest as of a date) cataloged build of a release as JSON."""
+    if as_of:
+        image = catalog.as_of(release, as_of, arch)
+    else:
+        image = catalog.latest(release, arch)
+    if image is None:
+        log.error("❌ No cataloged %s build for %s%s", arch, release, f" as of {as_of}" if as_of else "")
+        return None
+    print(json.dumps(image, indent=4))
+    return image
+
+
 def main():
     '''Main entry point of the script.'''
     log.info("Starting the script...")
     args = parse_args()
+    with profiled(args.profile):
+        run(args)
+
+
+def run(args: argparse.Namespace) -> None:
+    '''Runs the command selected by the parsed arguments.'''
     config = load_config(args.config)
     if not config or not validate_config(config):
         return
+    if args.latest:
+        query_catalog(build_catalog(config) or BuildCatalog(), args.latest, args.as_of, args.arch)
+        return
+    try:
+        configure(config)
+    except ValueError as e:
+        log.error("❌ Invalid [http] section in configuration file: %s", e)
+        return
+    if args.mirror:
+        from prox_imager.mirror import serve  # pylint: disable=import-outside-toplevel
+        serve(config)
+        return
+    if args.index and args.no_cache:
+        log.error("❌ --index cannot be combined with --no-cache")
+        return
+    if args.daemon:
+        if args.verify:
+            log.error("❌ --verify cannot be combined with --daemon")
+            return
+        # The daemon always writes a change set, so --incremental is implied
+        from prox_imager.daemon import Daemon  # pylint: disable=import-outside-toplevel
+        Daemon(args.config, stream=args.stream, no_cache=args.no_cache, download=args.download,
+               index=args.index, build_templates=args.build_templates).run()
+        return
+    try:
+        image_filter = compile_filter(config)
+    except ValueError as e:
+        log.error("❌ Invalid [filter] section in configuration file: %s", e)
+        return
+    try:
+        output_format = output_settings(config)
+    except ValueError as e:
+        log.error("❌ Invalid [files] section in configuration file: %s", e)
+        return
 
-    ubuntu_json_url = (config['image_urls']['ubuntu_base_url'] +
-                       config['image_urls']['ubuntu_metadata_url'])
     output_file = config['files']['output_file']
-    metadata = fetch_ubuntu_metadata(ubuntu_json_url)
-    if not metadata:
+    cache = None if args.no_cache or args.stream else build_cache(config)
+    max_workers = config.get('fetch', {}).get('max_workers', DEFAULT_MAX_WORKERS)
+    sources = get_sources(config)
+    if args.index:
+        results = fetch_sources_indexed(sources, build_index_state(config), cache, max_workers,
+                                        stream=args.stream, catalog=build_catalog(config),
+                                        image_filter=image_filter)
+    else:
+        results = fetch_sources(sources, cache, max_workers,
+                                stream=args.stream, catalog=build_catalog(config),
+                                image_filter=image_filter)
+    image_data = merge_images(results)
+    if not image_data:
+        export_metrics(config)
         return
-
-    image_data = extract_image_data(metadata,
-                                    config['image_urls']['ubuntu_base_url'])
-    save_metadata(image_data, output_file)
+    failed = [source for source, (_, images) in zip(sources, results) if not images]
+    previous = load_previous(output_file) if args.incremental or failed else {}
+    if failed:
+        # Do not drop (or report as removed) the products of a source that is only temporarily down
+        log.info("⚠️ No images from %s, keeping their previous records",
+                 ", ".join(source['name'] for source in failed))
+        image_data = keep_missing(previous, image_data, [source['base_url'] for source in failed])
+    METRICS.set("images", len(image_data))
+
+    targets = image_data
+    if args.incremental:
+        changes = diff_images(previous, image_data)
+        save_metadata(image_data, output_file, output_format)
+        save_metadata(changes, config['files'].get('changes_file', changes_path(output_file)), output_format)
+        targets = changed_images(changes)
+    else:
+        save_metadata(image_data, output_file, output_format)
+
+    if args.download:
+        download_configured(targets, config)
+    if args.build_templates:
+        from prox_imager.pipeline import build_templates  # pylint: disable=import-outside-toplevel
+        build_templates(targets, config)
+    if args.verify:
+        verify_config = config.get('verify', {})
+        verify_images(image_data, config.get('download', {}).get('directory', DEFAULT_DOWNLOAD_DIR),
+                      HashCache(verify_config.get('cache_file', DEFAULT_HASH_CACHE)),
+                      verify_config.get('workers'))
+    export_metrics(config)
 
 
 if __name__ == "__main__":
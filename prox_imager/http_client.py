@@ -0,0 +1,134 @@
+'''Shared HTTP client used by every network call in the package.
+
+A single ``requests.Session`` keeps connections alive in a pool, retries
+connection errors and retryable statuses with jittered exponential backoff,
+applies separate connect and read timeouts and limits how many requests run
+against one host at the same time. Settings come from the [http] section of
+the configuration. requests and urllib3 are only imported when the first
+client is built, so commands that never go to the network start faster.
+'''
+import logging
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterator, Optional
+from urllib.parse import urlparse
+
+if TYPE_CHECKING:
+    import requests
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_HTTP_CONFIG = {
+    "pool_connections": 10,
+    "pool_maxsize": 10,
+    "retries": 3,
+    "backoff_factor": 0.5,
+    "backoff_max": 30,
+    "backoff_jitter": 0.5,
+    "connect_timeout": 5,
+    "read_timeout": 30,
+    "per_host_limit": 8,
+    "user_agent": "prox_imager",
+}
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HttpClient:
+    """Pooled, retrying HTTP client with a per-host concurrency limit."""
+
+    def __init__(self, **settings):
+        # pylint: disable=import-outside-toplevel
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util import Retry
+
+        unknown = set(settings) - set(DEFAULT_HTTP_CONFIG)
+        if unknown:
+            raise ValueError(f"Unknown HTTP settings: {', '.join(sorted(unknown))}")
+        self.settings = {**DEFAULT_HTTP_CONFIG, **settings}
+        self.retry = Retry(total=self.settings["retries"],
+                           status_forcelist=RETRY_STATUSES,
+                           allowed_methods=frozenset({"GET", "HEAD"}),
+                           backoff_factor=self.settings["backoff_factor"],
+                           backoff_max=self.settings["backoff_max"],
+                           backoff_jitter=self.settings["backoff_jitter"],
+                           raise_on_status=False,
+                           respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=self.settings["pool_connections"],
+                              pool_maxsize=self.settings["pool_maxsize"],
+                              max_retries=self.retry)
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = self.settings["user_agent"]
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._host_slots = {}
+        self._slots_lock = threading.Lock()
+
+    def close(self) -> None:
+        """Closes all pooled connections."""
+        self.session.close()
+
+    def _timeout(self, timeout) -> tuple:
+        """Turns a read timeout (or None) into a (connect, read) timeout pair."""
+        if isinstance(timeout, tuple):
+            return timeout
+        read_timeout = self.settings["read_timeout"] if timeout is None else timeout
+        return (self.settings["connect_timeout"], read_timeout)
+
+    def _slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc
+        with self._slots_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.settings["per_host_limit"])
+                self._host_slots[host] = slot
+        return slot
+
+    def request(self, method: str, url: str, timeout=None, **kwargs) -> "requests.Response":
+        """Sends a request and reads the whole response body."""
+        with self._slot(url):
+            return self.session.request(method, url, timeout=self._timeout(timeout), **kwargs)
+
+    def get(self, url: str, timeout=None, **kwargs) -> "requests.Response":
+        """Sends a GET request."""
+        return self.request("GET", url, timeout=timeout, **kwargs)
+
+    def head(self, url: str, timeout=None, **kwargs) -> "requests.Response":
+        """Sends a HEAD request."""
+        kwargs.setdefault("allow_redirects", True)
+        return self.request("HEAD", url, timeout=timeout, **kwargs)
+
+    @contextmanager
+    def stream(self, url: str, timeout=None, **kwargs) -> Iterator["requests.Response"]:
+        """Sends a streaming GET request, holding the host slot until the body is consumed."""
+        with self._slot(url):
+            response = self.session.get(url, timeout=self._timeout(timeout), stream=True, **kwargs)
+            try:
+                yield response
+            finally:
+                response.close()
+
+
+_default_client: Optional[HttpClient] = None
+_default_lock = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    """Returns the shared client, creating one with default settings if needed."""
+    global _default_client  # pylint: disable=global-statement
+    with _default_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+        return _default_client
+
+
+def configure(config: dict) -> HttpClient:
+    """Replaces the shared client with one built from the [http] section of the configuration."""
+    global _default_client  # pylint: disable=global-statement
+    client = HttpClient(**config.get("http", {}))
+    with _default_lock:
+        previous, _default_client = _default_client, client
+    if previous is not None:
+        previous.close()
+    return client
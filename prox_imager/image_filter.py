@@ -0,0 +1,87 @@
+'''Compiled product filter for extract_image_data.
+
+The [filter] section of the configuration is turned into an ImageFilter once;
+matching a product then costs a few set lookups, so a single pass over the
+products yields every wanted arch / artifact combination.
+'''
+from typing import Iterable, Optional
+
+
+DEFAULT_ARCHES = ("amd64",)
+DEFAULT_ITEM_TYPES = ("disk1.img",)
+
+
+class ImageFilter:
+    """Selects products and the artifacts of their newest build.
+
+    arches and releases are sets of accepted values (releases match either
+    the codename or the version number; None accepts all). item_types is an
+    ordered preference list: only the first artifact present in the build is
+    kept, unless all_item_types is set, in which case every listed artifact
+    is kept under the key ``<product>:<item type>``. Builds older than
+    min_build_date (YYYYMMDD) are ignored.
+    """
+
+    __slots__ = ("arches", "releases", "item_types", "min_build_date", "all_item_types")
+
+    def __init__(self, arches: Iterable[str] = DEFAULT_ARCHES,
+                 releases: Optional[Iterable[str]] = None,
+                 item_types: Iterable[str] = DEFAULT_ITEM_TYPES,
+                 min_build_date: str = "",
+                 all_item_types: bool = False):
+        self.arches = frozenset(arches)
+        self.releases = frozenset(releases) if releases is not None else None
+        self.item_types = tuple(item_types)
+        self.min_build_date = min_build_date
+        self.all_item_types = all_item_types
+        if not self.item_types:
+            raise ValueError("item_types must not be empty")
+
+    def match_product(self, details: dict) -> bool:
+        """Tells whether a product passes the arch and release filters."""
+        if details.get("arch") not in self.arches:
+            return False
+        if self.releases is None:
+            return True
+        return (details.get("release", "unknown") in self.releases
+                or details.get("version", "unknown") in self.releases)
+
+    def latest_build(self, versions: dict) -> Optional[str]:
+        """Returns the newest build that is not older than min_build_date."""
+        if not self.min_build_date:
+            return max(versions.keys(), default=None)
+        return max((v for v in versions if v >= self.min_build_date), default=None)
+
+    def select_items(self, product: str, items: dict) -> list:
+        """Returns the (key, item) pairs to keep from a build's items."""
+        if self.all_item_types:
+            return [(f"{product}:{name}", items[name]) for name in self.item_types if items.get(name)]
+        for name in self.item_types:
+            if items.get(name):
+                return [(product, items[name])]
+        return []
+
+
+DEFAULT_FILTER = ImageFilter()
+
+
+def _string_list(section: dict, key: str, default: Optional[Iterable[str]]) -> Optional[Iterable[str]]:
+    """Returns a [filter] list setting, rejecting a bare string or other non-list values."""
+    value = section.get(key, default)
+    if value is default:
+        return value
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"{key} must be a list of strings, got {value!r}")
+    return value
+
+
+def compile_filter(config: dict) -> ImageFilter:
+    """Builds an ImageFilter from the optional [filter] section of the configuration."""
+    section = config.get("filter")
+    if not section:
+        return DEFAULT_FILTER
+    return ImageFilter(_string_list(section, "arches", DEFAULT_ARCHES),
+                       _string_list(section, "releases", None),
+                       _string_list(section, "item_types", DEFAULT_ITEM_TYPES),
+                       str(section.get("min_build_date", "")),
+                       section.get("all_item_types", False))
@@ -0,0 +1,218 @@
+'''Compact in-memory model of extracted image records.
+
+extract_image_data returns one dict per image, repeating the field names and
+the release, version and build date strings in every record. ImageCatalog
+keeps the same records column-wise instead: one list per field, repeated
+strings interned so all records share a single copy (image URLs are split
+into directory and file name, which repeat across arches and builds), and
+SHA-256 digests packed into 32 bytes. Row numbers are indexed by release (codename and
+version), arch, release and arch together, and build date, so queries only
+look at matching rows.
+
+The catalog is a Mapping of product key to the usual record dict, so code
+written for the dict form (diff_images, merge_images, comparisons) accepts it
+as is, and dump() writes the JSON shape of save_metadata straight from the
+columns without building the whole dict first.
+'''
+import json
+import sys
+from array import array
+from collections.abc import Mapping
+from typing import IO, Iterator, List, Optional, Union
+
+
+_EMPTY = array("I")
+
+
+def arch_of(key: str) -> str:
+    """Returns the arch of a product key such as ``com.ubuntu.cloud:server:22.04:amd64[:<item type>]``."""
+    parts = key.split(":")
+    return parts[3] if len(parts) > 3 else ""
+
+
+def _pack_sha256(digest: str) -> Union[bytes, str]:
+    """Stores a lowercase hex SHA-256 as 32 bytes; anything else (e.g. "unknown") stays a string."""
+    if len(digest) == 64 and digest == digest.lower():
+        try:
+            return bytes.fromhex(digest)
+        except ValueError:
+            pass
+    return sys.intern(digest)
+
+
+def _unpack_sha256(value: Union[bytes, str]) -> str:
+    return value.hex() if isinstance(value, bytes) else value
+
+
+class ImageRecord:
+    """One image of an ImageCatalog."""
+
+    __slots__ = ("key", "release", "version", "arch", "build_date", "image_url", "sha256")
+
+    def __init__(self, key: str, release: str, version: str, arch: str, build_date: str,
+                 image_url: str, sha256: str):
+        self.key = key
+        self.release = release
+        self.version = version
+        self.arch = arch
+        self.build_date = build_date
+        self.image_url = image_url
+        self.sha256 = sha256
+
+    def to_dict(self) -> dict:
+        """Returns the record in the shape produced by extract_image_data."""
+        return {"release": self.release, "version": self.version, "build_date": self.build_date,
+                "image_url": self.image_url, "sha256": self.sha256}
+
+    def __repr__(self) -> str:
+        return f"ImageRecord({self.key!r}, {self.release!r}, {self.arch!r}, {self.build_date!r})"
+
+
+class ImageCatalog(Mapping):
+    """Column-wise image records with indexes by release, arch and build date.
+
+    Adding a record under an existing key replaces it. The arch is taken
+    from the product key unless given explicitly.
+    """
+
+    def __init__(self, images: Optional[Mapping] = None):
+        self._rows = {}
+        self._keys = []
+        self._release = []
+        self._version = []
+        self._arch = []
+        self._build_date = []
+        self._url_dir = []
+        self._url_file = []
+        self._sha256 = []
+        self._by_release = {}
+        self._by_arch = {}
+        self._by_release_arch = {}
+        self._by_build_date = {}
+        if images:
+            self.update(images)
+
+    def _index_entries(self, row: int) -> list:
+        release, version, arch = self._release[row], self._version[row], self._arch[row]
+        entries = [(self._by_release, release), (self._by_arch, arch), (self._by_release_arch, (release, arch)),
+                   (self._by_build_date, self._build_date[row])]
+        if version != release:
+            entries += [(self._by_release, version), (self._by_release_arch, (version, arch))]
+        return entries
+
+    def _index(self, row: int) -> None:
+        for index, value in self._index_entries(row):
+            index.setdefault(value, array("I")).append(row)
+
+    def _unindex(self, row: int) -> None:
+        for index, value in self._index_entries(row):
+            rows = index[value]
+            rows.remove(row)
+            if not rows:
+                del index[value]
+
+    def add(self, key: str, image: Mapping, arch: Optional[str] = None) -> None:
+        """Adds or replaces the record of key."""
+        url = image.get("image_url", "")
+        cut = url.rfind("/") + 1
+        values = (sys.intern(image.get("release", "unknown")), sys.intern(image.get("version", "unknown")),
+                  sys.intern(arch_of(key) if arch is None else arch), sys.intern(image.get("build_date", "")),
+                  sys.intern(url[:cut]), sys.intern(url[cut:]), _pack_sha256(image.get("sha256", "unknown")))
+        columns = (self._release, self._version, self._arch, self._build_date, self._url_dir, self._url_file,
+                   self._sha256)
+        row = self._rows.get(key)
+        if row is None:
+            row = len(self._keys)
+            self._rows[key] = row
+            self._keys.append(key)
+            for column, value in zip(columns, values):
+                column.append(value)
+        else:
+            self._unindex(row)
+            for column, value in zip(columns, values):
+                column[row] = value
+        self._index(row)
+
+    def update(self, images: Mapping) -> None:
+        """Adds or replaces every record of an extract_image_data style mapping."""
+        for key, image in images.items():
+            self.add(key, image)
+
+    def _record(self, row: int) -> ImageRecord:
+        return ImageRecord(self._keys[row], self._release[row], self._version[row], self._arch[row],
+                           self._build_date[row], self._url_dir[row] + self._url_file[row],
+                           _unpack_sha256(self._sha256[row]))
+
+    def record(self, key: str) -> Optional[ImageRecord]:
+        """Returns the record of key, or None."""
+        row = self._rows.get(key)
+        return None if row is None else self._record(row)
+
+    def _rows_matching(self, release: Optional[str], arch: Optional[str], build_date: Optional[str]) -> list:
+        candidates = []
+        if release is not None and arch is not None:
+            candidates.append(self._by_release_arch.get((release, arch), _EMPTY))
+        elif release is not None:
+            candidates.append(self._by_release.get(release, _EMPTY))
+        elif arch is not None:
+            candidates.append(self._by_arch.get(arch, _EMPTY))
+        if build_date is not None:
+            candidates.append(self._by_build_date.get(build_date, _EMPTY))
+        if not candidates:
+            return list(range(len(self._keys)))
+        rows = min(candidates, key=len)
+        return [row for row in rows
+                if (release is None or release in (self._release[row], self._version[row]))
+                and (arch is None or self._arch[row] == arch)
+                and (build_date is None or self._build_date[row] == build_date)]
+
+    def select(self, release: Optional[str] = None, arch: Optional[str] = None,
+               build_date: Optional[str] = None) -> List[ImageRecord]:
+        """Returns the records matching every given criterion, in insertion order.
+
+        release matches the codename or the version number.
+        """
+        return [self._record(row) for row in self._rows_matching(release, arch, build_date)]
+
+    def latest(self, release: str, arch: str = "amd64") -> Optional[ImageRecord]:
+        """Returns the record with the newest build date for a release and arch."""
+        rows = self._rows_matching(release, arch, None)
+        row = max(rows, key=self._build_date.__getitem__, default=None)
+        return None if row is None else self._record(row)
+
+    def build_dates(self) -> List[str]:
+        """Returns the distinct build dates, oldest first."""
+        return sorted(self._by_build_date)
+
+    def __getitem__(self, key: str) -> dict:
+        row = self._rows[key]
+        return {"release": self._release[row], "version": self._version[row],
+                "build_date": self._build_date[row], "image_url": self._url_dir[row] + self._url_file[row],
+                "sha256": _unpack_sha256(self._sha256[row])}
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._rows
+
+    def __repr__(self) -> str:
+        return f"ImageCatalog({len(self)} images)"
+
+    def dump(self, f: IO[str], indent: Optional[int] = None) -> None:
+        """Writes the catalog as json.dump(dict(catalog), f, indent=indent) would, one record at a time."""
+        if not self._keys:
+            f.write("{}")
+            return
+        newline = "\n" + " " * indent if indent is not None else ""
+        separator = "," + newline if indent is not None else ", "
+        f.write("{" + newline)
+        for position, key in enumerate(self._keys):
+            record = json.dumps(self[key], indent=indent)
+            if indent is not None:
+                record = record.replace("\n", newline)
+            f.write((separator if position else "") + json.dumps(key) + ": " + record)
+        f.write(("\n" if indent is not None else "") + "}")
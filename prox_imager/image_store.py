@@ -0,0 +1,220 @@
+'''Content-addressed local store for downloaded cloud images.
+
+Images live under ``<root>/objects/<sha256[:2]>/<sha256>`` and are handed out
+as hardlinks, so products or streams that point at identical bytes share a
+single copy on disk. An SQLite index answers lookups without walking
+directories and keeps the size, last use and template references of every
+object for eviction. The hardlinks handed out are recorded as well and are
+removed together with their object, so eviction actually frees the space.
+'''
+import errno
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Iterable, Optional
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = "./images/store"
+DEFAULT_BUDGET_BYTES = 50 * 1024 ** 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    added REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS refs (
+    name TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS links (
+    path TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS refs_sha256 ON refs (sha256);
+CREATE INDEX IF NOT EXISTS links_sha256 ON links (sha256);
+CREATE INDEX IF NOT EXISTS objects_last_used ON objects (last_used);
+"""
+
+
+def _link_or_copy(src: str, dest: str) -> None:
+    """Hardlinks src to dest, copying when they are on different filesystems."""
+    try:
+        os.link(src, dest)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+        shutil.copyfile(src, dest)
+
+
+def _replace_with_link(src: str, dest: str) -> None:
+    """Atomically replaces dest with a hardlink (or copy) of src."""
+    tmp_path = dest + ".link"
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    _link_or_copy(src, tmp_path)
+    os.replace(tmp_path, dest)
+
+
+class ImageStore:
+    """Deduplicating image store with an LRU byte budget.
+
+    Objects referenced by a template (see reference) are never evicted.
+    """
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR, budget_bytes: int = DEFAULT_BUDGET_BYTES):
+        self.root = os.path.expanduser(root)
+        self.budget_bytes = budget_bytes
+        os.makedirs(os.path.join(self.root, "objects"), exist_ok=True)
+        self._lock = threading.Lock()
+        import sqlite3  # pylint: disable=import-outside-toplevel
+        self._db = sqlite3.connect(os.path.join(self.root, "index.sqlite"), check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """Closes the index database."""
+        self._db.close()
+
+    def object_path(self, sha256: str) -> str:
+        """Returns where the object with this digest is stored."""
+        sha256 = sha256.lower()
+        return os.path.join(self.root, "objects", sha256[:2], sha256)
+
+    def has(self, sha256: str) -> bool:
+        """Tells whether an object is in the store, using the index only."""
+        with self._lock:
+            row = self._db.execute("SELECT 1 FROM objects WHERE sha256 = ?", (sha256.lower(),)).fetchone()
+        return row is not None
+
+    def total_bytes(self) -> int:
+        """Returns the size of all stored objects."""
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+
+    def add(self, path: str, sha256: str, evict: bool = True) -> str:
+        """Adds a verified file to the store and returns its object path.
+
+        If the object already exists, path is replaced by a hardlink to it so
+        the duplicate bytes are released. sha256 is trusted as is: only pass
+        files that were just downloaded and checked against it. Callers adding
+        a batch pass evict=False and call evict once at the end.
+        """
+        sha256 = sha256.lower()
+        object_path = self.object_path(sha256)
+        now = time.time()
+        with self._lock:
+            known = self._db.execute("SELECT 1 FROM objects WHERE sha256 = ?", (sha256,)).fetchone()
+            if known is not None and os.path.exists(object_path):
+                if not os.path.samefile(path, object_path):
+                    _replace_with_link(object_path, path)
+                    log.info("✅ Deduplicated %s against %s", path, sha256)
+            else:
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                _replace_with_link(path, object_path)
+                log.info("✅ Stored %s as %s", path, sha256)
+            with self._db:
+                self._db.execute(
+                    "INSERT INTO objects (sha256, size, added, last_used) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (sha256) DO UPDATE SET last_used = excluded.last_used",
+                    (sha256, os.path.getsize(object_path), now, now))
+                self._record_link(path, sha256)
+        if evict:
+            self.evict(keep=[sha256])
+        return object_path
+
+    def link(self, sha256: str, dest: str) -> bool:
+        """Materializes an object at dest as a hardlink; returns False if it is not stored."""
+        sha256 = sha256.lower()
+        object_path = self.object_path(sha256)
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM objects WHERE sha256 = ?", (sha256,)).fetchone() is None:
+                return False
+            if not os.path.exists(object_path):
+                log.error("❌ Object %s is indexed but missing, dropping it", sha256)
+                with self._db:
+                    self._db.execute("DELETE FROM objects WHERE sha256 = ?", (sha256,))
+                return False
+            _replace_with_link(object_path, dest)
+            with self._db:
+                self._db.execute("UPDATE objects SET last_used = ? WHERE sha256 = ?", (time.time(), sha256))
+                self._record_link(dest, sha256)
+        return True
+
+    def _record_link(self, path: str, sha256: str) -> None:
+        self._db.execute("INSERT OR REPLACE INTO links (path, sha256) VALUES (?, ?)",
+                         (os.path.abspath(path), sha256))
+
+    def _remove_object(self, sha256: str) -> None:
+        """Deletes an object and the hardlinks to it that still share its inode."""
+        object_path = self.object_path(sha256)
+        try:
+            inode = os.stat(object_path).st_ino
+        except FileNotFoundError:
+            inode = None
+        links = self._db.execute("SELECT path FROM links WHERE sha256 = ?", (sha256,)).fetchall()
+        for (path,) in links:
+            try:
+                if inode is not None and os.stat(path).st_ino == inode:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+        try:
+            os.remove(object_path)
+        except FileNotFoundError:
+            pass
+        with self._db:
+            self._db.execute("DELETE FROM links WHERE sha256 = ?", (sha256,))
+            self._db.execute("DELETE FROM objects WHERE sha256 = ?", (sha256,))
+
+    def reference(self, name: str, sha256: str) -> None:
+        """Records that a template uses an object, protecting it from eviction."""
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO refs (name, sha256) VALUES (?, ?)", (name, sha256.lower()))
+
+    def release(self, name: str) -> None:
+        """Drops a template reference."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM refs WHERE name = ?", (name,))
+
+    def evict(self, keep: Iterable[str] = ()) -> list:
+        """Removes least recently used unreferenced objects until the store fits its budget.
+
+        Objects in keep (e.g. those a batch just linked or added) are not
+        removed either. Returns the digests of the evicted objects.
+        """
+        keep = {sha256.lower() for sha256 in keep}
+        evicted = []
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+            if total <= self.budget_bytes:
+                return evicted
+            candidates = self._db.execute(
+                "SELECT sha256, size FROM objects "
+                "WHERE sha256 NOT IN (SELECT sha256 FROM refs) ORDER BY last_used").fetchall()
+            for sha256, size in candidates:
+                if total <= self.budget_bytes:
+                    break
+                if sha256 in keep:
+                    continue
+                self._remove_object(sha256)
+                total -= size
+                evicted.append(sha256)
+                log.info("Evicted %s (%d bytes) from the image store", sha256, size)
+            if total > self.budget_bytes:
+                log.info("⚠️ Image store is %d bytes over budget, remaining objects are referenced or in use",
+                         total - self.budget_bytes)
+        return evicted
+
+
+def build_store(config: dict) -> Optional[ImageStore]:
+    """Creates an ImageStore from the [store] section, or None if it is not configured."""
+    section = config.get("store")
+    if section is None:
+        return None
+    return ImageStore(section.get("directory", DEFAULT_STORE_DIR),
+                      section.get("budget_bytes", DEFAULT_BUDGET_BYTES))
@@ -0,0 +1,238 @@
+'''Persistent on-disk HTTP cache for simplestreams metadata.'''
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from prox_imager.output import atomic_write
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = "~/.cache/prox_imager"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+
+
+class MetadataCache:
+    """Stores metadata bodies together with their ETag and Last-Modified validators.
+
+    Every cached URL is kept as two files named after the SHA-256 of the URL:
+    ``<key>.body`` holds the raw response and ``<key>.meta`` the validators and
+    bookkeeping timestamps. Callers can persist data derived from the body,
+    such as the extracted images, in ``<key>.<derived key>.extract`` files; they
+    stay valid as long as the validators do, so a 304 needs no parsing in a
+    new process. Parsed documents are memoized in-process until data derived
+    from them is stored, so long-running processes do not keep every
+    document's products tree in memory.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age: float = DEFAULT_MAX_AGE):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._parsed = {}
+        self._lock = threading.RLock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str) -> tuple:
+        base = os.path.join(self.cache_dir, key)
+        return base + ".body", base + ".meta"
+
+    def _read_meta(self, key: str) -> Optional[dict]:
+        _, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, key: str, meta: dict) -> None:
+        with atomic_write(self._paths(key)[1], "w") as f:
+            json.dump(meta, f)
+
+    def _extract_path(self, key: str, derived_key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.{self._key(derived_key)[:16]}.extract")
+
+    def _remove(self, key: str) -> None:
+        self._parsed.pop(key, None)
+        extracts = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                    if name.startswith(key + ".") and name.endswith(".extract")]
+        for path in list(self._paths(key)) + extracts:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def lookup(self, url: str) -> Optional[dict]:
+        """Returns the validators of a fresh cache entry, or None if there is none."""
+        key = self._key(url)
+        meta = self._read_meta(key)
+        if meta is None:
+            return None
+        if time.time() - meta.get("stored_at", 0) > self.max_age:
+            log.info("⚠️ Cache entry for %s expired, evicting", url)
+            self._remove(key)
+            return None
+        if not os.path.exists(self._paths(key)[0]):
+            self._remove(key)
+            return None
+        return meta
+
+    def conditional_headers(self, url: str) -> dict:
+        """Builds If-None-Match / If-Modified-Since headers for a cached URL."""
+        meta = self.lookup(url)
+        if meta is None:
+            return {}
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def revalidated(self, url: str) -> None:
+        """Restarts the max_age clock of an entry the server confirmed as current (304)."""
+        with self._lock:
+            key = self._key(url)
+            meta = self._read_meta(key)
+            if meta is None:
+                return
+            meta["stored_at"] = meta["accessed_at"] = time.time()
+            try:
+                self._write_meta(key, meta)
+            except OSError as e:
+                log.error("❌ Failed to update metadata cache entry for %s: %s", url, e)
+
+    def load_extracted(self, url: str, derived_key: str) -> Optional[dict]:
+        """Returns data stored with store_extracted if the cached body has not changed since."""
+        key = self._key(url)
+        meta = self.lookup(url)
+        if meta is None:
+            return None
+        try:
+            with open(self._extract_path(key, derived_key), "r", encoding="utf-8") as f:
+                extract = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if [extract.get("etag"), extract.get("last_modified")] != [meta.get("etag"), meta.get("last_modified")]:
+            return None
+        return extract.get("data")
+
+    def store_extracted(self, url: str, derived_key: str, data: dict) -> None:
+        """Persists data derived from the cached body of url, tied to its current validators."""
+        with self._lock:
+            key = self._key(url)
+            meta = self._read_meta(key)
+            if meta is None:
+                return
+            path = self._extract_path(key, derived_key)
+            try:
+                with atomic_write(path, "w") as f:
+                    json.dump({"etag": meta.get("etag"), "last_modified": meta.get("last_modified"),
+                               "data": data}, f)
+            except (OSError, TypeError) as e:
+                log.error("❌ Failed to write extracted metadata for %s: %s", url, e)
+                return
+            self._parsed.pop(key, None)  # a 304 now reuses the extract instead
+
+    def load(self, url: str) -> Optional[dict]:
+        """Returns the cached parsed document for a URL and marks it as used."""
+        with self._lock:
+            return self._load(url)
+
+    def _load(self, url: str) -> Optional[dict]:
+        key = self._key(url)
+        meta = self.lookup(url)
+        if meta is None:
+            return None
+        meta["accessed_at"] = time.time()
+        self._write_meta(key, meta)
+
+        memo = self._parsed.get(key)
+        if memo is not None and memo[0] == meta.get("etag"):
+            return memo[1]
+        body_path, _ = self._paths(key)
+        try:
+            with open(body_path, "rb") as f:
+                parsed = json.loads(f.read())
+        except (OSError, ValueError) as e:
+            log.error("❌ Failed to read cached metadata for %s: %s", url, e)
+            self._remove(key)
+            return None
+        self._parsed[key] = (meta.get("etag"), parsed)
+        return parsed
+
+    def store(self, url: str, body: bytes, etag: Optional[str],
+              last_modified: Optional[str], parsed: dict) -> None:
+        """Stores a response body and its validators, then applies eviction."""
+        if not etag and not last_modified:
+            return  # Nothing to revalidate against
+        with self._lock:
+            self._store(url, body, etag, last_modified, parsed)
+
+    def _store(self, url: str, body: bytes, etag: Optional[str],
+               last_modified: Optional[str], parsed: dict) -> None:
+        key = self._key(url)
+        body_path, _ = self._paths(key)
+        now = time.time()
+        try:
+            with atomic_write(body_path) as f:
+                f.write(body)
+            self._write_meta(key, {
+                "url": url,
+                "etag": etag,
+                "last_modified": last_modified,
+                "size": len(body),
+                "stored_at": now,
+                "accessed_at": now,
+            })
+        except OSError as e:
+            log.error("❌ Failed to write metadata cache entry for %s: %s", url, e)
+            self._remove(key)
+            return
+        self._parsed[key] = (etag, parsed)
+        self.evict()
+
+    def evict(self) -> None:
+        """Drops expired entries, then least recently used ones until under max_bytes."""
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".meta"):
+                continue
+            key = name[:-len(".meta")]
+            meta = self._read_meta(key)
+            if meta is None or now - meta.get("stored_at", 0) > self.max_age:
+                self._remove(key)
+                continue
+            entries.append((meta.get("accessed_at", 0), meta.get("size", 0), key))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            log.info("Evicting cached metadata %s (%d bytes)", key, size)
+            self._remove(key)
+            total -= size
+
+
+def build_cache(config: dict) -> MetadataCache:
+    """Creates a MetadataCache from the optional [cache] section of the configuration."""
+    section = config.get("cache", {})
+    return MetadataCache(section.get("directory", DEFAULT_CACHE_DIR),
+                         section.get("max_bytes", DEFAULT_MAX_BYTES),
+                         section.get("max_age", DEFAULT_MAX_AGE))
@@ -0,0 +1,194 @@
+'''Timers and counters for the fetch pipeline, exported for monitoring.
+
+Every stage records into the module-level METRICS registry. At the end of a
+run the registry is written as a Prometheus textfile (for the node_exporter
+textfile collector) and as a JSON summary, as configured in the [metrics]
+section. profiled() wraps a run in cProfile for one-off investigations.
+'''
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from prox_imager.output import atomic_write
+
+
+log = logging.getLogger(__name__)
+
+PREFIX = "prox_imager_"
+STAGE_SECONDS = "stage_seconds"
+STAGE_LAST_SECONDS = "stage_last_seconds"
+HELP = {
+    STAGE_SECONDS: "Time spent in each stage.",
+    STAGE_LAST_SECONDS: "Duration of the last run of each stage.",
+    "http_responses_total": "Metadata HTTP responses by status; 'error' when no response was received.",
+    "metadata_bytes_total": "Metadata bytes received.",
+    "metadata_cache_total": "Metadata cache lookups by result (hit, miss).",
+    "products_scanned_total": "Products read from the metadata.",
+    "products_skipped_total": "Products dropped by the filter or without a matching build.",
+    "products_kept_total": "Products that contributed at least one image.",
+    "images": "Images in the last saved output.",
+    "last_run_timestamp_seconds": "Unix time the metrics were last exported.",
+}
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+class Metrics:
+    """Thread-safe registry of counters, gauges and stage timers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.timers = {}
+
+    def reset(self) -> None:
+        """Forgets every recorded value."""
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.timers.clear()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Adds value to a counter."""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        """Sets a gauge."""
+        with self._lock:
+            self.gauges[(name, _label_key(labels))] = value
+
+    def observe(self, stage: str, seconds: float, **labels) -> None:
+        """Records one run of a stage."""
+        key = (stage, _label_key(labels))
+        with self._lock:
+            count, total, longest, _ = self.timers.get(key, (0, 0.0, 0.0, 0.0))
+            self.timers[key] = (count + 1, total + seconds, max(longest, seconds), seconds)
+
+    @contextmanager
+    def timer(self, stage: str, **labels) -> Iterator[None]:
+        """Times the enclosed block as one run of stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, **labels)
+
+    def summary(self) -> dict:
+        """Returns every recorded value as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                "timestamp": time.time(),
+                "stages": [{"stage": stage, "labels": dict(labels), "count": count, "seconds_total": total,
+                            "seconds_max": longest, "seconds_last": last}
+                           for (stage, labels), (count, total, longest, last) in sorted(self.timers.items())],
+                "counters": [{"name": name, "labels": dict(labels), "value": value}
+                             for (name, labels), value in sorted(self.counters.items())],
+                "gauges": [{"name": name, "labels": dict(labels), "value": value}
+                           for (name, labels), value in sorted(self.gauges.items())],
+            }
+
+    def to_prometheus(self) -> str:
+        """Renders every recorded value in the Prometheus text exposition format."""
+        families = {}
+        with self._lock:
+            for (stage, labels), (count, total, _, last) in sorted(self.timers.items()):
+                labels = _label_key({**dict(labels), "stage": stage})
+                families.setdefault((STAGE_SECONDS, "summary"), []).extend([
+                    (PREFIX + STAGE_SECONDS + "_count", labels, count),
+                    (PREFIX + STAGE_SECONDS + "_sum", labels, total)])
+                families.setdefault((STAGE_LAST_SECONDS, "gauge"), []).append(
+                    (PREFIX + STAGE_LAST_SECONDS, labels, last))
+            for kind, values in (("counter", self.counters), ("gauge", self.gauges)):
+                for (name, labels), value in sorted(values.items()):
+                    families.setdefault((name, kind), []).append((PREFIX + name, labels, value))
+        lines = []
+        for (name, kind), samples in families.items():
+            lines.append(f"# HELP {PREFIX}{name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+            lines.extend(f"{sample}{_format_labels(labels)} {value:.9g}" for sample, labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+def timed(stage: str) -> Callable:
+    """Decorator recording every call of the function as one run of stage in METRICS."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with METRICS.timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _write_atomic(path: str, text: str) -> bool:
+    """Writes text through a temporary file so readers never see a partial file."""
+    path = os.path.expanduser(path)
+    try:
+        with atomic_write(path, "w", makedirs=True) as f:
+            f.write(text)
+    except OSError as e:
+        log.error("❌ Failed to write metrics to %s: %s", path, e)
+        return False
+    return True
+
+
+def write_textfile(path: str, registry: Metrics = METRICS) -> bool:
+    """Writes the registry as a Prometheus textfile."""
+    return _write_atomic(path, registry.to_prometheus())
+
+
+def write_summary(path: str, registry: Metrics = METRICS) -> bool:
+    """Writes the registry as a JSON summary."""
+    return _write_atomic(path, json.dumps(registry.summary(), indent=4) + "\n")
+
+
+def export_metrics(config: dict, registry: Metrics = METRICS) -> None:
+    """Writes the files configured in the [metrics] section, if any."""
+    section = config.get("metrics", {})
+    if not section.get("textfile") and not section.get("summary_file"):
+        return
+    registry.set("last_run_timestamp_seconds", time.time())
+    if section.get("textfile") and write_textfile(section["textfile"], registry):
+        log.info("✅ Wrote Prometheus metrics to %s", section["textfile"])
+    if section.get("summary_file") and write_summary(section["summary_file"], registry):
+        log.info("✅ Wrote metrics summary to %s", section["summary_file"])
+
+
+@contextmanager
+def profiled(path: Optional[str]) -> Iterator[None]:
+    """Runs the enclosed block under cProfile and dumps the stats to path; a no-op without path."""
+    if not path:
+        yield
+        return
+    import cProfile  # pylint: disable=import-outside-toplevel
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        try:
+            profiler.dump_stats(path)
+            log.info("✅ Wrote profile to %s (inspect with python -m pstats %s)", path, path)
+        except OSError as e:
+            log.error("❌ Failed to write profile to %s: %s", path, e)
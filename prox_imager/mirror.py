@@ -0,0 +1,330 @@
+'''LAN caching mirror for simplestreams metadata and cloud images.
+
+The mirror serves the same paths as its upstream (e.g.
+https://cloud-images.ubuntu.com) from a local directory. A file that is not
+cached yet is fetched from upstream once: every client asking for it while
+the download runs shares that download and is served from the growing
+``.part`` file, so the first bytes reach the clients before the image is
+complete. Single byte ranges are supported, also while downloading. Image
+files are immutable upstream and kept as they are; metadata (``.json``
+streams) is refetched once it is older than ``metadata_ttl``, and a stale
+copy is served if the refresh fails.
+
+Clients point at the mirror with ``url`` in the [mirror] section; get_sources
+then rewrites the base URL of every source under ``upstream``, which also
+moves the image URLs built by extract_image_data to the mirror.
+'''
+import http.server
+import logging
+import os
+import posixpath
+import threading
+import time
+from typing import Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+from prox_imager.http_client import get_client
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MIRROR_CONFIG = {
+    "listen": "0.0.0.0",
+    "port": 8080,
+    "directory": "./mirror",
+    "upstream": "https://cloud-images.ubuntu.com",
+    "metadata_ttl": 300,
+}
+METADATA_SUFFIXES = (".json", ".sjson", ".gpg")
+PART_SUFFIX = ".part"
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class _Fetch:
+    """One upstream download, shared by every client asking for the same file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.part = path + PART_SUFFIX
+        self.cond = threading.Condition()
+        self.started = False
+        self.done = False
+        self.ok = False
+        self.status = None
+        self.size = None
+        self.written = 0
+
+    def wait_started(self) -> None:
+        """Blocks until upstream answered (or failed)."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.started or self.done)
+
+    def wait_for(self, offset: int) -> Tuple[int, bool]:
+        """Blocks until more than offset bytes are written or the download ended."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.written > offset or self.done)
+            return self.written, self.done
+
+    def open(self):
+        """Opens the file being written, or the finished file if it was already moved into place."""
+        try:
+            return open(self.part, "rb")
+        except FileNotFoundError:
+            return open(self.path, "rb")
+
+
+class MirrorCache:
+    """Local copy of an upstream tree with coalesced, streaming fills."""
+
+    def __init__(self, directory: str, upstream: str,
+                 metadata_ttl: float = DEFAULT_MIRROR_CONFIG["metadata_ttl"],
+                 chunk_size: int = COPY_CHUNK_SIZE):
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.upstream = upstream.rstrip("/")
+        self.metadata_ttl = metadata_ttl
+        self.chunk_size = chunk_size
+        self._fetches = {}
+        self._lock = threading.Lock()
+
+    def local_path(self, url_path: str) -> Optional[str]:
+        """Maps a request path to a file under the mirror directory; None if it escapes it."""
+        path = posixpath.normpath(unquote(url_path))
+        if not path.startswith("/") or path == "/" or "/.." in path or path.endswith(PART_SUFFIX):
+            return None
+        return os.path.join(self.directory, path.lstrip("/"))
+
+    def _is_fresh(self, path: str) -> bool:
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return False
+        if not path.endswith(METADATA_SUFFIXES):
+            return True
+        return time.time() - mtime < self.metadata_ttl
+
+    def get(self, url_path: str) -> Tuple[str, Optional[_Fetch]]:
+        """Returns the local path of url_path and the download filling it, if one runs."""
+        path = self.local_path(url_path)
+        with self._lock:
+            fetch = self._fetches.get(path)
+            if fetch is not None or self._is_fresh(path):
+                return path, fetch
+            fetch = _Fetch(path)
+            self._fetches[path] = fetch
+        threading.Thread(target=self._download, args=(url_path, fetch), daemon=True).start()
+        return path, fetch
+
+    def _download(self, url_path: str, fetch: _Fetch) -> None:
+        import requests  # pylint: disable=import-outside-toplevel
+        url = self.upstream + url_path
+        log.info("Fetching %s from upstream...", url)
+        try:
+            with get_client().stream(url) as response:
+                if response.status_code != 200:
+                    fetch.status = response.status_code
+                    log.error("❌ Upstream answered %s for %s", response.status_code, url)
+                    return
+                length = response.headers.get("Content-Length")
+                os.makedirs(os.path.dirname(fetch.path), exist_ok=True)
+                with open(fetch.part, "wb") as f:
+                    with fetch.cond:
+                        fetch.size = int(length) if length is not None and length.isdigit() else None
+                        fetch.started = True
+                        fetch.cond.notify_all()
+                    for chunk in response.iter_content(self.chunk_size):
+                        f.write(chunk)
+                        f.flush()
+                        with fetch.cond:
+                            fetch.written += len(chunk)
+                            fetch.cond.notify_all()
+            if fetch.size is not None and fetch.written != fetch.size:
+                raise OSError(f"short read: got {fetch.written} of {fetch.size} bytes")
+            os.replace(fetch.part, fetch.path)
+            fetch.ok = True
+            log.info("✅ Mirrored %s (%d bytes)", url, fetch.written)
+        except (requests.RequestException, OSError) as e:
+            log.error("❌ Failed to mirror %s: %s", url, e)
+            try:
+                os.remove(fetch.part)
+            except OSError:
+                pass
+        finally:
+            with self._lock:
+                self._fetches.pop(fetch.path, None)
+            with fetch.cond:
+                fetch.done = True
+                fetch.cond.notify_all()
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Returns the inclusive (start, end) of a single-range Range header.
+
+    Returns None when the whole file should be sent (no header, or a form
+    this server does not support) and raises ValueError if the range cannot
+    be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, sep, last = header[len("bytes="):].strip().partition("-")
+    if not sep or not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+        return None
+    if not first:
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+class MirrorHandler(http.server.BaseHTTPRequestHandler):
+    """Serves files of server.cache, filling them from upstream on demand."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "prox_imager-mirror"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        log.debug("%s - %s", self.address_string(), format % args)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Handles GET requests."""
+        self._serve(True)
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        """Handles HEAD requests."""
+        self._serve(False)
+
+    def _send_empty(self, status: int) -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _serve(self, send_body: bool) -> None:
+        cache = self.server.cache
+        url_path = urlsplit(self.path).path
+        if cache.local_path(url_path) is None:
+            self._send_empty(404)
+            return
+        path, fetch = cache.get(url_path)
+        if fetch is not None:
+            fetch.wait_started()
+            if not fetch.started or (fetch.done and not fetch.ok):
+                if os.path.exists(path):
+                    log.info("⚠️ Serving stale %s", path)
+                    fetch = None
+                else:
+                    self._send_empty(fetch.status if fetch.status in (403, 404, 410) else 502)
+                    return
+        try:
+            f = fetch.open() if fetch is not None else open(path, "rb")
+        except OSError:
+            self._send_empty(404)
+            return
+        with f:
+            self._send(f, os.fstat(f.fileno()).st_size if fetch is None else fetch.size, fetch, send_body)
+
+    def _send(self, f, size: Optional[int], fetch: Optional[_Fetch], send_body: bool) -> None:
+        range_header = self.headers.get("Range")
+        if size is None and range_header:
+            # Upstream sent no length: the size is only known once the download ends
+            fetch.wait_for(float("inf"))
+            size = fetch.written
+            if not fetch.ok:
+                self._send_empty(502)
+                return
+        status, start, end = 200, 0, (size - 1 if size is not None else None)
+        if size is not None:
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if byte_range is not None:
+                status, (start, end) = 206, byte_range
+
+        self.send_response(status)
+        self.send_header("Accept-Ranges", "bytes")
+        if size is not None:
+            self.send_header("Content-Length", str(end - start + 1))
+        else:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if not send_body:
+            return
+        try:
+            if fetch is None:
+                if end >= start:
+                    self.connection.sendfile(f, start, end - start + 1)
+            else:
+                self._stream(f, fetch, start, end)
+        except OSError as e:
+            log.info("⚠️ Transfer to %s aborted: %s", self.address_string(), e)
+            self.close_connection = True
+
+    def _stream(self, f, fetch: _Fetch, start: int, end: Optional[int]) -> None:
+        """Copies bytes start..end (or to the end) of a file while it is being downloaded."""
+        offset = start
+        while end is None or offset <= end:
+            available, done = fetch.wait_for(offset)
+            if available <= offset:
+                if done and not fetch.ok:
+                    raise OSError("upstream download failed")
+                return
+            stop = available if end is None else min(available, end + 1)
+            f.seek(offset)
+            while offset < stop:
+                chunk = f.read(min(COPY_CHUNK_SIZE, stop - offset))
+                if not chunk:
+                    raise OSError("mirrored file truncated")
+                self.wfile.write(chunk)
+                offset += len(chunk)
+
+
+class MirrorServer(http.server.ThreadingHTTPServer):
+    """Threaded HTTP server holding a MirrorCache."""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple, cache: MirrorCache):
+        super().__init__(address, MirrorHandler)
+        self.cache = cache
+
+
+def build_mirror(config: dict) -> MirrorServer:
+    """Creates a MirrorServer from the [mirror] section of the configuration."""
+    section = {**DEFAULT_MIRROR_CONFIG, **config.get("mirror", {})}
+    cache = MirrorCache(section["directory"], section["upstream"], section["metadata_ttl"])
+    return MirrorServer((section["listen"], section["port"]), cache)
+
+
+def serve(config: dict) -> None:
+    """Runs the mirror configured in [mirror] until interrupted."""
+    server = build_mirror(config)
+    log.info("✅ Mirroring %s on port %s", server.cache.upstream, server.server_address[1])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def mirrored_url(base_url: str, config: dict) -> str:
+    """Rewrites a base URL under the mirror's upstream to the mirror configured in [mirror] url."""
+    section = config.get("mirror", {})
+    mirror_url = section.get("url")
+    if not mirror_url:
+        return base_url
+    upstream = section.get("upstream", DEFAULT_MIRROR_CONFIG["upstream"]).rstrip("/")
+    if base_url != upstream and not base_url.startswith(upstream + "/"):
+        return base_url
+    return mirror_url.rstrip("/") + base_url[len(upstream):]
@@ -0,0 +1,202 @@
+'''Atomic writer and streaming reader for the metadata output files.
+
+write_output writes a document to a temporary file next to the target,
+fsyncs it and renames it over the target, so readers (also on other nodes
+sharing the directory) see the old or the new file, never a partial one.
+The [files] section selects the layout:
+
+- ``format = "json"``: indented JSON, as earlier versions wrote (default)
+- ``format = "compact"``: JSON without whitespace
+- ``format = "jsonl"``: one ``[key, value]`` line per top-level entry, so
+  records can be streamed without parsing the whole document
+
+and ``compression = "none"`` (default), ``"gzip"`` or ``"zstd"`` (needs the
+zstandard package). read_output and iter_output detect the format and the
+compression from the file contents, so readers need no configuration.
+
+atomic_write is the tmp-file, fsync and rename sequence underneath; the
+caches, state files and metrics files of the other modules use it too.
+'''
+import gzip
+import io
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import IO, Iterator, Tuple
+
+from prox_imager.stream_parser import iter_object
+
+
+FORMATS = ("json", "compact", "jsonl")
+COMPRESSIONS = ("none", "gzip", "zstd")
+DEFAULT_OUTPUT_FORMAT = {"format": "json", "compression": "none"}
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def _zstandard():
+    """Imports the optional zstandard package."""
+    try:
+        import zstandard  # pylint: disable=import-outside-toplevel
+    except ImportError as e:
+        raise ValueError("zstd compression needs the zstandard package") from e
+    return zstandard
+
+
+def output_settings(config: dict) -> dict:
+    """Returns the output format and compression of the [files] section.
+
+    Raises ValueError for unknown values, or for zstd without the zstandard package.
+    """
+    files = config.get("files", {})
+    settings = {key: files.get(key, default) for key, default in DEFAULT_OUTPUT_FORMAT.items()}
+    if settings["format"] not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}, got {settings['format']!r}")
+    if settings["compression"] not in COMPRESSIONS:
+        raise ValueError(f"compression must be one of {', '.join(COMPRESSIONS)}, got {settings['compression']!r}")
+    if settings["compression"] == "zstd":
+        _zstandard()
+    return settings
+
+
+_COMPACT = json.JSONEncoder(separators=(",", ":"))
+LINES_PER_PIECE = 1024
+
+
+def _encode(data: dict, output_format: str) -> Iterator[str]:
+    """Yields the serialized document in pieces.
+
+    The compact forms use one shared encoder, which runs the C
+    implementation; jsonl lines are yielded in batches to keep writes large.
+    """
+    if output_format == "json":
+        yield json.dumps(data, indent=4)
+    elif output_format == "compact":
+        yield _COMPACT.encode(data)
+    elif output_format == "jsonl":
+        lines = []
+        for key, value in data.items():
+            lines.append(_COMPACT.encode([key, value]))
+            if len(lines) == LINES_PER_PIECE:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+    else:
+        raise ValueError(f"Unknown output format: {output_format}")
+
+
+def _compressor(raw: IO[bytes], compression: str) -> IO[bytes]:
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0)
+    if compression == "zstd":
+        return _zstandard().ZstdCompressor().stream_writer(raw, closefd=False)
+    if compression == "none":
+        return raw
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+def fsync_directory(path: str) -> None:
+    """Makes a rename in path durable; not every platform allows opening directories."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = "wb", makedirs: bool = False) -> Iterator[IO]:
+    """Opens a temporary file next to path and renames it over path when the block ends.
+
+    The file is fsynced before the rename and the directory after it. If the
+    block raises, the temporary file is removed and path is left untouched.
+    Text modes write UTF-8; makedirs creates missing parent directories.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    if makedirs:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    # Created through os.open so the file gets the usual umask-based mode, unlike mkstemp's 0600
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fd, mode, encoding=None if "b" in mode else "utf-8") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    fsync_directory(directory)
+
+
+def write_output(data: dict, path: str, output_format: str = "json", compression: str = "none") -> None:
+    """Writes data to path atomically in the given format and compression.
+
+    Raises OSError, TypeError or ValueError; the target is left untouched then.
+    """
+    with atomic_write(path) as raw:
+        stream = _compressor(raw, compression)
+        for piece in _encode(data, output_format):
+            stream.write(piece.encode("utf-8"))
+        if stream is not raw:
+            stream.close()
+
+
+def open_output(path: str) -> IO[bytes]:
+    """Opens an output file as a buffered binary stream, decompressing it if needed."""
+    with open(path, "rb") as f:
+        magic = f.read(len(ZSTD_MAGIC))
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.open(path, "rb")
+    if magic == ZSTD_MAGIC:
+        reader = _zstandard().ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return io.BufferedReader(reader)
+    return open(path, "rb")
+
+
+def _is_lines(stream: IO[bytes]) -> bool:
+    """Tells whether an opened output file is line-delimited, without consuming anything."""
+    head = stream.peek(64).lstrip()
+    return not head or head.startswith(b"[")  # an empty mapping is written as an empty jsonl file
+
+
+def _iter_lines(stream: IO[bytes]) -> Iterator[Tuple[str, object]]:
+    for line in stream:
+        if line.strip():
+            key, value = json.loads(line)
+            yield key, value
+
+
+def iter_output(path: str) -> Iterator[Tuple[str, object]]:
+    """Yields the (key, value) entries of an output file one at a time, without a full parse.
+
+    Raises OSError or ValueError if the file cannot be read or decoded.
+    """
+    with open_output(path) as stream:
+        if _is_lines(stream):
+            yield from _iter_lines(stream)
+        else:
+            yield from iter_object(iter(lambda: stream.read(READ_CHUNK_SIZE), b""))
+
+
+def read_output(path: str) -> object:
+    """Loads a whole output file written by write_output, in any format.
+
+    Raises OSError or ValueError if the file cannot be read or decoded.
+    """
+    with open_output(path) as stream:
+        if _is_lines(stream):
+            return dict(_iter_lines(stream))
+        return json.load(stream)
@@ -0,0 +1,315 @@
+'''Concurrent pipeline turning extracted images into Proxmox templates.
+
+Every image from extract_image_data becomes a job that flows through four
+stages: download, verify, convert (format conversion and resize with
+qemu-img) and import (VM creation, disk import and template conversion on
+Proxmox). Stages run in their own worker threads, connected by bounded
+queues, so downloads, hashing, conversion and storage writes of different
+images overlap while the queues keep work in progress bounded. A job that
+fails leaves the pipeline with its error; the other jobs continue.
+
+The Proxmox side goes through a ProxmoxBackend. QmBackend drives the ``qm``
+and ``pvesh`` commands on a Proxmox node; other backends (e.g. an API
+client, or a stub in tests) are selected with ``backend`` in [pipeline].
+When ``storage`` is a directory storage, setting ``staging_dir`` to its path
+lets QmBackend copy the disk straight into place as the VM's volume with
+staging.stage_file, which skips the zero regions of the image, instead of
+having ``qm`` import (and copy) it.
+'''
+import importlib
+import logging
+import os
+import queue
+import re
+import shlex
+import subprocess
+import threading
+from typing import Callable, Iterable, List, Optional
+
+from prox_imager.downloader import (
+    DEFAULT_BLOCK_SIZE,
+    DEFAULT_DOWNLOAD_DIR,
+    DEFAULT_SEGMENTS,
+    download_image,
+    image_filename,
+)
+from prox_imager.image_model import arch_of
+from prox_imager.image_store import build_store
+from prox_imager.staging import stage_file
+from prox_imager.verify import DEFAULT_HASH_CACHE, HashCache, hash_file
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PIPELINE_CONFIG = {
+    "download_workers": 2,
+    "verify_workers": 2,
+    "convert_workers": 2,
+    "import_workers": 1,
+    "queue_size": 2,
+    "work_dir": "./images/work",
+    "format": "",            # qemu-img output format; empty keeps the downloaded file
+    "disk_size": "",         # e.g. "20G"; empty keeps the image size
+    "staging_dir": "",       # path of the directory storage named by storage; empty imports with qm
+    "qemu_img": "qemu-img",
+    "backend": "qm",
+    "storage": "local-lvm",
+    "memory": 2048,
+    "cores": 2,
+    "bridge": "vmbr0",
+    "name_template": "{release}-{arch}-{build_date}-{item}",
+}
+_DONE = object()
+
+
+class ProxmoxBackend:
+    """Creates templates on Proxmox; subclasses implement the actual calls."""
+
+    def template_exists(self, name: str) -> bool:
+        """Tells whether a VM or template with this name already exists."""
+        return False
+
+    def create_template(self, name: str, disk: str, settings: dict) -> int:
+        """Creates a VM from disk, turns it into a template named name and returns its VMID."""
+        raise NotImplementedError
+
+
+class QmBackend(ProxmoxBackend):
+    """Backend running ``qm``/``pvesh`` on the local Proxmox node."""
+
+    def __init__(self, runner: Callable = subprocess.run):
+        self.runner = runner
+        self._lock = threading.Lock()
+
+    def _run(self, *args: str) -> str:
+        log.info("Running %s", shlex.join(args))
+        result = self.runner(list(args), check=True, capture_output=True, text=True)
+        return result.stdout
+
+    def template_exists(self, name: str) -> bool:
+        for line in self._run("qm", "list").splitlines()[1:]:
+            fields = line.split()
+            if len(fields) > 1 and fields[1] == name:
+                return True
+        return False
+
+    def create_template(self, name: str, disk: str, settings: dict) -> int:
+        # nextid is only reserved once the VM exists, so allocation and creation must not interleave
+        with self._lock:
+            vmid = int(self._run("pvesh", "get", "/cluster/nextid").strip())
+            self._run("qm", "create", str(vmid), "--name", name,
+                      "--memory", str(settings["memory"]), "--cores", str(settings["cores"]),
+                      "--net0", f"virtio,bridge={settings['bridge']}", "--scsihw", "virtio-scsi-pci",
+                      "--serial0", "socket", "--vga", "serial0", "--agent", "1")
+        volume_path = None
+        try:
+            storage = settings["storage"]
+            if settings.get("staging_dir"):
+                # Written in place as the VM's volume on the directory storage, so nothing copies it again
+                volume = f"{vmid}/vm-{vmid}-disk-0.{settings.get('format') or 'qcow2'}"
+                volume_path = os.path.join(settings["staging_dir"], "images", volume)
+                os.makedirs(os.path.dirname(volume_path), exist_ok=True)
+                stage_file(disk, volume_path)
+                scsi0 = f"{storage}:{volume}"
+            else:
+                scsi0 = f"{storage}:0,import-from={os.path.abspath(disk)}"
+            self._run("qm", "set", str(vmid), "--scsi0", scsi0,
+                      "--ide2", f"{storage}:cloudinit", "--boot", "order=scsi0")
+            self._run("qm", "template", str(vmid))
+        except (OSError, subprocess.CalledProcessError):
+            self._run("qm", "destroy", str(vmid), "--purge")
+            if volume_path is not None and os.path.exists(volume_path):
+                os.remove(volume_path)
+            raise
+        return vmid
+
+
+BACKENDS = {"qm": QmBackend}
+
+
+def load_backend(name: str) -> ProxmoxBackend:
+    """Instantiates a backend by short name or as ``package.module:Class``."""
+    if name in BACKENDS:
+        return BACKENDS[name]()
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown pipeline backend: {name}")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class Pipeline:
+    """Runs jobs through stages of worker threads joined by bounded queues.
+
+    ``stages`` is a list of (name, function, workers). A stage function gets
+    the job dict and returns True to pass it on; on False or an exception the
+    job leaves the pipeline with its ``error`` set.
+    """
+
+    def __init__(self, stages: List[tuple], queue_size: int = DEFAULT_PIPELINE_CONFIG["queue_size"]):
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.results = []
+        self._results_lock = threading.Lock()
+
+    def _finish(self, job: dict) -> None:
+        with self._results_lock:
+            self.results.append(job)
+
+    def _worker(self, name: str, func: Callable, inbox: queue.Queue,
+                outbox: Optional[queue.Queue], remaining: list, lock: threading.Lock) -> None:
+        while True:
+            job = inbox.get()
+            if job is _DONE:
+                inbox.put(_DONE)  # let the sibling workers see it too
+                break
+            try:
+                ok = func(job)
+                if not ok and not job.get("error"):
+                    job["error"] = f"{name} failed"
+            except Exception as e:  # pylint: disable=broad-except
+                log.error("❌ %s failed for %s: %s", name, job.get("product"), e)
+                job["error"] = f"{name}: {e}"
+                ok = False
+            if ok and outbox is not None:
+                outbox.put(job)
+            else:
+                self._finish(job)
+        with lock:
+            remaining[0] -= 1
+            if remaining[0] == 0 and outbox is not None:
+                outbox.put(_DONE)
+
+    def run(self, jobs: Iterable[dict]) -> list:
+        """Feeds jobs through every stage and returns them once all are finished."""
+        self.results = []
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        threads = []
+        for index, (name, func, workers) in enumerate(self.stages):
+            outbox = queues[index + 1] if index + 1 < len(queues) else None
+            remaining = [max(1, workers)]
+            lock = threading.Lock()
+            for number in range(remaining[0]):
+                thread = threading.Thread(target=self._worker, name=f"{name}-{number}",
+                                          args=(name, func, queues[index], outbox, remaining, lock), daemon=True)
+                thread.start()
+                threads.append(thread)
+        for job in jobs:
+            queues[0].put(job)
+        queues[0].put(_DONE)
+        for thread in threads:
+            thread.join()
+        return self.results
+
+
+def template_name(product: str, image: dict, name_template: str) -> str:
+    """Formats a template name from an image record; Proxmox only allows DNS-style names.
+
+    Besides the record fields, name_template can use product, arch and item
+    (the artifact of ``<product>:<item type>`` keys, empty otherwise).
+    """
+    parts = product.split(":")
+    fields = {"arch": arch_of(product), "item": parts[4] if len(parts) > 4 else "", **image, "product": product}
+    name = name_template.format(**fields)
+    return re.sub(r"[^A-Za-z0-9.]+", "-", name).strip("-.")
+
+
+def build_templates(images: dict, config: dict, backend: Optional[ProxmoxBackend] = None) -> dict:
+    """Builds a template from every image; returns product to VMID (None for skipped or failed)."""
+    settings = {**DEFAULT_PIPELINE_CONFIG, **config.get("pipeline", {})}
+    download_config = config.get("download", {})
+    dest_dir = download_config.get("directory", DEFAULT_DOWNLOAD_DIR)
+    hash_cache = HashCache(config.get("verify", {}).get("cache_file", DEFAULT_HASH_CACHE))
+    hash_lock = threading.Lock()
+    try:
+        backend = backend or load_backend(settings["backend"])
+    except (ImportError, AttributeError, ValueError) as e:
+        log.error("❌ Invalid [pipeline] backend: %s", e)
+        return {}
+    store = build_store(config)
+    os.makedirs(dest_dir, exist_ok=True)
+    os.makedirs(settings["work_dir"], exist_ok=True)
+
+    def download(job: dict) -> bool:
+        image = job["image"]
+        job["path"] = os.path.join(dest_dir, image_filename(image["image_url"]))
+        return download_image(image["image_url"], job["path"], image.get("sha256", ""),
+                              download_config.get("segments", DEFAULT_SEGMENTS),
+                              download_config.get("block_size", DEFAULT_BLOCK_SIZE),
+                              download_config.get("timeout"), hash_cache, store)
+
+    def verify(job: dict) -> bool:
+        # A fresh download recorded its digest, so this only hashes files that changed since
+        st = os.stat(job["path"])
+        with hash_lock:
+            digest = hash_cache.get(job["path"], st)
+        if digest is None:
+            digest = hash_file(job["path"])
+            with hash_lock:
+                hash_cache.put(job["path"], st, digest)
+        if digest != job["image"]["sha256"].lower():
+            job["error"] = f"checksum mismatch for {job['path']}"
+            return False
+        return True
+
+    def convert(job: dict) -> bool:
+        job["disk"] = job["path"]
+        if settings["format"]:
+            job["disk"] = os.path.join(settings["work_dir"], f"{job['name']}.{settings['format']}")
+            subprocess.run([settings["qemu_img"], "convert", "-O", settings["format"], job["path"], job["disk"]],
+                           check=True, capture_output=True)
+        if settings["disk_size"]:
+            if job["disk"] == job["path"]:
+                # Never resize the downloaded (verified, possibly store-linked) file in place
+                job["disk"] = os.path.join(settings["work_dir"], os.path.basename(job["path"]))
+                stage_file(job["path"], job["disk"])
+            subprocess.run([settings["qemu_img"], "resize", job["disk"], settings["disk_size"]],
+                           check=True, capture_output=True)
+        return True
+
+    def import_template(job: dict) -> bool:
+        try:
+            job["vmid"] = backend.create_template(job["name"], job["disk"], settings)
+            log.info("✅ Created template %s (%s) from %s", job["name"], job["vmid"], job["product"])
+            if store is not None:
+                # The image stays in the store for as long as the template exists
+                store.reference(job["name"], job["image"]["sha256"])
+        finally:
+            if job["disk"] != job["path"]:
+                os.remove(job["disk"])
+        return True
+
+    names = {}
+    for product, image in images.items():
+        names.setdefault(template_name(product, image, settings["name_template"]), []).append(product)
+    jobs = []
+    results = {}
+    for name, products in names.items():
+        if len(products) > 1:
+            log.error("❌ %s would all become template %s, skipping them; add {product}, {arch} or {item} "
+                      "to [pipeline] name_template", ", ".join(products), name)
+            results.update(dict.fromkeys(products))
+            continue
+        product = products[0]
+        image = images[product]
+        if backend.template_exists(name):
+            log.info("✅ Template %s already exists, skipping %s", name, product)
+            results[product] = None
+            continue
+        jobs.append({"product": product, "image": image, "name": name, "vmid": None, "error": None})
+
+    pipeline = Pipeline([("download", download, settings["download_workers"]),
+                         ("verify", verify, settings["verify_workers"]),
+                         ("convert", convert, settings["convert_workers"]),
+                         ("import", import_template, settings["import_workers"])],
+                        settings["queue_size"])
+    finished = pipeline.run(jobs)
+    hash_cache.save()
+    if store is not None:
+        store.evict(keep=[job["image"]["sha256"] for job in jobs])
+        store.close()
+    for job in finished:
+        results[job["product"]] = job["vmid"]
+        if job["error"]:
+            log.error("❌ Failed to build a template from %s: %s", job["product"], job["error"])
+    log.info("✅ Built %s of %s templates", sum(1 for job in pipeline.results if not job["error"]), len(jobs))
+    return results
@@ -0,0 +1,142 @@
+'''Sparse-aware copies of image files onto Proxmox storage.
+
+Cloud images and raw conversions are mostly zeros. stage_file copies only
+the allocated extents of the source, found with SEEK_DATA/SEEK_HOLE, and
+leaves holes in the target for the rest. Extents are moved inside the
+kernel with copy_file_range (which may also share blocks on filesystems
+supporting reflinks), then sendfile; when neither is supported for the
+pair of files, a pread/pwrite loop is used that still skips zero blocks.
+The target appears under its final name only once it is complete.
+'''
+import errno
+import logging
+import os
+import time
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from prox_imager.metrics import METRICS
+from prox_imager.output import atomic_write
+
+
+log = logging.getLogger(__name__)
+
+COPY_CHUNK_SIZE = 1024 ** 3           # bytes per copy_file_range/sendfile call
+READ_CHUNK_SIZE = 1024 * 1024         # bytes per pread in the fallback loop
+_ZEROS = bytes(READ_CHUNK_SIZE)
+# Errors meaning "not for these files", after which the next method is tried
+_UNSUPPORTED = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOTSOCK,
+                errno.EBADF, errno.EPERM}
+
+
+def data_extents(fd: int, size: int) -> Iterator[Tuple[int, int]]:
+    """Yields the (offset, length) of the allocated regions of an open file.
+
+    Where SEEK_DATA/SEEK_HOLE are not supported, the rest of the file is one extent.
+    """
+    offset = 0
+    while offset < size:
+        try:
+            start = os.lseek(fd, offset, os.SEEK_DATA)
+        except AttributeError:
+            yield offset, size - offset
+            return
+        except OSError as e:
+            if e.errno == errno.ENXIO:  # only a hole is left
+                return
+            if e.errno not in _UNSUPPORTED:
+                raise
+            yield offset, size - offset
+            return
+        end = min(os.lseek(fd, start, os.SEEK_HOLE), size)
+        if start >= end:
+            return
+        yield start, end - start
+        offset = end
+
+
+def _copy_file_range(src_fd: int, dst_fd: int, offset: int, length: int) -> int:
+    end = offset + length
+    while offset < end:
+        copied = os.copy_file_range(src_fd, dst_fd, min(end - offset, COPY_CHUNK_SIZE), offset, offset)
+        if copied == 0:  # e.g. files whose size is not known to the kernel
+            raise OSError(errno.EINVAL, "copy_file_range made no progress")
+        offset += copied
+    return length
+
+
+def _sendfile(src_fd: int, dst_fd: int, offset: int, length: int) -> int:
+    end = offset + length
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    while offset < end:
+        sent = os.sendfile(dst_fd, src_fd, offset, min(end - offset, COPY_CHUNK_SIZE))
+        if sent == 0:
+            raise OSError(errno.EINVAL, "sendfile made no progress")
+        offset += sent
+    return length
+
+
+def _read_write(src_fd: int, dst_fd: int, offset: int, length: int) -> int:
+    """Copies through userspace, leaving holes for zero blocks; returns the bytes written."""
+    written = 0
+    end = offset + length
+    while offset < end:
+        chunk = os.pread(src_fd, min(end - offset, READ_CHUNK_SIZE), offset)
+        if not chunk:
+            raise OSError(errno.EIO, f"unexpected end of file at {offset}")
+        if chunk != _ZEROS[:len(chunk)]:
+            view = memoryview(chunk)
+            while view:
+                count = os.pwrite(dst_fd, view, offset)
+                view = view[count:]
+                offset += count
+                written += count
+        else:
+            offset += len(chunk)
+    return written
+
+
+def copy_methods() -> List[Tuple[str, Callable]]:
+    """Returns the copy methods available on this platform, preferred first."""
+    methods = []
+    if hasattr(os, "copy_file_range"):
+        methods.append(("copy_file_range", _copy_file_range))
+    if hasattr(os, "sendfile"):
+        methods.append(("sendfile", _sendfile))
+    methods.append(("read_write", _read_write))
+    return methods
+
+
+def stage_file(src: str, dest: str, methods: Optional[List[Tuple[str, Callable]]] = None) -> dict:
+    """Copies src to dest, keeping holes, and returns what was copied how fast.
+
+    The result has the file size in ``bytes``, the bytes actually written in
+    ``copied``, the ``method`` used last, ``seconds`` and ``mib_per_s``
+    (file size over wall time). Raises OSError; dest is left untouched then.
+    """
+    methods = list(methods or copy_methods())
+    start = time.perf_counter()
+    copied = 0
+    with open(src, "rb") as source, atomic_write(dest) as target:
+        src_fd, dst_fd = source.fileno(), target.fileno()
+        size = os.fstat(src_fd).st_size
+        for offset, length in data_extents(src_fd, size):
+            while True:
+                name, copy = methods[0]
+                try:
+                    copied += copy(src_fd, dst_fd, offset, length)
+                    break
+                except OSError as e:
+                    if e.errno not in _UNSUPPORTED or len(methods) == 1:
+                        raise
+                    log.warning("⚠️ %s is not supported for %s (%s), falling back to %s",
+                                name, dest, e, methods[1][0])
+                    methods.pop(0)
+        os.ftruncate(dst_fd, size)
+    seconds = time.perf_counter() - start
+    result = {"bytes": size, "copied": copied, "method": methods[0][0], "seconds": seconds,
+              "mib_per_s": size / 1024 ** 2 / seconds if seconds > 0 else 0.0}
+    METRICS.observe("stage_file", seconds)
+    METRICS.inc("staged_bytes_total", copied, method=result["method"])
+    log.info("✅ Staged %s to %s: %.1f of %.1f MiB written in %.2fs (%.0f MiB/s, %s)", src, dest,
+             copied / 1024 ** 2, size / 1024 ** 2, seconds, result["mib_per_s"], result["method"])
+    return result
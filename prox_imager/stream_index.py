@@ -0,0 +1,84 @@
+'''Simplestreams index.json lookups for partial refreshes.
+
+A simplestreams tree publishes a small ``streams/v1/index.json`` listing
+every content stream with the time it was last ``updated``. Reading it first
+tells which product streams changed since the last run, so the (much larger)
+streams that did not change need neither a download nor a parse: their
+extracted images are kept in an IndexState file together with the
+``updated`` value they were extracted from.
+'''
+import json
+import logging
+import os
+from typing import Optional
+
+from prox_imager.output import atomic_write
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = "/streams/v1/index.json"
+DEFAULT_INDEX_STATE = "~/.cache/prox_imager/stream_index.json"
+
+
+def index_url(source: dict) -> str:
+    """Returns the URL of the index.json describing a source's metadata stream."""
+    return source['base_url'] + DEFAULT_INDEX_PATH
+
+
+def stream_updated(index: dict, metadata_url: str) -> Optional[str]:
+    """Returns the ``updated`` value the index lists for the stream at metadata_url, if any."""
+    path = metadata_url.lstrip("/")
+    entries = index.get("index") if isinstance(index, dict) else None
+    if not isinstance(entries, dict):
+        return None
+    for entry in entries.values():
+        if isinstance(entry, dict) and entry.get("path", "").lstrip("/") == path:
+            return entry.get("updated")
+    return None
+
+
+class IndexState:
+    """Persistent map of stream URL to the ``updated`` value and images extracted from it."""
+
+    def __init__(self, state_file: str = DEFAULT_INDEX_STATE):
+        self.state_file = os.path.expanduser(state_file)
+        self._entries = {}
+        self._dirty = False
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            log.error("❌ Failed to read stream index state %s: %s", self.state_file, e)
+
+    def unchanged(self, url: str, derived_key: str, updated: Optional[str]) -> Optional[dict]:
+        """Returns the images extracted from url if it is still at updated, else None."""
+        entry = self._entries.get(url)
+        if updated is None or not isinstance(entry, dict):
+            return None
+        if entry.get("updated") != updated or entry.get("key") != derived_key:
+            return None
+        return entry.get("images")
+
+    def put(self, url: str, derived_key: str, updated: str, images: dict) -> None:
+        """Remembers the images extracted from url at updated."""
+        self._entries[url] = {"updated": updated, "key": derived_key, "images": images}
+        self._dirty = True
+
+    def save(self) -> None:
+        """Writes the state to disk if it changed."""
+        if not self._dirty:
+            return
+        try:
+            with atomic_write(self.state_file, "w", makedirs=True) as f:
+                json.dump(self._entries, f)
+            self._dirty = False
+        except OSError as e:
+            log.error("❌ Failed to save stream index state %s: %s", self.state_file, e)
+
+
+def build_index_state(config: dict) -> IndexState:
+    """Creates the IndexState configured in the [index] section."""
+    return IndexState(config.get('index', {}).get('state_file', DEFAULT_INDEX_STATE))
@@ -0,0 +1,125 @@
+'''Incremental parser for simplestreams product documents.
+
+The parser walks the top level of a ``download.json`` document and yields
+one ``(product, details)`` pair at a time, so only a single product has to be
+held in memory instead of the whole ``products`` tree.
+'''
+import codecs
+import json
+import re
+from typing import Iterable, Iterator, Tuple
+
+
+_DECODER = json.JSONDecoder()
+_NON_WHITESPACE = re.compile(r"\S")
+
+
+class _ChunkReader:
+    """Buffers decoded chunks and decodes complete JSON values from them.
+
+    Values are decoded with the C ``raw_decode``; when a value is cut off by
+    the end of the buffer, the buffer is grown to at least twice its size
+    before retrying, which keeps the total decoding work linear.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _grow(self, min_chars: int) -> None:
+        """Drops consumed text and reads until min_chars are buffered or EOF."""
+        parts = [self.buf[self.pos:]]
+        size = len(parts[0])
+        while size < min_chars and not self.eof:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                text = self._utf8.decode(b"", final=True)
+                self.eof = True
+            else:
+                text = self._utf8.decode(chunk)
+            parts.append(text)
+            size += len(text)
+        self.buf = "".join(parts)
+        self.pos = 0
+
+    def peek(self) -> str:
+        """Skips whitespace and returns the next character without consuming it."""
+        while True:
+            match = _NON_WHITESPACE.search(self.buf, self.pos)
+            if match is not None:
+                self.pos = match.start()
+                return self.buf[self.pos]
+            if self.eof:
+                raise ValueError("Unexpected end of metadata stream")
+            self.pos = len(self.buf)
+            self._grow(1)
+
+    def expect(self, char: str) -> None:
+        """Consumes the next non-whitespace character, which must be ``char``."""
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} in metadata stream")
+        self.pos += 1
+
+    def read_value(self):
+        """Consumes and returns the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._grow(2 * (len(self.buf) - self.pos))
+                continue
+            if end == len(self.buf) and not self.eof and isinstance(value, (int, float)):
+                # A number may continue in the next chunk
+                self._grow(len(self.buf) - self.pos + 1)
+                continue
+            self.pos = end
+            return value
+
+
+def _iter_members(reader: _ChunkReader) -> Iterator[str]:
+    """Yields the keys of the object at the reader position, leaving values to the caller."""
+    reader.expect("{")
+    if reader.peek() == "}":
+        reader.pos += 1
+        return
+    while True:
+        if reader.peek() != '"':
+            raise ValueError("Expected an object key in metadata stream")
+        key = reader.read_value()
+        reader.expect(":")
+        yield key
+        if reader.peek() == ",":
+            reader.pos += 1
+            continue
+        reader.expect("}")
+        return
+
+
+def iter_object(chunks: Iterable[bytes]) -> Iterator[Tuple[str, object]]:
+    """Yields the ``(key, value)`` pairs of a top-level JSON object read in chunks.
+
+    Raises ValueError if the document is not valid JSON.
+    """
+    reader = _ChunkReader(chunks)
+    for key in _iter_members(reader):
+        yield key, reader.read_value()
+
+
+def iter_products(chunks: Iterable[bytes]) -> Iterator[Tuple[str, dict]]:
+    """Yields ``(product, details)`` pairs from a simplestreams document read in chunks.
+
+    Raises ValueError if the document is not valid JSON.
+    """
+    reader = _ChunkReader(chunks)
+    for key in _iter_members(reader):
+        if key != "products" or reader.peek() != "{":
+            reader.read_value()
+            continue
+        for product in _iter_members(reader):
+            yield product, reader.read_value()
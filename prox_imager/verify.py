@@ -0,0 +1,155 @@
+'''Verifies local image files against their SHA-256 checksums.
+
+Digests are remembered in a persistent hash cache keyed by path, size,
+mtime and inode, so unchanged files are never read again. Cache misses are
+hashed in a process pool with memory-mapped reads.
+'''
+import hashlib
+import json
+import logging
+import mmap
+import os
+from typing import Optional
+
+from prox_imager.downloader import image_filename
+from prox_imager.output import atomic_write
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_HASH_CACHE = "~/.cache/prox_imager/hashes.json"
+DEFAULT_CHUNK_SIZE = 16 * 1024 * 1024
+
+
+class HashCache:
+    """Persistent map of file identity (path, size, mtime, inode) to SHA-256."""
+
+    def __init__(self, cache_file: str = DEFAULT_HASH_CACHE):
+        self.cache_file = os.path.expanduser(cache_file)
+        self._entries = {}
+        self._dirty = False
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            log.error("❌ Failed to read hash cache %s: %s", self.cache_file, e)
+
+    @staticmethod
+    def _identity(st: os.stat_result) -> list:
+        return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+    def get(self, path: str, st: os.stat_result) -> Optional[str]:
+        """Returns the cached digest of path if the file has not changed."""
+        entry = self._entries.get(os.path.abspath(path))
+        if entry is None or entry[:3] != self._identity(st):
+            return None
+        return entry[3]
+
+    def put(self, path: str, st: os.stat_result, digest: str) -> None:
+        """Remembers the digest of path for its current identity."""
+        self._entries[os.path.abspath(path)] = self._identity(st) + [digest]
+        self._dirty = True
+
+    def save(self) -> None:
+        """Writes the cache to disk if it changed."""
+        if not self._dirty:
+            return
+        try:
+            with atomic_write(self.cache_file, "w", makedirs=True) as f:
+                json.dump(self._entries, f)
+            self._dirty = False
+        except OSError as e:
+            log.error("❌ Failed to save hash cache %s: %s", self.cache_file, e)
+
+
+def hash_file(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> str:
+    """Returns the SHA-256 hex digest of a file, read through a memory map."""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hasher.hexdigest()
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                hasher.update(chunk)
+            return hasher.hexdigest()
+    with mapped:
+        if hasattr(mapped, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        with memoryview(mapped) as view:
+            for offset in range(0, len(view), chunk_size):
+                hasher.update(view[offset:offset + chunk_size])
+    return hasher.hexdigest()
+
+
+def _try_hash_file(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Optional[str]:
+    """Returns the digest of path, or None if it cannot be read."""
+    try:
+        return hash_file(path, chunk_size)
+    except OSError as e:
+        log.error("❌ Failed to read %s: %s", path, e)
+        return None
+
+
+def verify_files(expected: dict, cache: Optional[HashCache] = None,
+                 workers: Optional[int] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """Checks files against expected SHA-256 digests.
+
+    ``expected`` maps paths to hex digests. Returns a mapping of path to
+    True/False; missing and unreadable files are reported as False.
+    """
+    results = {}
+    misses = []
+    for path, digest in expected.items():
+        try:
+            st = os.stat(path)
+        except OSError:
+            log.info("⚠️ %s is missing", path)
+            results[path] = False
+            continue
+        cached = cache.get(path, st) if cache is not None else None
+        if cached is not None:
+            results[path] = cached == digest.lower()
+            if not results[path]:
+                log.error("❌ Checksum mismatch for %s", path)
+        else:
+            misses.append((path, st))
+
+    if misses:
+        log.info("Hashing %d of %d files...", len(misses), len(expected))
+        paths = [path for path, _ in misses]
+        if len(misses) == 1:
+            digests = [_try_hash_file(paths[0], chunk_size)]
+        else:
+            # multiprocessing is slow to import, so it is only loaded when needed
+            from concurrent.futures import ProcessPoolExecutor  # pylint: disable=import-outside-toplevel
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                digests = list(executor.map(_try_hash_file, paths, [chunk_size] * len(paths)))
+        for (path, st), digest in zip(misses, digests):
+            if digest is None:
+                results[path] = False
+                continue
+            if cache is not None:
+                cache.put(path, st, digest)
+            results[path] = digest == expected[path].lower()
+            if not results[path]:
+                log.error("❌ Checksum mismatch for %s", path)
+
+    if cache is not None:
+        cache.save()
+    log.info("✅ Verified %s of %s files", sum(results.values()), len(results))
+    return results
+
+
+def verify_images(images: dict, dest_dir: str, cache: Optional[HashCache] = None,
+                  workers: Optional[int] = None) -> dict:
+    """Verifies downloaded images from extract_image_data; returns product to True/False."""
+    paths = {product: os.path.join(dest_dir, image_filename(image["image_url"]))
+             for product, image in images.items()}
+    results = verify_files({paths[product]: image.get("sha256", "")
+                            for product, image in images.items()}, cache, workers)
+    return {product: results[path] for product, path in paths.items()}
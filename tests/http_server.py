@@ -0,0 +1,103 @@
+'''Local HTTP server used as a stand-in for the image mirrors in tests.'''
+import http.server
+import threading
+import time
+
+
+class FileHandler(http.server.BaseHTTPRequestHandler):
+    '''Serves in-memory files from server.files with optional Range support.'''
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def _send_file(self, send_body: bool):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.command, self.path, dict(self.headers), self.client_address))
+            failure = server.failures.pop(0) if server.failures else None
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            if server.delay:
+                time.sleep(server.delay)
+            self._respond(failure, send_body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _respond(self, failure, send_body: bool):
+        server = self.server
+        if failure is not None:
+            self.send_response(failure)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        data = server.files.get(self.path)
+        if data is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end, status = 0, len(data) - 1, 200
+        range_header = self.headers.get("Range")
+        if server.ranges and range_header and range_header.startswith("bytes="):
+            first, _, last = range_header[len("bytes="):].partition("-")
+            start = int(first)
+            end = min(int(last), len(data) - 1) if last else len(data) - 1
+            status = 206
+        body = data[start:end + 1]
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        if server.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        '''Handles GET requests.'''
+        self._send_file(True)
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        '''Handles HEAD requests.'''
+        self._send_file(False)
+
+
+class LocalServer:
+    '''Runs a threaded HTTP server on a free localhost port.'''
+
+    def __init__(self, files: dict, ranges: bool = True, handler=FileHandler):
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.files = files
+        self.httpd.ranges = ranges
+        self.httpd.failures = []
+        self.httpd.delay = 0
+        self.httpd.active = 0
+        self.httpd.max_active = 0
+        self.httpd.requests = []
+        self.httpd.lock = threading.Lock()
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+
+    @property
+    def requests(self) -> list:
+        '''Returns the (method, path, headers, client_address) of every request served.'''
+        return self.httpd.requests
+
+    def fail_next(self, *statuses: int) -> None:
+        '''Makes the next requests fail with the given HTTP statuses; None lets a request through.'''
+        self.httpd.failures.extend(statuses)
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
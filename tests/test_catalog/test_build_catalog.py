@@ -0,0 +1,80 @@
+'''Test cases for the BuildCatalog class in catalog module.'''
+import os
+import tempfile
+import unittest
+
+from prox_imager.catalog import BuildCatalog, build_catalog
+
+
+def product(release: str, version: str, arch: str, builds: list) -> dict:
+    '''Builds a simplestreams product with a disk1.img item per build.'''
+    return {
+        "release": release, "version": version, "arch": arch,
+        "versions": {
+            build: {"items": {
+                "disk1.img": {"path": f"/{release}/{build}/{arch}.img", "sha256": f"sha-{build}-{arch}"},
+                "manifest": {"path": f"/{release}/{build}/manifest"},
+            }}
+            for build in builds
+        },
+    }
+
+
+class TestBuildCatalog(unittest.TestCase):
+    '''Test cases for the BuildCatalog class.'''
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.catalog = BuildCatalog(os.path.join(self.tmp.name, "catalog.sqlite"))
+        self.catalog.record_metadata({"products": {
+            "jammy:amd64": product("jammy", "22.04", "amd64", ["20250101", "20250301", "20250301.1"]),
+            "jammy:arm64": product("jammy", "22.04", "arm64", ["20250401"]),
+        }}, "http://base", "ubuntu")
+
+    def tearDown(self):
+        self.catalog.close()
+        self.tmp.cleanup()
+
+    def test_latest(self):
+        '''Test latest by codename, by version and by arch.'''
+        self.assertEqual(self.catalog.latest("jammy"), {
+            "product": "jammy:amd64", "release": "jammy", "version": "22.04", "arch": "amd64",
+            "build_date": "20250301.1", "image_url": "http://base/jammy/20250301.1/amd64.img",
+            "sha256": "sha-20250301.1-amd64",
+        })
+        self.assertEqual(self.catalog.latest("22.04")["build_date"], "20250301.1")
+        self.assertEqual(self.catalog.latest("jammy", "arm64")["build_date"], "20250401")
+        self.assertIsNone(self.catalog.latest("noble"))
+
+    def test_as_of(self):
+        '''Test as_of includes respins of the given day and excludes later builds.'''
+        self.assertEqual(self.catalog.as_of("jammy", "20250301")["build_date"], "20250301.1")
+        self.assertEqual(self.catalog.as_of("jammy", "20250228")["build_date"], "20250101")
+        self.assertIsNone(self.catalog.as_of("jammy", "20241231"))
+
+    def test_history_accumulates_across_runs(self):
+        '''Test builds from later runs are added and known builds are not duplicated.'''
+        added = self.catalog.record_metadata({"products": {
+            "jammy:amd64": product("jammy", "22.04", "amd64", ["20250301.1", "20250501"]),
+        }}, "http://base")
+        self.assertEqual(added, 1)
+        self.assertEqual([b["build_date"] for b in self.catalog.history("jammy:amd64")],
+                         ["20250501", "20250301.1", "20250301", "20250101"])
+
+    def test_record_product(self):
+        '''Test record_product stores the builds of a single streamed product.'''
+        added = self.catalog.record_product("noble:amd64", product("noble", "24.04", "amd64", ["20250601"]),
+                                            "http://base", "ubuntu")
+        self.assertEqual(added, 1)
+        self.assertEqual(self.catalog.latest("noble")["build_date"], "20250601")
+
+    def test_build_catalog(self):
+        '''Test build_catalog is only enabled by a [catalog] section.'''
+        self.assertIsNone(build_catalog({}))
+        catalog = build_catalog({"catalog": {"path": os.path.join(self.tmp.name, "c2.sqlite")}})
+        self.assertEqual(catalog.item_types, ("disk1.img",))
+        catalog.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
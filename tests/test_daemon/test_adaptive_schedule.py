@@ -0,0 +1,44 @@
+'''Test cases for the AdaptiveSchedule class in daemon module.'''
+import unittest
+
+from prox_imager.daemon import AdaptiveSchedule
+
+HOUR = 3600
+
+
+class TestAdaptiveSchedule(unittest.TestCase):
+    '''Test cases for the AdaptiveSchedule class.'''
+
+    def setUp(self):
+        self.schedule = AdaptiveSchedule(min_interval=300, max_interval=3600, backoff=2, publish_window=1800)
+
+    def test_backoff_without_changes(self):
+        '''Test the interval doubles up to max_interval while nothing changes.'''
+        delays = []
+        for _ in range(6):
+            self.schedule.record(False, 0)
+            delays.append(self.schedule.next_delay(0))
+        self.assertEqual(delays, [600, 1200, 2400, 3600, 3600, 3600])
+
+    def test_change_resets_interval(self):
+        '''Test a change brings the interval back to min_interval.'''
+        for _ in range(4):
+            self.schedule.record(False, 0)
+        self.schedule.record(True, 10 * HOUR)
+        self.assertEqual(self.schedule.interval, 300)
+
+    def test_tightens_around_publish_time(self):
+        '''Test polls are pulled forward to a usual publish time and kept short inside it.'''
+        day = 24 * HOUR
+        self.schedule.record(True, 3 * day + 10 * HOUR)
+        for _ in range(5):
+            self.schedule.record(False, 3 * day + 12 * HOUR)
+        self.assertEqual(self.schedule.next_delay(4 * day + 20 * HOUR), 3600)
+        # Window opens 15 minutes before 10:00 on the next day
+        self.assertEqual(self.schedule.next_delay(4 * day + 9 * HOUR + 30 * 60), 900)
+        self.assertEqual(self.schedule.next_delay(4 * day + 9 * HOUR + 50 * 60), 300)
+        self.assertEqual(self.schedule.next_delay(4 * day + 10 * HOUR + 10 * 60), 300)
+
+
+if __name__ == '__main__':
+    unittest.main()
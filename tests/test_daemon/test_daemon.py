@@ -0,0 +1,174 @@
+'''Test cases for the Daemon class in daemon module.'''
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from prox_imager.daemon import Daemon
+
+CONFIG = """
+[files]
+output_file = "{output}"
+
+[cache]
+directory = "{cache}"
+
+[[sources]]
+name = "a"
+base_url = "http://a"
+metadata_url = "/a.json"
+
+[daemon]
+min_interval = 60
+max_interval = 600
+on_change_command = "{command}"
+"""
+
+
+def image(build_date: str) -> dict:
+    '''Builds a minimal image record.'''
+    return {"release": "jammy", "version": "22.04", "build_date": build_date,
+            "image_url": f"http://a/{build_date}.img", "sha256": build_date}
+
+
+class TestDaemon(unittest.TestCase):
+    '''Test cases for the Daemon class.'''
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmp.name, "images.json")
+        self.marker = os.path.join(self.tmp.name, "hook.out")
+        self.config_path = os.path.join(self.tmp.name, "config.toml")
+        self.write_config()
+        self.daemon = Daemon(self.config_path)
+        self.assertTrue(self.daemon.load())
+        self.daemon.next_poll["a"] = 0  # due at the fake clock used below
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_config(self, extra: str = "") -> None:
+        '''Writes the test configuration file.'''
+        with open(self.config_path, "w", encoding="utf-8") as f:
+            f.write(CONFIG.format(output=self.output, cache=os.path.join(self.tmp.name, "cache"),
+                                  command=f"echo $PROX_IMAGER_CHANGES >> {self.marker}") + extra)
+
+    @patch("prox_imager.fetch_ubuntu_images.fetch_source")
+    def test_run_once_publishes_only_on_change(self, mock_fetch_source):
+        '''Test the snapshot, change set and hook only run when builds change.'''
+        mock_fetch_source.return_value = {"jammy": image("1")}
+        self.assertEqual(self.daemon.run_once(now=1000), 60)
+        with open(self.output, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), {"jammy": image("1")})
+        with open(self.output.replace(".json", ".changes.json"), encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["added"], {"jammy": image("1")})
+
+        self.assertEqual(self.daemon.run_once(now=1030), 30)  # not due yet
+        self.assertEqual(mock_fetch_source.call_count, 1)
+        self.daemon.run_once(now=1060)  # unchanged: backs off, no hook
+        self.assertEqual(self.daemon.next_poll["a"], 1060 + 120)
+
+        mock_fetch_source.return_value = {"jammy": image("2")}
+        self.daemon.run_once(now=1180)
+        with open(self.marker, encoding="utf-8") as f:
+            self.assertEqual(len(f.read().splitlines()), 2)
+        self.assertEqual(self.daemon.next_poll["a"], 1180 + 60)
+
+    @patch("prox_imager.pipeline.build_templates")
+    @patch("prox_imager.fetch_ubuntu_images.fetch_source")
+    def test_build_templates_on_change(self, mock_fetch_source, mock_build_templates):
+        '''Test templates are built from new builds only.'''
+        daemon = Daemon(self.config_path, build_templates=True)
+        self.assertTrue(daemon.load())
+        mock_fetch_source.return_value = {"jammy": image("1")}
+        daemon.run_once(now=time.time() + 1)
+        daemon.run_once(now=time.time() + 3600)
+        mock_build_templates.assert_called_once_with({"jammy": image("1")}, daemon.config)
+
+    @patch("prox_imager.fetch_ubuntu_images.fetch_source", return_value={})
+    def test_failed_poll_keeps_state(self, _mock_fetch_source):
+        '''Test a failed fetch is not treated as every image being removed.'''
+        self.daemon.source_images["a"] = {"jammy": image("1")}
+        self.daemon.snapshot = {"jammy": image("1")}
+        self.daemon.run_once(now=1000)
+        self.assertEqual(_mock_fetch_source.call_count, 1)
+        self.assertEqual(self.daemon.source_images["a"], {"jammy": image("1")})
+        self.assertFalse(os.path.exists(self.output))
+
+    @patch("prox_imager.fetch_ubuntu_images.fetch_source")
+    def test_first_poll_failure_keeps_snapshot(self, mock_fetch_source):
+        '''Test a source failing since startup keeps its products from the previous snapshot.'''
+        pb = {**image("1"), "image_url": "http://b/1.img"}
+        with open(self.output, "w", encoding="utf-8") as f:
+            json.dump({"pa": image("1"), "pb": pb}, f)
+        self.write_config('\n[[sources]]\nname = "b"\nbase_url = "http://b"\nmetadata_url = "/b.json"\n')
+        daemon = Daemon(self.config_path)
+        self.assertTrue(daemon.load())
+        new_pb = {**image("2"), "image_url": "http://b/2.img"}
+        mock_fetch_source.side_effect = lambda source, *_args: {"pb": new_pb} if source["name"] == "b" else {}
+
+        daemon.run_once(now=time.time() + 1)
+        with open(self.output, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), {"pa": image("1"), "pb": new_pb})
+        with open(self.output.replace(".json", ".changes.json"), encoding="utf-8") as f:
+            self.assertEqual(json.load(f), {"added": {}, "updated": {"pb": new_pb}, "removed": []})
+
+    def test_reload_adds_and_removes_sources(self):
+        '''Test a reload keeps schedules of remaining sources and drops removed ones.'''
+        schedule = self.daemon.schedules["a"]
+        self.write_config('\n[[sources]]\nname = "b"\nbase_url = "http://b"\nmetadata_url = "/b.json"\n')
+        self.assertTrue(self.daemon.load())
+        self.assertIs(self.daemon.schedules["a"], schedule)
+        self.assertIn("b", self.daemon.schedules)
+
+    def test_reload_updates_schedule_settings(self):
+        '''Test changed [daemon] intervals apply to the schedules of existing sources.'''
+        self.daemon.next_poll["a"] = time.time() + 600
+        with open(self.config_path, "r", encoding="utf-8") as f:
+            config = f.read()
+        with open(self.config_path, "w", encoding="utf-8") as f:
+            f.write(config.replace("min_interval = 60", "min_interval = 10").replace("max_interval = 600",
+                                                                                     "max_interval = 20"))
+        self.assertTrue(self.daemon.load())
+        schedule = self.daemon.schedules["a"]
+        self.assertEqual((schedule.min_interval, schedule.max_interval), (10, 20))
+        self.assertLessEqual(self.daemon.next_poll["a"], time.time() + 20)
+
+    @patch("prox_imager.fetch_ubuntu_images.fetch_source", side_effect=OSError("disk full"))
+    def test_poll_error_does_not_stop_daemon(self, _mock_fetch_source):
+        '''Test an exception while polling is logged and the source is scheduled again.'''
+        with self.assertLogs("prox_imager.daemon", level="ERROR"):
+            self.assertEqual(self.daemon.run_once(now=1000), 120)
+        self.assertEqual(self.daemon.next_poll["a"], 1120)
+
+    def test_invalid_reload_keeps_config(self):
+        '''Test an invalid configuration does not replace the running one.'''
+        with open(self.config_path, "w", encoding="utf-8") as f:
+            f.write("[image_urls]\n")
+        self.assertFalse(self.daemon.load())
+        self.assertEqual([s["name"] for s in self.daemon.sources], ["a"])
+
+    @patch("prox_imager.fetch_ubuntu_images.fetch_source", return_value={})
+    def test_run_reloads_on_change_and_stops(self, _mock_fetch_source):
+        '''Test run picks up a modified configuration file and exits on stop.'''
+        thread = threading.Thread(target=self.daemon.run, kwargs={"reload_check": 0.01})
+        thread.start()
+        try:
+            time.sleep(0.05)
+            self.write_config('\n[[sources]]\nname = "b"\nbase_url = "http://b"\nmetadata_url = "/b.json"\n')
+            os.utime(self.config_path, ns=(time.time_ns(), time.time_ns() + 10**9))
+            deadline = time.time() + 2
+            while "b" not in self.daemon.schedules and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertIn("b", self.daemon.schedules)
+        finally:
+            self.daemon.stop()
+            thread.join(2)
+        self.assertFalse(thread.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+'''Test cases for the diff_images function in delta module.'''
+import unittest
+
+from prox_imager.delta import changed_images, diff_images
+
+
+def image(build_date: str, sha256: str) -> dict:
+    '''Builds a minimal image record.'''
+    return {"release": "jammy", "version": "22.04", "build_date": build_date,
+            "image_url": f"http://x/{build_date}.img", "sha256": sha256}
+
+
+class TestDiffImages(unittest.TestCase):
+    '''Test cases for the diff_images function.'''
+
+    def test_diff_images(self):
+        '''Test added, updated, removed and unchanged products.'''
+        previous = {"same": image("1", "a"), "rebuilt": image("1", "a"),
+                    "respun": image("1", "a"), "gone": image("1", "a")}
+        current = {"same": image("1", "a"), "rebuilt": image("2", "b"),
+                   "respun": image("1", "c"), "new": image("3", "d")}
+        self.assertEqual(diff_images(previous, current), {
+            "added": {"new": image("3", "d")},
+            "updated": {"rebuilt": image("2", "b"), "respun": image("1", "c")},
+            "removed": ["gone"],
+        })
+
+    def test_diff_images_no_previous(self):
+        '''Test every product is added without a previous snapshot.'''
+        current = {"a": image("1", "a")}
+        self.assertEqual(diff_images({}, current), {"added": current, "updated": {}, "removed": []})
+
+    def test_diff_images_unchanged(self):
+        '''Test identical snapshots produce an empty change set.'''
+        current = {"a": image("1", "a")}
+        self.assertEqual(diff_images(current, dict(current)), {"added": {}, "updated": {}, "removed": []})
+
+    def test_changed_images(self):
+        '''Test changed_images merges added and updated records.'''
+        changes = {"added": {"a": 1}, "updated": {"b": 2}, "removed": ["c"]}
+        self.assertEqual(changed_images(changes), {"a": 1, "b": 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
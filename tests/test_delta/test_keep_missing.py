@@ -0,0 +1,27 @@
+'''Test cases for the keep_missing function in delta module.'''
+import unittest
+
+from prox_imager.delta import keep_missing
+
+
+def image(url: str) -> dict:
+    '''Builds a minimal image record.'''
+    return {"build_date": "20250101", "sha256": "x", "image_url": url}
+
+
+class TestKeepMissing(unittest.TestCase):
+    '''Test cases for keep_missing.'''
+
+    def test_keep_missing(self):
+        '''Test only the missing records of the failed sources are kept.'''
+        previous = {"a:old": image("http://a/old.img"), "b:1": image("http://b/1.img"),
+                    "c:1": image("http://c/1.img")}
+        current = {"a:new": image("http://a/new.img")}
+        self.assertEqual(keep_missing(previous, current, ["http://b"]),
+                         {"a:new": image("http://a/new.img"), "b:1": image("http://b/1.img")})
+        self.assertEqual(keep_missing(previous, current), {**previous, **current})
+        self.assertEqual(keep_missing(previous, current, []), current)
+
+
+if __name__ == '__main__':
+    unittest.main()
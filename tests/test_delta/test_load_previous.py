@@ -0,0 +1,43 @@
+'''Test cases for the load_previous and changes_path functions in delta module.'''
+import json
+import os
+import tempfile
+import unittest
+
+from prox_imager.delta import changes_path, load_previous
+
+
+class TestLoadPrevious(unittest.TestCase):
+    '''Test cases for the load_previous function.'''
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "images.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_load_previous(self):
+        '''Test load_previous reads a snapshot written by save_metadata.'''
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"a": {"build_date": "1"}}, f, indent=4)
+        self.assertEqual(load_previous(self.path), {"a": {"build_date": "1"}})
+
+    def test_load_previous_missing(self):
+        '''Test load_previous without a previous snapshot.'''
+        self.assertEqual(load_previous(self.path), {})
+
+    def test_load_previous_invalid(self):
+        '''Test load_previous with a corrupt snapshot.'''
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("{not json")
+        self.assertEqual(load_previous(self.path), {})
+
+    def test_changes_path(self):
+        '''Test the change set is written next to the snapshot.'''
+        self.assertEqual(changes_path("/out/images.json"), "/out/images.changes.json")
+        self.assertEqual(changes_path("images"), "images.changes.json")
+
+
+if __name__ == '__main__':
+    unittest.main()
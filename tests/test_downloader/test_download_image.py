@@ -0,0 +1,151 @@
+'''Test cases for the download_image function in downloader module.'''
+import hashlib
+import os
+import tempfile
+import unittest
+
+from prox_imager.downloader import PART_SUFFIX, download_image, download_images
+from prox_imager.image_store import ImageStore
+from prox_imager.verify import HashCache
+from tests.http_server import LocalServer
+
+
+DATA = os.urandom(100_000)
+SHA256 = hashlib.sha256(DATA).hexdigest()
+
+
+class TestDownloadImage(unittest.TestCase):
+    '''Test cases for the download_image function.'''
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = os.path.join(self.tmp.name, "image.img")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_download_image_ranges(self):
+        '''Test a ranged download is verified and moved into place.'''
+        with LocalServer({"/image.img": DATA}) as server:
+            self.assertTrue(download_image(server.url + "/image.img", self.dest, SHA256,
+                                           segments=4, block_size=8192))
+            ranges = [h.get("Range") for method, _, h, _ in server.requests if method == "GET"]
+        with open(self.dest, "rb") as f:
+            self.assertEqual(f.read(), DATA)
+        self.assertFalse(os.path.exists(self.dest + PART_SUFFIX))
+        self.assertEqual(len(ranges), 13)
+        self.assertIn("bytes=98304-99999", ranges)
+
+    def test_download_image_without_ranges(self):
+        '''Test a server without Range support falls back to a single request.'''
+        with LocalServer({"/image.img": DATA}, ranges=False) as server:
+            self.assertTrue(download_image(server.url + "/image.img", self.dest, SHA256, block_size=8192))
+            gets = [r for r in server.requests if r[0] == "GET"]
+        self.assertEqual(len(gets), 1)
+        with open(self.dest, "rb") as f:
+            self.assertEqual(f.read(), DATA)
+
+    def test_download_image_resume(self):
+        '''Test an interrupted download resumes from the partial file.'''
+        with open(self.dest + PART_SUFFIX, "wb") as f:
+            f.write(DATA[:40_000])
+        with LocalServer({"/image.img": DATA}) as server:
+            self.assertTrue(download_image(server.url + "/image.img", self.dest, SHA256,
+                                           segments=2, block_size=30_000))
+            ranges = [h.get("Range") for method, _, h, _ in server.requests if method == "GET"]
+        self.assertEqual(sorted(ranges), ["bytes=40000-69999", "bytes=70000-99999"])
+        with open(self.dest, "rb") as f:
+            self.assertEqual(f.read(), DATA)
+
+    def test_download_image_failure_keeps_part(self):
+        '''Test a failed block leaves a contiguous partial file behind.'''
+        with LocalServer({"/image.img": DATA}) as server:
+            server.fail_next(None, None, 404)  # HEAD and the first block succeed
+            self.assertFalse(download_image(server.url + "/image.img", self.dest, SHA256,
+                                            segments=1, block_size=8192))
+        self.assertFalse(os.path.exists(self.dest))
+        with open(self.dest + PART_SUFFIX, "rb") as f:
+            self.assertEqual(f.read(), DATA[:8192])
+
+    def test_download_image_checksum_mismatch(self):
+        '''Test a checksum mismatch discards the download.'''
+        with LocalServer({"/image.img": DATA}) as server:
+            self.assertFalse(download_image(server.url + "/image.img", self.dest, "0" * 64, block_size=8192))
+        self.assertFalse(os.path.exists(self.dest))
+        self.assertFalse(os.path.exists(self.dest + PART_SUFFIX))
+
+    def test_download_image_without_checksum(self):
+        '''Test images without a checksum are not downloaded.'''
+        self.assertFalse(download_image("http://127.0.0.1:1/image.img", self.dest, "unknown"))
+
+    def test_download_images(self):
+        '''Test download_images maps products to verified local paths.'''
+        with LocalServer({"/a/image.img": DATA}) as server:
+            images = {
+                "good": {"image_url": server.url + "/a/image.img", "sha256": SHA256},
+                "bad": {"image_url": server.url + "/a/missing.img", "sha256": SHA256},
+            }
+            paths = download_images(images, self.tmp.name, block_size=16384)
+        self.assertEqual(paths, {"good": self.dest})
+
+    def test_download_images_with_store(self):
+        '''Test stored images are linked instead of downloaded again.'''
+        store = ImageStore(os.path.join(self.tmp.name, "store"))
+        try:
+            with LocalServer({"/a/image.img": DATA, "/b/other.img": DATA}) as server:
+                images = {"a": {"image_url": server.url + "/a/image.img", "sha256": SHA256}}
+                download_images(images, self.tmp.name, block_size=65536, store=store)
+                images = {"b": {"image_url": server.url + "/b/other.img", "sha256": SHA256}}
+                paths = download_images(images, self.tmp.name, block_size=65536, store=store)
+                gets = [path for method, path, _, _ in server.requests if method == "GET"]
+            self.assertTrue(os.path.samefile(paths["b"], self.dest))
+            self.assertNotIn("/b/other.img", gets)
+        finally:
+            store.close()
+
+    def test_download_images_over_budget(self):
+        '''Test a batch larger than the store budget keeps every image it returns.'''
+        other = os.urandom(100_000)
+        store = ImageStore(os.path.join(self.tmp.name, "store"), budget_bytes=150_000)
+        try:
+            with LocalServer({"/a/a.img": DATA, "/b/b.img": other}) as server:
+                images = {"a": {"image_url": server.url + "/a/a.img", "sha256": SHA256},
+                          "b": {"image_url": server.url + "/b/b.img", "sha256": hashlib.sha256(other).hexdigest()}}
+                paths = download_images(images, self.tmp.name, store=store)
+            self.assertEqual(sorted(paths), ["a", "b"])
+            self.assertTrue(all(os.path.exists(path) for path in paths.values()))
+            self.assertTrue(store.has(SHA256))
+        finally:
+            store.close()
+
+    def test_download_image_replaces_stale_file(self):
+        '''Test a file left by an older build is downloaded again, and a matching one is kept.'''
+        with open(self.dest, "wb") as f:
+            f.write(b"old build")
+        cache = HashCache(os.path.join(self.tmp.name, "hashes.json"))
+        with LocalServer({"/image.img": DATA}) as server:
+            self.assertTrue(download_image(server.url + "/image.img", self.dest, SHA256, hash_cache=cache))
+            with open(self.dest, "rb") as f:
+                self.assertEqual(f.read(), DATA)
+            requests_before = len(server.requests)
+            self.assertTrue(download_image(server.url + "/image.img", self.dest, SHA256, hash_cache=cache))
+            self.assertEqual(len(server.requests), requests_before)
+        self.assertEqual(cache.get(self.dest, os.stat(self.dest)), SHA256)
+
+    def test_download_images_stale_file_not_stored(self):
+        '''Test a stale file is never added to the store under the new checksum.'''
+        with open(self.dest, "wb") as f:
+            f.write(b"old build")
+        store = ImageStore(os.path.join(self.tmp.name, "store"))
+        try:
+            with LocalServer({"/a/image.img": DATA}) as server:
+                images = {"a": {"image_url": server.url + "/a/image.img", "sha256": SHA256}}
+                self.assertEqual(download_images(images, self.tmp.name, store=store), {"a": self.dest})
+            with open(store.object_path(SHA256), "rb") as f:
+                self.assertEqual(f.read(), DATA)
+        finally:
+            store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
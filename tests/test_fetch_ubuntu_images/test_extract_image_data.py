@@ -3,6 +3,7 @@ import unittest
 import json
 from pathlib import Path
 from prox_imager.fetch_ubuntu_images import extract_image_data
+from prox_imager.image_filter import ImageFilter
 
 
 class TestExtractImageData(unittest.TestCase):
@@ -71,6 +72,23 @@ class TestExtractImageData(unittest.TestCase):
         }
         self.assertEqual(extract_image_data(metadata, base_url), expected_output)
 
+    def test_extract_image_data_with_filter(self):
+        '''Test extract_image_data function with a multi-arch, multi-artifact filter.'''
+        item = {"path": "/jammy/20250301/img", "sha256": "abc"}
+        metadata = {"products": {
+            "jammy:amd64": {"arch": "amd64", "release": "jammy", "version": "22.04",
+                            "versions": {"20250301": {"items": {"disk1.img": item, "qcow2": item}}}},
+            "jammy:arm64": {"arch": "arm64", "release": "jammy", "version": "22.04",
+                            "versions": {"20250301": {"items": {"qcow2": item}}}},
+            "jammy:s390x": {"arch": "s390x", "release": "jammy", "version": "22.04",
+                            "versions": {"20250301": {"items": {"qcow2": item}}}},
+        }}
+        image_filter = ImageFilter(arches=["amd64", "arm64"], item_types=["disk1.img", "qcow2"],
+                                   all_item_types=True)
+        images = extract_image_data(metadata, "http://example.com", image_filter)
+        self.assertEqual(sorted(images), ["jammy:amd64:disk1.img", "jammy:amd64:qcow2", "jammy:arm64:qcow2"])
+        self.assertEqual(images["jammy:arm64:qcow2"]["image_url"], "http://example.com/jammy/20250301/img")
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,52 @@
+'''Test cases for the fetch_all_sources function in fetch_ubuntu_images module.'''
+import time
+import unittest
+from unittest.mock import patch
+
+from prox_imager.fetch_ubuntu_images import fetch_all_sources
+
+
+SOURCES = [
+    {"name": "a", "base_url": "http://a", "metadata_url": "/a.json", "timeout": 10},
+    {"name": "b", "base_url": "http://b", "metadata_url": "/b.json", "timeout": 10},
+    {"name": "c", "base_url": "http://c", "metadata_url": "/c.json", "timeout": 10},
+]
+
+
+def fake_fetch_source(source, cache=None, stream=False, catalog=None, image_filter=None):
+    '''Returns one image per source after a short delay; source b fails.'''
+    time.sleep(0.2)
+    if source["name"] == "b":
+        raise RuntimeError("boom")
+    return {f"{source['name']}:product": {"image_url": source["base_url"]}, "shared": {"from": source["name"]}}
+
+
+class TestFetchAllSources(unittest.TestCase):
+    '''Test cases for the fetch_all_sources function.'''
+
+    @patch("prox_imager.fetch_ubuntu_images.fetch_source", side_effect=fake_fetch_source)
+    def test_fetch_all_sources_concurrent(self, mock_fetch_source):
+        '''Test sources are fetched concurrently and merged in configuration order.'''
+        start = time.monotonic()
+        images = fetch_all_sources(SOURCES, max_workers=3)
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(mock_fetch_source.call_count, 3)
+        self.assertEqual(images, {
+            "a:product": {"image_url": "http://a"},
+            "c:product": {"image_url": "http://c"},
+            "shared": {"from": "a"},
+        })
+
+    @patch("prox_imager.fetch_ubuntu_images.fetch_source", return_value={})
+    def test_fetch_all_sources_all_empty(self, mock_fetch_source):
+        '''Test fetch_all_sources when no source yields images.'''
+        self.assertEqual(fetch_all_sources(SOURCES), {})
+        self.assertEqual(mock_fetch_source.call_count, 3)
+
+    def test_fetch_all_sources_no_sources(self):
+        '''Test fetch_all_sources with an empty source list.'''
+        self.assertEqual(fetch_all_sources([]), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,11 @@
 '''Test cases for the fetch_ubuntu_images module.'''
+import tempfile
 import unittest
 from unittest.mock import patch, Mock
 import requests
-from prox_imager.fetch_ubuntu_images import fetch_ubuntu_metadata
+from prox_imager.fetch_ubuntu_images import fetch_source, fetch_ubuntu_metadata
+from prox_imager.metadata_cache import MetadataCache
+from prox_imager.metrics import METRICS
 
 
 class TestFetchUbuntuMetadata(unittest.TestCase):
@@ -15,11 +18,12 @@ class TestFetchUbuntuMetadata(unittest.TestCase):
         # Cleanup code to run after each test
         pass
 
-    @patch("requests.get")
+    @patch("prox_imager.http_client.HttpClient.get")
     def test_fetch_ubuntu_metadata_success(self, mock_get):
         '''Test fetch_ubuntu_metadata function with a successful response.'''
         mock_response = Mock()
         mock_response.status_code = 200
+        mock_response.content = b'{"products": {}}'
         mock_response.json.return_value = {"products": {}}
         mock_get.return_value = mock_response
 
@@ -27,7 +31,7 @@ class TestFetchUbuntuMetadata(unittest.TestCase):
         self.assertEqual(metadata, {"products": {}})
         mock_get.assert_called_once_with("http://example.com", timeout=10)
 
-    @patch("requests.get")
+    @patch("prox_imager.http_client.HttpClient.get")
     def test_fetch_ubuntu_metadata_failure(self, mock_get):
         '''Test fetch_ubuntu_metadata function with a failed response.'''
         mock_response = Mock()
@@ -39,20 +43,82 @@ class TestFetchUbuntuMetadata(unittest.TestCase):
         self.assertEqual(metadata, {})
         mock_get.assert_called_once_with("http://example.com", timeout=10)
 
-    @patch("requests.get", side_effect=requests.exceptions.Timeout)
+    @patch("prox_imager.http_client.HttpClient.get", side_effect=requests.exceptions.Timeout)
     def test_fetch_ubuntu_metadata_timeout(self, mock_get):
         '''Test fetch_ubuntu_metadata function with a timeout exception.'''
         metadata = fetch_ubuntu_metadata("http://example.com")
         self.assertEqual(metadata, {})
         mock_get.assert_called_once_with("http://example.com", timeout=10)
 
-    @patch("requests.get", side_effect=requests.exceptions.RequestException)
+    @patch("prox_imager.http_client.HttpClient.get", side_effect=requests.exceptions.RequestException)
     def test_fetch_ubuntu_metadata_request_exception(self, mock_get):
         '''Test fetch_ubuntu_metadata function with a generic request exception.'''
         metadata = fetch_ubuntu_metadata("http://example.com")
         self.assertEqual(metadata, {})
         mock_get.assert_called_once_with("http://example.com", timeout=10)
 
+    @patch("prox_imager.http_client.HttpClient.get")
+    def test_fetch_ubuntu_metadata_not_modified(self, mock_get):
+        '''Test fetch_ubuntu_metadata returns the cached document on a 304 response.'''
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = MetadataCache(cache_dir)
+            first = Mock(status_code=200, content=b'{"products": {"p": {}}}',
+                         headers={"ETag": '"v1"'})
+            first.json.return_value = {"products": {"p": {}}}
+            second = Mock(status_code=304)
+            mock_get.side_effect = [first, second]
+
+            self.assertEqual(fetch_ubuntu_metadata("http://example.com", cache), {"products": {"p": {}}})
+            metadata = fetch_ubuntu_metadata("http://example.com", cache)
+            self.assertEqual(metadata, {"products": {"p": {}}})
+            second.json.assert_not_called()
+            mock_get.assert_called_with("http://example.com", timeout=10,
+                                        headers={"If-None-Match": '"v1"'})
+
+    @patch("prox_imager.http_client.HttpClient.get")
+    def test_fetch_source_not_modified_skips_parsing(self, mock_get):
+        '''Test a 304 in a new process reuses the persisted extract without decoding the body.'''
+        source = {"name": "a", "base_url": "http://a", "metadata_url": "/a.json", "timeout": None}
+        metadata = {"products": {"p": {"arch": "amd64", "versions": {
+            "20250101": {"items": {"disk1.img": {"path": "/p.img", "sha256": "x"}}}}}}}
+        with tempfile.TemporaryDirectory() as cache_dir:
+            first = Mock(status_code=200, content=b"{}", headers={"ETag": '"v1"'})
+            first.json.return_value = metadata
+            mock_get.side_effect = [first, Mock(status_code=304)]
+            images = fetch_source(source, MetadataCache(cache_dir))
+
+            with patch("prox_imager.metadata_cache.MetadataCache.load") as mock_load:
+                self.assertEqual(fetch_source(source, MetadataCache(cache_dir)), images)
+            mock_load.assert_not_called()
+        self.assertEqual(list(images), ["p"])
+
+    @patch("prox_imager.http_client.HttpClient.get")
+    def test_fetch_ubuntu_metadata_metrics(self, mock_get):
+        '''Test fetch_ubuntu_metadata records status, bytes, cache result and latency.'''
+        METRICS.reset()
+        self.addCleanup(METRICS.reset)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = MetadataCache(cache_dir)
+            first = Mock(status_code=200, content=b'{"products": {}}', headers={"ETag": '"v1"'})
+            first.json.return_value = {"products": {}}
+            mock_get.side_effect = [first, Mock(status_code=304), requests.exceptions.ConnectionError]
+            for _ in range(3):
+                fetch_ubuntu_metadata("http://example.com", cache)
+
+        summary = METRICS.summary()
+        counters = {(c["name"], tuple(sorted(c["labels"].items()))): c["value"] for c in summary["counters"]}
+        url = ("url", "http://example.com")
+        self.assertEqual(counters, {
+            ("http_responses_total", (("status", "200"), url)): 1,
+            ("http_responses_total", (("status", "304"), url)): 1,
+            ("http_responses_total", (("status", "error"), url)): 1,
+            ("metadata_bytes_total", (url,)): 16,
+            ("metadata_cache_total", (("result", "hit"),)): 1,
+            ("metadata_cache_total", (("result", "miss"),)): 1,
+        })
+        fetch_stage = [s for s in summary["stages"] if s["stage"] == "fetch_ubuntu_metadata"]
+        self.assertEqual(fetch_stage[0]["count"], 3)
+
 
 if __name__ == '__main__':
     unittest.main()
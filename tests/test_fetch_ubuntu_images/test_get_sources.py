@@ -0,0 +1,34 @@
+'''Test cases for the get_sources function in fetch_ubuntu_images module.'''
+import unittest
+from prox_imager.fetch_ubuntu_images import get_sources
+
+
+class TestGetSources(unittest.TestCase):
+    '''Test cases for the get_sources function.'''
+
+    def test_get_sources_legacy(self):
+        '''Test get_sources reads the [image_urls] section as a single source.'''
+        config = {'image_urls': {'ubuntu_base_url': 'http://base', 'ubuntu_metadata_url': '/meta.json'}}
+        self.assertEqual(get_sources(config), [
+            {"name": "ubuntu", "base_url": "http://base", "metadata_url": "/meta.json", "timeout": None},
+        ])
+
+    def test_get_sources_multiple(self):
+        '''Test get_sources combines [image_urls] and [[sources]] entries in order.'''
+        config = {
+            'image_urls': {'ubuntu_base_url': 'http://base', 'ubuntu_metadata_url': '/meta.json'},
+            'sources': [
+                {'name': 'debian', 'base_url': 'http://debian', 'metadata_url': '/d.json', 'timeout': 30},
+                {'name': 'other', 'base_url': 'http://other', 'metadata_url': '/o.json'},
+            ],
+        }
+        self.assertEqual([s['name'] for s in get_sources(config)], ["ubuntu", "debian", "other"])
+        self.assertEqual([s['timeout'] for s in get_sources(config)], [None, 30, None])
+
+    def test_get_sources_empty(self):
+        '''Test get_sources with no sources configured.'''
+        self.assertEqual(get_sources({}), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,13 @@
 '''Test cases for the fetch_ubuntu_images module.'''
+import os
+import subprocess
+import sys
+import tempfile
+import time
 import unittest
 from unittest.mock import patch, mock_open
 
-import os
-import toml
-
+from prox_imager import fetch_ubuntu_images
 from prox_imager.fetch_ubuntu_images import load_config
 
 
@@ -37,9 +40,7 @@ class TestLoadConfig(unittest.TestCase):
     @patch("os.path.exists", return_value=True)
     @patch("os.access", return_value=True)
     @patch("builtins.open", new_callable=mock_open, read_data='invalid_toml')
-    @patch("toml.load", side_effect=toml.TomlDecodeError("Error", "doc", 0))
     def test_load_config_toml_decode_error(self,
-                                           mock_toml_load,
                                            mock_file_open,
                                            mock_access,
                                            mock_exists):
@@ -49,7 +50,6 @@ class TestLoadConfig(unittest.TestCase):
         mock_exists.assert_called_once_with("dummy_path")
         mock_access.assert_called_once_with("dummy_path", os.R_OK)
         mock_file_open.assert_called_once_with("dummy_path", "r", encoding="utf-8")
-        mock_toml_load.assert_called_once()
 
     @patch("os.path.exists", return_value=True)
     @patch("os.access", return_value=True)
@@ -64,6 +64,42 @@ class TestLoadConfig(unittest.TestCase):
         mock_access.assert_called_once_with("dummy_path", os.R_OK)
         mock_file_open.assert_called_once_with("dummy_path", "r", encoding="utf-8")
 
+    def test_load_config_cached_by_mtime(self):
+        '''Test an unchanged file is parsed once, a modified one again, and callers get copies.'''
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "config.toml")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write('[files]\noutput_file = "a.json"\n')
+            old = time.time() - 60
+            os.utime(path, (old, old))
+            with patch("prox_imager.fetch_ubuntu_images._parse_toml",
+                       wraps=fetch_ubuntu_images._parse_toml) as mock_parse:  # pylint: disable=protected-access
+                first = load_config(path)
+                first["files"]["output_file"] = "changed.json"
+                self.assertEqual(load_config(path), {"files": {"output_file": "a.json"}})
+                self.assertEqual(mock_parse.call_count, 1)
+
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write('[files]\noutput_file = "b.json"\n')
+                os.utime(path, (old + 1, old + 1))
+                self.assertEqual(load_config(path), {"files": {"output_file": "b.json"}})
+                self.assertEqual(mock_parse.call_count, 2)
+
+                # A file modified just now is not cached: it may change again within the same mtime tick
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write('[files]\noutput_file = "c.json"\n')
+                load_config(path)
+                load_config(path)
+                self.assertEqual(mock_parse.call_count, 4)
+
+    def test_lazy_imports(self):
+        '''Test importing the CLI module does not load the network, TOML and database libraries.'''
+        code = ("import sys, prox_imager.fetch_ubuntu_images; "
+                "print(' '.join(m for m in ('requests', 'toml', 'sqlite3', 'http.server') if m in sys.modules))")
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        result = subprocess.run([sys.executable, "-c", code], cwd=root, check=True, capture_output=True, text=True)
+        self.assertEqual(result.stdout.strip(), "")
+
 
 if __name__ == '__main__':
     unittest.main()
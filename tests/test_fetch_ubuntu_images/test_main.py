@@ -0,0 +1,104 @@
+'''Test cases for the main function in fetch_ubuntu_images module.'''
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from prox_imager.fetch_ubuntu_images import main
+from prox_imager.http_client import configure, get_client
+
+
+CONFIG = """
+[files]
+output_file = "{output}"
+
+[[sources]]
+name = "a"
+base_url = "http://a"
+metadata_url = "/a.json"
+
+[[sources]]
+name = "b"
+base_url = "http://b"
+metadata_url = "/b.json"
+"""
+
+
+def image(build_date: str, base_url: str = "http://a") -> dict:
+    '''Builds a minimal image record of the source at base_url.'''
+    return {"release": "jammy", "version": "22.04", "build_date": build_date,
+            "image_url": f"{base_url}/{build_date}.img", "sha256": build_date}
+
+
+class TestMain(unittest.TestCase):
+    '''Test cases for the main function.'''
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmp.name, "images.json")
+        self.config_path = os.path.join(self.tmp.name, "config.toml")
+        with open(self.config_path, "w", encoding="utf-8") as f:
+            f.write(CONFIG.format(output=self.output))
+        with open(self.output, "w", encoding="utf-8") as f:
+            json.dump({"a:0": image("0"), "a:1": image("1"), "b:1": image("1", "http://b")}, f)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, path: str) -> dict:
+        '''Loads a JSON file written by main.'''
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @patch("prox_imager.fetch_ubuntu_images.fetch_source")
+    def test_failed_source_keeps_previous_records(self, mock_fetch_source):
+        '''Test a failing source is neither reported as removed nor dropped from the snapshot.'''
+        def fetch(source, *_args):
+            if source["name"] == "b":
+                raise OSError("unreachable")
+            return {"a:1": image("2")}
+        mock_fetch_source.side_effect = fetch
+
+        with patch("sys.argv", ["prog", "-c", self.config_path, "--incremental"]):
+            main()
+
+        # a:0 is gone from source a, which answered, so it is still reported as removed
+        self.assertEqual(self.read(self.output), {"a:1": image("2"), "b:1": image("1", "http://b")})
+        changes = self.read(os.path.join(self.tmp.name, "images.changes.json"))
+        self.assertEqual(changes, {"added": {}, "updated": {"a:1": image("2")}, "removed": ["a:0"]})
+
+    @patch("prox_imager.fetch_ubuntu_images.fetch_source")
+    def test_removed_when_all_sources_succeed(self, mock_fetch_source):
+        '''Test products are still reported as removed when every source answered.'''
+        mock_fetch_source.side_effect = lambda source, *_args: {f"{source['name']}:2": image("2")}
+
+        with patch("sys.argv", ["prog", "-c", self.config_path, "--incremental"]):
+            main()
+
+        changes = self.read(os.path.join(self.tmp.name, "images.changes.json"))
+        self.assertEqual(changes["removed"], ["a:0", "a:1", "b:1"])
+
+    @patch("prox_imager.mirror.serve")
+    def test_mirror_uses_http_settings(self, mock_serve):
+        '''Test the mirror is served with the [http] settings, and an invalid section is reported.'''
+        mock_serve.side_effect = lambda _config: self.assertEqual(get_client().settings["read_timeout"], 42)
+        with open(self.config_path, "a", encoding="utf-8") as f:
+            f.write("\n[http]\nread_timeout = 42\n")
+        try:
+            with patch("sys.argv", ["prog", "-c", self.config_path, "--mirror"]):
+                main()
+            self.assertEqual(mock_serve.call_count, 1)
+
+            with open(self.config_path, "a", encoding="utf-8") as f:
+                f.write("bogus = 1\n")
+            with patch("sys.argv", ["prog", "-c", self.config_path, "--mirror"]), \
+                    self.assertLogs("prox_imager.fetch_ubuntu_images", level="ERROR"):
+                main()
+            self.assertEqual(mock_serve.call_count, 1)
+        finally:
+            configure({})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -33,6 +33,13 @@ class TestParseArgs(unittest.TestCase):
         self.assertEqual(args.config, "/custom/path/config.toml")
         mock_parse_args.assert_called_once()
 
+    @patch("sys.argv", ["fetch_ubuntu_images", "--no-cache"])
+    def test_parse_args_no_cache(self):
+        '''Test parse_args function with the --no-cache flag.'''
+        args = parse_args()
+        self.assertTrue(args.no_cache)
+        self.assertEqual(args.config, "./etc/config.toml")
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,34 @@
+'''Test cases for the query_catalog function in fetch_ubuntu_images module.'''
+import io
+import json
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import Mock
+
+from prox_imager.fetch_ubuntu_images import query_catalog
+
+
+class TestQueryCatalog(unittest.TestCase):
+    '''Test cases for the query_catalog function.'''
+
+    def test_query_catalog_latest(self):
+        '''Test query_catalog prints the latest build as JSON.'''
+        catalog = Mock()
+        catalog.latest.return_value = {"build_date": "20250301"}
+        out = io.StringIO()
+        with redirect_stdout(out):
+            self.assertEqual(query_catalog(catalog, "jammy"), {"build_date": "20250301"})
+        self.assertEqual(json.loads(out.getvalue()), {"build_date": "20250301"})
+        catalog.latest.assert_called_once_with("jammy", "amd64")
+
+    def test_query_catalog_as_of(self):
+        '''Test query_catalog with a date uses as_of.'''
+        catalog = Mock()
+        catalog.as_of.return_value = None
+        with self.assertLogs('prox_imager.fetch_ubuntu_images', level='ERROR'):
+            self.assertIsNone(query_catalog(catalog, "jammy", "20250101", "arm64"))
+        catalog.as_of.assert_called_once_with("jammy", "20250101", "arm64")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,61 +1,81 @@
 '''Test cases for the fetch_ubuntu_images module.'''
+import json
+import os
+import tempfile
 import unittest
-from unittest.mock import patch, mock_open
+from unittest.mock import patch
 from prox_imager.fetch_ubuntu_images import save_metadata
 
 
 class TestSaveMetadata(unittest.TestCase):
     '''Test cases for the save_metadata function.'''
-    @patch("builtins.open", new_callable=mock_open)
-    def test_save_metadata_success(self, mock_file_open):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmp.name, "dummy_output.json")
+        with open(self.output, "w", encoding="utf-8") as f:
+            f.write("previous")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def assert_untouched(self):
+        '''Asserts the previous output is still in place and no temporary file is left.'''
+        with open(self.output, "r", encoding="utf-8") as f:
+            self.assertEqual(f.read(), "previous")
+        self.assertEqual(os.listdir(self.tmp.name), ["dummy_output.json"])
+
+    def test_save_metadata_success(self):
         '''Test save_metadata function with valid metadata.'''
         metadata = {"key": "value"}
-        mock_file = mock_file_open.return_value
         with self.assertLogs('prox_imager.fetch_ubuntu_images', level='INFO') as log:
-            save_metadata(metadata, "dummy_output.json")
-            log_match = "INFO:prox_imager.fetch_ubuntu_images:✅ Saved metadata to dummy_output.json"
+            save_metadata(metadata, self.output)
+            log_match = f"INFO:prox_imager.fetch_ubuntu_images:✅ Saved metadata to {self.output}"
             self.assertIn(log_match, log.output)
-        mock_file_open.assert_called_once_with("dummy_output.json", "w", encoding="utf-8")
-        mock_file.write.assert_any_call('{')
-        mock_file.write.assert_any_call('"key"')
-        mock_file.write.assert_any_call(': ')
-        mock_file.write.assert_any_call('"value"')
-        mock_file.write.assert_any_call('}')
-
-    @patch("builtins.open", side_effect=IOError("Error"))
-    def test_save_metadata_io_error(self, mock_file_open):
+        with open(self.output, "r", encoding="utf-8") as f:
+            self.assertEqual(f.read(), json.dumps(metadata, indent=4))
+        self.assertEqual(os.listdir(self.tmp.name), ["dummy_output.json"])
+
+    @patch("prox_imager.output.os.replace", side_effect=IOError("Error"))
+    def test_save_metadata_io_error(self, mock_replace):
         '''Test save_metadata function with an IOError.'''
         metadata = {"key": "value"}
         with self.assertLogs('prox_imager.fetch_ubuntu_images', level='ERROR') as log:
-            save_metadata(metadata, "dummy_output.json")
+            save_metadata(metadata, self.output)
             log_match = ("ERROR:prox_imager.fetch_ubuntu_images:"
-                         "❌ Failed to save metadata to dummy_output.json - Unknown: Unknown error")
+                         f"❌ Failed to save metadata to {self.output} - Unknown: Unknown error")
             self.assertIn(log_match, log.output)
-        mock_file_open.assert_called_once_with("dummy_output.json", "w", encoding="utf-8")
+        mock_replace.assert_called_once()
+        self.assert_untouched()
 
-    @patch("builtins.open", new_callable=mock_open)
-    @patch("json.dump", side_effect=TypeError("Error"))
-    def test_save_metadata_type_error(self, mock_json_dump, mock_file_open):
+    def test_save_metadata_type_error(self):
         '''Test save_metadata function with a TypeError during JSON serialization.'''
-        metadata = {"key": "value"}
+        metadata = {"key": object()}
         with self.assertLogs('prox_imager.fetch_ubuntu_images', level='ERROR') as log:
-            save_metadata(metadata, "dummy_output.json")
+            save_metadata(metadata, self.output)
             log_match = ("ERROR:prox_imager.fetch_ubuntu_images:"
-                         "❌ Failed to serialize metadata to JSON: Error")
+                         "❌ Failed to serialize metadata to JSON: Object of type object is not JSON serializable")
             self.assertIn(log_match, log.output)
-        mock_file_open.assert_called_once_with("dummy_output.json", "w", encoding="utf-8")
-        mock_json_dump.assert_called_once_with(metadata, mock_file_open(), indent=4)
+        self.assert_untouched()
 
-    @patch("builtins.open", side_effect=PermissionError("Permission denied"))
-    def test_save_metadata_permission_error(self, mock_file_open):
+    @patch("prox_imager.output.os.open", side_effect=PermissionError("Permission denied"))
+    def test_save_metadata_permission_error(self, mock_open):
         '''Test save_metadata function with a PermissionError.'''
         metadata = {"key": "value"}
         with self.assertLogs('prox_imager.fetch_ubuntu_images', level='ERROR') as log:
-            save_metadata(metadata, "dummy_output.json")
+            save_metadata(metadata, self.output)
             log_match = ("ERROR:prox_imager.fetch_ubuntu_images:"
-                         "❌ Permission denied when trying to save metadata to dummy_output.json")
+                         f"❌ Permission denied when trying to save metadata to {self.output}")
             self.assertIn(log_match, log.output)
-        mock_file_open.assert_called_once_with("dummy_output.json", "w", encoding="utf-8")
+        mock_open.assert_called_once()
+        self.assert_untouched()
+
+    def test_save_metadata_format(self):
+        '''Test save_metadata writes the configured format and compression.'''
+        metadata = {"a": {"x": 1}, "b": {"x": 2}}
+        save_metadata(metadata, self.output, {"format": "jsonl", "compression": "gzip"})
+        with open(self.output, "rb") as f:
+            self.assertEqual(f.read(2), b"\x1f\x8b")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,67 @@
+'''Test cases for the streaming extraction functions in fetch_ubuntu_images module.'''
+import json
+import unittest
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+import requests
+
+from prox_imager.fetch_ubuntu_images import (
+    extract_image_data,
+    fetch_image_data_streaming,
+    stream_image_data,
+)
+
+
+class TestStreamImageData(unittest.TestCase):
+    '''Test cases for stream_image_data and fetch_image_data_streaming.'''
+
+    @classmethod
+    def setUpClass(cls):
+        '''Load metadata from JSON file.'''
+        metadata_file = Path(__file__).parent / "metadata_extract_image_data.json"
+        with open(metadata_file, "r", encoding="utf-8") as f:
+            cls.metadata = json.load(f)
+
+    def test_stream_image_data_matches_extract(self):
+        '''Test stream_image_data gives the same result as extract_image_data.'''
+        base_url = "https://cloud-images.ubuntu.com"
+        for name, metadata in self.metadata.items():
+            with self.subTest(name=name):
+                data = json.dumps(metadata).encode("utf-8")
+                chunks = [data[i:i + 5] for i in range(0, len(data), 5)]
+                self.assertEqual(stream_image_data(chunks, base_url),
+                                 extract_image_data(metadata, base_url))
+
+    @patch("prox_imager.http_client.HttpClient.stream")
+    def test_fetch_image_data_streaming_success(self, mock_get):
+        '''Test fetch_image_data_streaming with a successful response.'''
+        data = json.dumps(self.metadata["valid_metadata"]).encode("utf-8")
+        response = MagicMock()
+        response.__enter__.return_value = response
+        response.iter_content.return_value = iter([data[:10], data[10:]])
+        mock_get.return_value = response
+
+        images = fetch_image_data_streaming("http://example.com", "http://base")
+        self.assertEqual(list(images), ["com.ubuntu.cloud.daily:minimal:16.04:amd64"])
+        mock_get.assert_called_once_with("http://example.com", timeout=10)
+
+    @patch("prox_imager.http_client.HttpClient.stream")
+    def test_fetch_image_data_streaming_invalid_json(self, mock_get):
+        '''Test fetch_image_data_streaming with a truncated body.'''
+        response = MagicMock()
+        response.__enter__.return_value = response
+        response.iter_content.return_value = iter([b'{"products": {"p": {'])
+        mock_get.return_value = response
+
+        self.assertEqual(fetch_image_data_streaming("http://example.com", "http://base"), {})
+
+    @patch("prox_imager.http_client.HttpClient.stream", side_effect=requests.exceptions.Timeout)
+    def test_fetch_image_data_streaming_timeout(self, mock_get):
+        '''Test fetch_image_data_streaming with a timeout exception.'''
+        self.assertEqual(fetch_image_data_streaming("http://example.com", "http://base"), {})
+        mock_get.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
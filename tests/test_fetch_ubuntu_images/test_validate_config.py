@@ -26,6 +26,22 @@ class TestValidateConfig(unittest.TestCase):
         config = {}
         self.assertFalse(validate_config(config))
 
+    def test_sources_instead_of_image_urls(self):
+        '''Test validate_config function with [[sources]] replacing [image_urls].'''
+        config = {
+            'files': {},
+            'sources': [{'name': 'a', 'base_url': 'http://a', 'metadata_url': '/a.json'}],
+        }
+        self.assertTrue(validate_config(config))
+
+    def test_source_missing_key(self):
+        '''Test validate_config function with an incomplete [[sources]] entry.'''
+        config = {
+            'files': {},
+            'sources': [{'name': 'a', 'base_url': 'http://a'}],
+        }
+        self.assertFalse(validate_config(config))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,111 @@
+'''Test cases for the HttpClient class in http_client module.'''
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import requests
+
+from prox_imager import http_client
+from prox_imager.fetch_ubuntu_images import fetch_source, get_sources
+from prox_imager.http_client import HttpClient, configure, get_client
+from tests.http_server import LocalServer
+
+
+class TestHttpClient(unittest.TestCase):
+    '''Test cases for the HttpClient class against a local server.'''
+
+    def setUp(self):
+        self.client = HttpClient(backoff_factor=0, backoff_jitter=0)
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_keep_alive(self):
+        '''Test consecutive requests reuse one pooled connection.'''
+        with LocalServer({"/a": b"hello"}) as server:
+            for _ in range(3):
+                self.assertEqual(self.client.get(server.url + "/a").content, b"hello")
+            ports = {address for _, _, _, address in server.requests}
+        self.assertEqual(len(ports), 1)
+
+    def test_retry_on_server_error(self):
+        '''Test retryable statuses are retried until the request succeeds.'''
+        with LocalServer({"/a": b"hello"}) as server:
+            server.fail_next(503, 502)
+            response = self.client.get(server.url + "/a")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(server.requests), 3)
+
+    def test_retries_exhausted(self):
+        '''Test the last error response is returned once retries are exhausted.'''
+        client = HttpClient(retries=1, backoff_factor=0, backoff_jitter=0)
+        with LocalServer({"/a": b"hello"}) as server:
+            server.fail_next(503, 503, 503)
+            response = client.get(server.url + "/a")
+        client.close()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(server.requests), 2)
+
+    def test_no_retry_on_client_error(self):
+        '''Test client errors are not retried.'''
+        with LocalServer({}) as server:
+            self.assertEqual(self.client.get(server.url + "/missing").status_code, 404)
+        self.assertEqual(len(server.requests), 1)
+
+    def test_per_host_limit(self):
+        '''Test no more than per_host_limit requests run against one host at once.'''
+        client = HttpClient(per_host_limit=2)
+        with LocalServer({"/a": b"hello"}) as server:
+            server.httpd.delay = 0.05
+            with ThreadPoolExecutor(max_workers=6) as executor:
+                list(executor.map(lambda _: client.get(server.url + "/a"), range(6)))
+            max_active = server.httpd.max_active
+        client.close()
+        self.assertEqual(max_active, 2)
+
+    def test_stream(self):
+        '''Test stream yields a response whose body is read incrementally.'''
+        with LocalServer({"/a": b"x" * 10000}) as server:
+            with self.client.stream(server.url + "/a") as response:
+                self.assertEqual(b"".join(response.iter_content(1000)), b"x" * 10000)
+
+    def test_timeouts(self):
+        '''Test connect and read timeouts are applied separately.'''
+        client = HttpClient(connect_timeout=2, read_timeout=7)
+        self.assertEqual(client._timeout(None), (2, 7))  # pylint: disable=protected-access
+        self.assertEqual(client._timeout(15), (2, 15))  # pylint: disable=protected-access
+        self.assertEqual(client._timeout((1, 3)), (1, 3))  # pylint: disable=protected-access
+        client.close()
+
+    def test_unknown_setting(self):
+        '''Test unknown settings are rejected.'''
+        with self.assertRaises(ValueError):
+            HttpClient(retry=3)
+
+    def test_configure(self):
+        '''Test configure replaces the shared client with the [http] settings.'''
+        previous = http_client._default_client  # pylint: disable=protected-access
+        try:
+            client = configure({"http": {"retries": 7, "per_host_limit": 3}})
+            self.assertIs(get_client(), client)
+            self.assertEqual(client.retry.total, 7)
+            self.assertEqual(client.settings["per_host_limit"], 3)
+        finally:
+            http_client._default_client = previous  # pylint: disable=protected-access
+
+    def test_configured_read_timeout_applies_to_sources(self):
+        '''Test a source without its own timeout uses the [http] read_timeout.'''
+        previous = http_client._default_client  # pylint: disable=protected-access
+        try:
+            configure({"http": {"connect_timeout": 2, "read_timeout": 42}})
+            config = {"sources": [{"name": "a", "base_url": "http://a", "metadata_url": "/a.json"}]}
+            with patch("requests.Session.request", side_effect=requests.ConnectionError) as mock_request:
+                fetch_source(get_sources(config)[0])
+            self.assertEqual(mock_request.call_args.kwargs["timeout"], (2, 42))
+        finally:
+            get_client().close()
+            http_client._default_client = previous  # pylint: disable=protected-access
+
+
+if __name__ == '__main__':
+    unittest.main()
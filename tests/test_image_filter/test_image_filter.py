@@ -0,0 +1,64 @@
+'''Test cases for the ImageFilter class in image_filter module.'''
+import unittest
+
+from prox_imager.image_filter import DEFAULT_FILTER, ImageFilter, compile_filter
+
+
+class TestImageFilter(unittest.TestCase):
+    '''Test cases for the ImageFilter class.'''
+
+    def test_match_product(self):
+        '''Test arch and release matching by codename or version.'''
+        image_filter = ImageFilter(arches=["amd64", "arm64"], releases=["jammy", "24.04"])
+        self.assertTrue(image_filter.match_product({"arch": "arm64", "release": "jammy"}))
+        self.assertTrue(image_filter.match_product({"arch": "amd64", "release": "noble", "version": "24.04"}))
+        self.assertFalse(image_filter.match_product({"arch": "s390x", "release": "jammy"}))
+        self.assertFalse(image_filter.match_product({"arch": "amd64", "release": "focal", "version": "20.04"}))
+        self.assertTrue(ImageFilter().match_product({"arch": "amd64"}))
+
+    def test_latest_build(self):
+        '''Test the newest build is chosen, ignoring builds before min_build_date.'''
+        versions = {"20250101": {}, "20250301": {}, "20250301.1": {}}
+        self.assertEqual(ImageFilter().latest_build(versions), "20250301.1")
+        self.assertEqual(ImageFilter(min_build_date="20250201").latest_build({"20250101": {}}), None)
+        self.assertEqual(ImageFilter().latest_build({}), None)
+
+    def test_select_items_preference(self):
+        '''Test only the first preferred artifact present is kept.'''
+        image_filter = ImageFilter(item_types=["disk1.img", "img", "tar.gz"])
+        items = {"img": {"path": "/a.img"}, "tar.gz": {"path": "/a.tar.gz"}}
+        self.assertEqual(image_filter.select_items("p", items), [("p", {"path": "/a.img"})])
+        self.assertEqual(image_filter.select_items("p", {"manifest": {}}), [])
+
+    def test_select_items_all(self):
+        '''Test every listed artifact is kept under its own key.'''
+        image_filter = ImageFilter(item_types=["disk1.img", "img", "tar.gz"], all_item_types=True)
+        items = {"img": {"path": "/a.img"}, "tar.gz": {"path": "/a.tar.gz"}}
+        self.assertEqual(image_filter.select_items("p", items),
+                         [("p:img", {"path": "/a.img"}), ("p:tar.gz", {"path": "/a.tar.gz"})])
+
+    def test_empty_item_types(self):
+        '''Test an empty preference list is rejected.'''
+        with self.assertRaises(ValueError):
+            ImageFilter(item_types=[])
+
+    def test_compile_filter(self):
+        '''Test compile_filter reads the [filter] section.'''
+        self.assertIs(compile_filter({}), DEFAULT_FILTER)
+        image_filter = compile_filter({"filter": {"arches": ["arm64"], "releases": ["jammy"],
+                                                  "item_types": ["img"], "min_build_date": 20250101}})
+        self.assertEqual(image_filter.arches, frozenset({"arm64"}))
+        self.assertEqual(image_filter.releases, frozenset({"jammy"}))
+        self.assertEqual(image_filter.item_types, ("img",))
+        self.assertEqual(image_filter.min_build_date, "20250101")
+
+    def test_compile_filter_rejects_non_lists(self):
+        '''Test a bare string or non-string entries are rejected instead of filtering everything out.'''
+        for section in ({"arches": "amd64"}, {"releases": "jammy"}, {"item_types": "disk1.img"},
+                        {"releases": [24.04]}):
+            with self.subTest(section=section), self.assertRaises(ValueError):
+                compile_filter({"filter": section})
+
+
+if __name__ == '__main__':
+    unittest.main()
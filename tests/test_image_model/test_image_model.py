@@ -0,0 +1,90 @@
+'''Test cases for the image_model module.'''
+import io
+import json
+import unittest
+
+from prox_imager.delta import diff_images
+from prox_imager.image_model import ImageCatalog, arch_of
+
+
+def image(release: str, version: str, build_date: str, sha256: str = "ab" * 32) -> dict:
+    '''Builds an image record shaped like extract_image_data output.'''
+    return {"release": release, "version": version, "build_date": build_date,
+            "image_url": f"http://x/{release}/{build_date}.img", "sha256": sha256}
+
+
+IMAGES = {
+    "com.ubuntu.cloud:server:22.04:amd64": image("jammy", "22.04", "20250101"),
+    "com.ubuntu.cloud:server:22.04:arm64": image("jammy", "22.04", "20250102", "unknown"),
+    "com.ubuntu.cloud:server:24.04:amd64": image("noble", "24.04", "20250102", "CD" * 32),
+    "com.ubuntu.cloud:server:24.04:amd64:img": image("noble", "24.04", "20250103"),
+}
+
+
+class TestImageCatalog(unittest.TestCase):
+    '''Test cases for the ImageCatalog class.'''
+
+    def setUp(self):
+        self.catalog = ImageCatalog(IMAGES)
+
+    def test_mapping(self):
+        '''Test the catalog reads back as the original records, including unusual digests.'''
+        self.assertEqual(len(self.catalog), 4)
+        self.assertEqual(dict(self.catalog), IMAGES)
+        self.assertEqual(self.catalog, IMAGES)
+        self.assertIn("com.ubuntu.cloud:server:22.04:amd64", self.catalog)
+        self.assertNotIn("nope", self.catalog)
+        self.assertEqual(list(self.catalog), list(IMAGES))
+
+    def test_select(self):
+        '''Test queries by release codename or version, arch and build date.'''
+        def keys(records):
+            return [record.key for record in records]
+        self.assertEqual(keys(self.catalog.select(release="jammy")), keys(self.catalog.select(release="22.04")))
+        self.assertEqual(keys(self.catalog.select(release="noble", arch="amd64")),
+                         ["com.ubuntu.cloud:server:24.04:amd64", "com.ubuntu.cloud:server:24.04:amd64:img"])
+        self.assertEqual(keys(self.catalog.select(build_date="20250102")),
+                         ["com.ubuntu.cloud:server:22.04:arm64", "com.ubuntu.cloud:server:24.04:amd64"])
+        self.assertEqual(keys(self.catalog.select(arch="s390x")), [])
+        self.assertEqual(len(self.catalog.select()), 4)
+        self.assertEqual(self.catalog.latest("noble").key, "com.ubuntu.cloud:server:24.04:amd64:img")
+        self.assertIsNone(self.catalog.latest("focal"))
+        self.assertEqual(self.catalog.build_dates(), ["20250101", "20250102", "20250103"])
+
+    def test_replace(self):
+        '''Test adding an existing key replaces its record and its index entries.'''
+        self.catalog.add("com.ubuntu.cloud:server:22.04:amd64", image("jammy", "22.04", "20250105"))
+        self.assertEqual(len(self.catalog), 4)
+        self.assertEqual(self.catalog.record("com.ubuntu.cloud:server:22.04:amd64").build_date, "20250105")
+        self.assertEqual(self.catalog.select(build_date="20250101"), [])
+        self.assertEqual(self.catalog.build_dates(), ["20250102", "20250103", "20250105"])
+
+    def test_dump(self):
+        '''Test dump writes exactly what json.dump writes for the dict form.'''
+        for indent in (None, 4):
+            out = io.StringIO()
+            self.catalog.dump(out, indent)
+            self.assertEqual(out.getvalue(), json.dumps(IMAGES, indent=indent))
+        out = io.StringIO()
+        ImageCatalog().dump(out, 4)
+        self.assertEqual(out.getvalue(), "{}")
+
+    def test_diff_against_catalog(self):
+        '''Test diff_images accepts a catalog as the previous snapshot.'''
+        current = dict(IMAGES)
+        del current["com.ubuntu.cloud:server:22.04:arm64"]
+        changes = diff_images(self.catalog, current)
+        self.assertEqual(changes["removed"], ["com.ubuntu.cloud:server:22.04:arm64"])
+        self.assertEqual(changes["added"], {})
+        self.assertEqual(changes["updated"], {})
+
+    def test_arch_of(self):
+        '''Test the arch is read from the product key.'''
+        self.assertEqual(arch_of("com.ubuntu.cloud:server:22.04:arm64:disk1.img"), "arm64")
+        self.assertEqual(arch_of("jammy"), "")
+        self.assertEqual(ImageCatalog({"jammy": IMAGES["com.ubuntu.cloud:server:22.04:amd64"]})
+                         .record("jammy").arch, "")
+
+
+if __name__ == '__main__':
+    unittest.main()
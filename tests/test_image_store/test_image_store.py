@@ -0,0 +1,111 @@
+'''Test cases for the ImageStore class in image_store module.'''
+import os
+import tempfile
+import time
+import unittest
+
+from prox_imager.image_store import ImageStore, build_store
+
+
+SHA_A = "a" * 64
+SHA_B = "b" * 64
+SHA_C = "c" * 64
+
+
+class TestImageStore(unittest.TestCase):
+    '''Test cases for the ImageStore class.'''
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ImageStore(os.path.join(self.tmp.name, "store"), budget_bytes=250)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def write(self, name: str, size: int = 100) -> str:
+        '''Creates a file of the given size in the temp directory.'''
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(name.encode()[:1] * size)
+        return path
+
+    def test_add_and_link(self):
+        '''Test an added file can be hardlinked elsewhere.'''
+        path = self.write("a.img")
+        object_path = self.store.add(path, SHA_A)
+        self.assertTrue(self.store.has(SHA_A))
+        self.assertTrue(os.path.samefile(path, object_path))
+        dest = os.path.join(self.tmp.name, "copy.img")
+        self.assertTrue(self.store.link(SHA_A, dest))
+        self.assertTrue(os.path.samefile(dest, object_path))
+        self.assertFalse(self.store.link(SHA_B, dest))
+
+    def test_add_deduplicates(self):
+        '''Test adding identical bytes under another name shares the existing object.'''
+        first = self.write("a.img")
+        second = self.write("a2.img")
+        self.store.add(first, SHA_A)
+        self.store.add(second, SHA_A)
+        self.assertTrue(os.path.samefile(first, second))
+        self.assertEqual(self.store.total_bytes(), 100)
+
+    def test_evict_lru(self):
+        '''Test the least recently used object is evicted over budget, with its links.'''
+        a = self.write("a.img")
+        self.store.add(a, SHA_A)
+        time.sleep(0.01)
+        self.store.add(self.write("b.img"), SHA_B)
+        time.sleep(0.01)
+        self.store.add(self.write("c.img"), SHA_C)
+        self.assertFalse(self.store.has(SHA_A))
+        self.assertFalse(os.path.exists(a))
+        self.assertTrue(self.store.has(SHA_B))
+        self.assertTrue(self.store.has(SHA_C))
+        self.assertEqual(self.store.total_bytes(), 200)
+
+    def test_evict_keeps_referenced(self):
+        '''Test objects referenced by a template are never evicted.'''
+        self.store.add(self.write("a.img"), SHA_A)
+        self.store.reference("template-9000", SHA_A)
+        time.sleep(0.01)
+        self.store.add(self.write("b.img"), SHA_B)
+        time.sleep(0.01)
+        self.store.add(self.write("c.img"), SHA_C)
+        self.assertTrue(self.store.has(SHA_A))
+        self.assertFalse(self.store.has(SHA_B))
+        self.store.release("template-9000")
+        self.assertEqual(self.store.evict(), [])
+        self.store.budget_bytes = 100
+        self.assertEqual(self.store.evict(), [SHA_A])
+
+    def test_evict_keeps_objects_in_use(self):
+        '''Test objects passed as keep and a file just added are not evicted.'''
+        self.store.add(self.write("a.img"), SHA_A, evict=False)
+        time.sleep(0.01)
+        self.store.add(self.write("b.img"), SHA_B, evict=False)
+        self.store.budget_bytes = 100
+        self.assertEqual(self.store.evict(keep=[SHA_A, SHA_B]), [])
+        self.store.budget_bytes = 50
+        self.store.add(self.write("c.img"), SHA_C)
+        self.assertEqual([self.store.has(sha) for sha in (SHA_A, SHA_B, SHA_C)], [False, False, True])
+
+    def test_index_persists(self):
+        '''Test a new store instance sees objects from the index.'''
+        self.store.add(self.write("a.img"), SHA_A)
+        other = ImageStore(self.store.root)
+        try:
+            self.assertTrue(other.has(SHA_A))
+        finally:
+            other.close()
+
+    def test_build_store(self):
+        '''Test build_store is only enabled by a [store] section.'''
+        self.assertIsNone(build_store({}))
+        store = build_store({"store": {"directory": os.path.join(self.tmp.name, "s2"), "budget_bytes": 5}})
+        self.assertEqual(store.budget_bytes, 5)
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+'''Test cases for the MetadataCache class in metadata_cache module.'''
+import os
+import tempfile
+import time
+import unittest
+
+from prox_imager.metadata_cache import MetadataCache, build_cache
+
+
+class TestMetadataCache(unittest.TestCase):
+    '''Test cases for the MetadataCache class.'''
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = MetadataCache(self.tmp.name, max_bytes=1024, max_age=60)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_store_and_load(self):
+        '''Test a stored entry yields conditional headers and its parsed document.'''
+        self.cache.store("http://example.com/a", b'{"products": {}}',
+                         '"abc"', "Tue, 01 Apr 2025 00:00:00 GMT", {"products": {}})
+        self.assertEqual(self.cache.conditional_headers("http://example.com/a"),
+                         {"If-None-Match": '"abc"',
+                          "If-Modified-Since": "Tue, 01 Apr 2025 00:00:00 GMT"})
+        self.assertEqual(self.cache.load("http://example.com/a"), {"products": {}})
+
+    def test_load_from_disk(self):
+        '''Test a fresh cache instance decodes the stored body.'''
+        self.cache.store("http://example.com/a", b'{"products": {"p": {}}}', '"abc"', None,
+                         {"products": {"p": {}}})
+        cache = MetadataCache(self.tmp.name, max_bytes=1024, max_age=60)
+        self.assertEqual(cache.load("http://example.com/a"), {"products": {"p": {}}})
+
+    def test_store_without_validators(self):
+        '''Test responses without ETag or Last-Modified are not cached.'''
+        self.cache.store("http://example.com/a", b'{}', None, None, {})
+        self.assertEqual(self.cache.conditional_headers("http://example.com/a"), {})
+        self.assertIsNone(self.cache.load("http://example.com/a"))
+
+    def test_expired_entry(self):
+        '''Test entries older than max_age are evicted on lookup.'''
+        self.cache.store("http://example.com/a", b'{}', '"abc"', None, {})
+        self.cache.max_age = 0
+        time.sleep(0.01)
+        self.assertIsNone(self.cache.lookup("http://example.com/a"))
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_size_eviction(self):
+        '''Test least recently used entries are evicted once max_bytes is exceeded.'''
+        body = b"x" * 600
+        self.cache.store("http://example.com/old", body, '"1"', None, {})
+        time.sleep(0.01)
+        self.cache.store("http://example.com/new", body, '"2"', None, {})
+        self.assertIsNone(self.cache.lookup("http://example.com/old"))
+        self.assertIsNotNone(self.cache.lookup("http://example.com/new"))
+
+    def test_revalidated_restarts_max_age(self):
+        '''Test a revalidated entry is not expired by its original store time.'''
+        self.cache.store("http://example.com/a", b'{}', '"abc"', None, {})
+        self.cache.max_age = 0.05
+        time.sleep(0.03)
+        self.cache.revalidated("http://example.com/a")
+        time.sleep(0.03)
+        self.assertIsNotNone(self.cache.lookup("http://example.com/a"))
+
+    def test_extracted(self):
+        '''Test derived data survives a new instance and is dropped once the body changes.'''
+        self.cache.store("http://example.com/a", b'{}', '"1"', None, {})
+        self.cache.store_extracted("http://example.com/a", "filter", {"p": {"sha256": "x"}})
+        cache = MetadataCache(self.tmp.name, max_bytes=1024, max_age=60)
+        self.assertEqual(cache.load_extracted("http://example.com/a", "filter"), {"p": {"sha256": "x"}})
+        self.assertIsNone(cache.load_extracted("http://example.com/a", "other filter"))
+
+        cache.store("http://example.com/a", b'{"products": {}}', '"2"', None, {"products": {}})
+        self.assertIsNone(cache.load_extracted("http://example.com/a", "filter"))
+        cache.max_age = 0
+        time.sleep(0.01)
+        cache.evict()
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_memo_dropped_once_extracted(self):
+        '''Test the parsed document is only kept in memory until derived data is stored.'''
+        self.cache.store("http://example.com/a", b'{"products": {}}', '"1"', None, {"products": {}})
+        memo = self.cache.load("http://example.com/a")
+        self.assertIs(self.cache.load("http://example.com/a"), memo)
+        self.cache.store_extracted("http://example.com/a", "filter", {})
+        loaded = self.cache.load("http://example.com/a")
+        self.assertEqual(loaded, {"products": {}})
+        self.assertIsNot(loaded, memo)
+
+    def test_build_cache(self):
+        '''Test build_cache reads the [cache] section.'''
+        cache = build_cache({"cache": {"directory": self.tmp.name, "max_bytes": 10, "max_age": 5}})
+        self.assertEqual(cache.cache_dir, self.tmp.name)
+        self.assertEqual(cache.max_bytes, 10)
+        self.assertEqual(cache.max_age, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+'''Test cases for the metrics module.'''
+import json
+import os
+import pstats
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from prox_imager.metrics import METRICS, Metrics, export_metrics, profiled, timed
+
+
+class TestMetrics(unittest.TestCase):
+    '''Test cases for the Metrics registry and its exporters.'''
+
+    def setUp(self):
+        self.metrics = Metrics()
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_counters_and_timers(self):
+        '''Test counters add up per label set and timers keep count, total, max and last.'''
+        self.metrics.inc("http_responses_total", url="http://a", status=200)
+        self.metrics.inc("http_responses_total", url="http://a", status=200)
+        self.metrics.inc("http_responses_total", url="http://a", status=404)
+        self.metrics.observe("save_metadata", 0.5)
+        self.metrics.observe("save_metadata", 0.25)
+
+        summary = self.metrics.summary()
+        self.assertEqual([c["value"] for c in summary["counters"]], [2, 1])
+        self.assertEqual(summary["stages"], [{"stage": "save_metadata", "labels": {}, "count": 2,
+                                              "seconds_total": 0.75, "seconds_max": 0.5,
+                                              "seconds_last": 0.25}])
+
+    def test_to_prometheus(self):
+        '''Test the text exposition groups samples into typed, documented families.'''
+        self.metrics.observe("fetch_ubuntu_metadata", 1.5, url="http://a")
+        self.metrics.inc("metadata_cache_total", result="hit")
+        self.metrics.set("images", 3)
+        self.metrics.inc("http_responses_total", url='http://"quoted"', status="error")
+
+        text = self.metrics.to_prometheus()
+        self.assertIn("# TYPE prox_imager_stage_seconds summary\n", text)
+        self.assertIn('prox_imager_stage_seconds_count{stage="fetch_ubuntu_metadata",url="http://a"} 1\n', text)
+        self.assertIn('prox_imager_stage_seconds_sum{stage="fetch_ubuntu_metadata",url="http://a"} 1.5\n', text)
+        self.assertIn("# TYPE prox_imager_metadata_cache_total counter\n", text)
+        self.assertIn('prox_imager_metadata_cache_total{result="hit"} 1\n', text)
+        self.assertIn("# TYPE prox_imager_images gauge\nprox_imager_images 3\n", text)
+        self.assertIn('url="http://\\"quoted\\""', text)
+
+    def test_timed(self):
+        '''Test the decorator records a run even when the function raises.'''
+        @timed("boom")
+        def boom():
+            raise ValueError("boom")
+
+        with patch("prox_imager.metrics.METRICS", self.metrics):
+            with self.assertRaises(ValueError):
+                boom()
+        self.assertEqual(self.metrics.summary()["stages"][0]["count"], 1)
+
+    def test_export_metrics(self):
+        '''Test the configured textfile and JSON summary are written.'''
+        textfile = os.path.join(self.tmp.name, "prom", "prox_imager.prom")
+        summary_file = os.path.join(self.tmp.name, "metrics.json")
+        self.metrics.inc("products_kept_total", 4)
+
+        export_metrics({"metrics": {"textfile": textfile, "summary_file": summary_file}}, self.metrics)
+
+        with open(textfile, encoding="utf-8") as f:
+            self.assertIn("prox_imager_products_kept_total 4\n", f.read())
+        with open(summary_file, encoding="utf-8") as f:
+            summary = json.load(f)
+        self.assertIn({"name": "last_run_timestamp_seconds", "labels": {}, "value": summary["gauges"][0]["value"]},
+                      summary["gauges"])
+        self.assertFalse(os.path.exists(textfile + ".tmp"))
+
+    def test_export_metrics_unwritable(self):
+        '''Test a failing export is logged instead of raised.'''
+        path = os.path.join(self.tmp.name, "missing-file", "x.prom")
+        with open(os.path.join(self.tmp.name, "missing-file"), "w", encoding="utf-8"):
+            pass
+        with self.assertLogs("prox_imager.metrics", level="ERROR"):
+            export_metrics({"metrics": {"textfile": path}}, self.metrics)
+
+    def test_profiled(self):
+        '''Test the profile is dumped in pstats format, and nothing happens without a path.'''
+        path = os.path.join(self.tmp.name, "run.prof")
+        with profiled(path):
+            sorted(range(1000))
+        self.assertGreater(pstats.Stats(path).total_calls, 0)
+        with profiled(None):
+            pass
+
+
+class TestFetchMetrics(unittest.TestCase):
+    '''Test the stages of fetch_ubuntu_images record into METRICS.'''
+
+    def setUp(self):
+        METRICS.reset()
+
+    def tearDown(self):
+        METRICS.reset()
+
+    def test_extract_image_data_counts_products(self):
+        '''Test scanned, skipped and kept products are counted.'''
+        from prox_imager.fetch_ubuntu_images import extract_image_data  # pylint: disable=import-outside-toplevel
+        item = {"items": {"disk1.img": {"path": "/a.img", "sha256": "x"}}}
+        metadata = {"products": {
+            "kept": {"arch": "amd64", "versions": {"20250101": item}},
+            "other-arch": {"arch": "arm64", "versions": {"20250101": item}},
+            "no-builds": {"arch": "amd64", "versions": {}},
+        }}
+        extract_image_data(metadata, "http://a")
+
+        counters = {c["name"]: c["value"] for c in METRICS.summary()["counters"]}
+        self.assertEqual(counters, {"products_scanned_total": 3, "products_skipped_total": 2,
+                                    "products_kept_total": 1})
+        self.assertEqual([s["stage"] for s in METRICS.summary()["stages"]], ["extract_image_data"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+'''Test cases for the mirror module.'''
+import os
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from prox_imager.mirror import MirrorCache, MirrorServer, mirrored_url, parse_range
+from tests.http_server import FileHandler, LocalServer
+
+
+DATA = os.urandom(300_000)
+
+
+class GatedHandler(FileHandler):
+    '''Sends the first half of a file, then waits for server.gate before sending the rest.'''
+
+    def _respond(self, failure, send_body: bool):
+        data = self.server.files.get(self.path)
+        if failure is not None or data is None or not send_body:
+            super()._respond(failure, send_body)
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        half = len(data) // 2
+        self.wfile.write(data[:half])
+        self.wfile.flush()
+        self.server.gate.wait(5)
+        self.wfile.write(data[half:])
+
+
+class TestMirror(unittest.TestCase):
+    '''Test cases for the mirror server.'''
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def start_mirror(self, upstream_url: str, metadata_ttl: float = 300) -> str:
+        '''Runs a mirror of upstream_url for the duration of the test and returns its URL.'''
+        cache = MirrorCache(self.tmp.name, upstream_url, metadata_ttl, chunk_size=16384)
+        server = MirrorServer(("127.0.0.1", 0), cache)
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    def test_fetches_once_and_serves_from_cache(self):
+        '''Test concurrent and later requests share a single upstream download.'''
+        with LocalServer({"/img/a.img": DATA}) as upstream:
+            upstream.httpd.delay = 0.2
+            mirror = self.start_mirror(upstream.url)
+            with ThreadPoolExecutor(max_workers=5) as executor:
+                bodies = list(executor.map(lambda _: requests.get(mirror + "/img/a.img", timeout=5).content,
+                                           range(5)))
+            later = requests.get(mirror + "/img/a.img", timeout=5)
+            gets = [path for method, path, _, _ in upstream.requests if method == "GET"]
+        self.assertEqual(bodies, [DATA] * 5)
+        self.assertEqual(later.content, DATA)
+        self.assertEqual(gets, ["/img/a.img"])
+        with open(os.path.join(self.tmp.name, "img", "a.img"), "rb") as f:
+            self.assertEqual(f.read(), DATA)
+
+    def test_streams_while_downloading(self):
+        '''Test clients get the first bytes and ranges of a file before upstream finished sending it.'''
+        with LocalServer({"/a.img": DATA}, handler=GatedHandler) as upstream:
+            upstream.httpd.gate = threading.Event()
+            mirror = self.start_mirror(upstream.url)
+            with requests.get(mirror + "/a.img", stream=True, timeout=5) as response:
+                self.assertEqual(response.headers["Content-Length"], str(len(DATA)))
+                first = response.raw.read(1000)
+                head = requests.get(mirror + "/a.img", headers={"Range": "bytes=10-19"}, timeout=5)
+                upstream.httpd.gate.set()
+                rest = response.raw.read()
+        self.assertEqual(first + rest, DATA)
+        self.assertEqual(head.status_code, 206)
+        self.assertEqual(head.content, DATA[10:20])
+        self.assertEqual(head.headers["Content-Range"], f"bytes 10-19/{len(DATA)}")
+
+    def test_ranges_from_cache(self):
+        '''Test range requests on a mirrored file, including unsatisfiable ones.'''
+        with LocalServer({"/a.img": DATA}) as upstream:
+            mirror = self.start_mirror(upstream.url)
+            requests.get(mirror + "/a.img", timeout=5)
+            suffix = requests.get(mirror + "/a.img", headers={"Range": "bytes=-100"}, timeout=5)
+            invalid = requests.get(mirror + "/a.img", headers={"Range": f"bytes={len(DATA)}-"}, timeout=5)
+            head = requests.head(mirror + "/a.img", timeout=5)
+        self.assertEqual(suffix.status_code, 206)
+        self.assertEqual(suffix.content, DATA[-100:])
+        self.assertEqual(invalid.status_code, 416)
+        self.assertEqual(head.headers["Content-Length"], str(len(DATA)))
+        self.assertEqual(head.headers["Accept-Ranges"], "bytes")
+
+    def test_metadata_refresh_and_stale_fallback(self):
+        '''Test metadata is refetched after metadata_ttl and served stale if upstream fails.'''
+        files = {"/streams/v1/index.json": b'{"v": 1}'}
+        with LocalServer(files) as upstream:
+            mirror = self.start_mirror(upstream.url, metadata_ttl=0.05)
+            self.assertEqual(requests.get(mirror + "/streams/v1/index.json", timeout=5).content, b'{"v": 1}')
+            files["/streams/v1/index.json"] = b'{"v": 2}'
+            time.sleep(0.1)
+            self.assertEqual(requests.get(mirror + "/streams/v1/index.json", timeout=5).content, b'{"v": 2}')
+            time.sleep(0.1)
+            upstream.fail_next(404)
+            self.assertEqual(requests.get(mirror + "/streams/v1/index.json", timeout=5).content, b'{"v": 2}')
+
+    def test_upstream_errors(self):
+        '''Test missing files are passed on as 404 and paths outside the mirror are refused.'''
+        with LocalServer({}) as upstream:
+            mirror = self.start_mirror(upstream.url)
+            self.assertEqual(requests.get(mirror + "/missing.img", timeout=5).status_code, 404)
+            self.assertEqual(requests.get(mirror + "/a/../../etc/passwd", timeout=5).status_code, 404)
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_parse_range(self):
+        '''Test Range header parsing.'''
+        self.assertEqual(parse_range("bytes=0-9", 100), (0, 9))
+        self.assertEqual(parse_range("bytes=90-", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=90-200", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=-10", 100), (90, 99))
+        self.assertIsNone(parse_range(None, 100))
+        self.assertIsNone(parse_range("bytes=0-1,5-6", 100))
+        self.assertIsNone(parse_range("bytes=a-b", 100))
+        with self.assertRaises(ValueError):
+            parse_range("bytes=100-", 100)
+
+    def test_mirrored_url(self):
+        '''Test only base URLs under the mirror's upstream are rewritten.'''
+        config = {"mirror": {"url": "http://mirror.lan:8080/", "upstream": "https://cloud-images.ubuntu.com"}}
+        self.assertEqual(mirrored_url("https://cloud-images.ubuntu.com/minimal/daily", config),
+                         "http://mirror.lan:8080/minimal/daily")
+        self.assertEqual(mirrored_url("https://cloud-images.ubuntu.com.evil/x", config),
+                         "https://cloud-images.ubuntu.com.evil/x")
+        self.assertEqual(mirrored_url("https://cloud-images.ubuntu.com/x", {}), "https://cloud-images.ubuntu.com/x")
+
+
+if __name__ == '__main__':
+    unittest.main()
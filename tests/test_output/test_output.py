@@ -0,0 +1,103 @@
+'''Test cases for the output module.'''
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from prox_imager.output import atomic_write, iter_output, output_settings, read_output, write_output
+
+
+DATA = {f"com.ubuntu.cloud:server:{n}:amd64": {"release": "jammy", "build_date": str(n), "note": "é"}
+        for n in range(50)}
+
+
+def has_zstandard() -> bool:
+    '''Tells whether the optional zstandard package is installed.'''
+    try:
+        import zstandard  # noqa: F401  pylint: disable=import-outside-toplevel,unused-import
+    except ImportError:
+        return False
+    return True
+
+
+class TestOutput(unittest.TestCase):
+    '''Test cases for write_output and its readers.'''
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "images.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def round_trip(self, output_format: str, compression: str, data: dict = DATA) -> None:
+        '''Writes data and checks both readers give it back.'''
+        write_output(data, self.path, output_format, compression)
+        self.assertEqual(read_output(self.path), data)
+        self.assertEqual(list(iter_output(self.path)), list(data.items()))
+        self.assertEqual(os.listdir(self.tmp.name), ["images.json"])
+
+    def test_formats(self):
+        '''Test every format and compression reads back unchanged.'''
+        for output_format in ("json", "compact", "jsonl"):
+            for compression in ("none", "gzip"):
+                with self.subTest(format=output_format, compression=compression):
+                    self.round_trip(output_format, compression)
+                    self.round_trip(output_format, compression, {})
+
+    @unittest.skipUnless(has_zstandard(), "zstandard is not installed")
+    def test_zstd(self):
+        '''Test zstd compressed output reads back unchanged.'''
+        self.round_trip("jsonl", "zstd")
+
+    def test_layouts(self):
+        '''Test the json layout matches earlier versions and jsonl has one entry per line.'''
+        write_output(DATA, self.path)
+        with open(self.path, "r", encoding="utf-8") as f:
+            self.assertEqual(f.read(), json.dumps(DATA, indent=4))
+        write_output(DATA, self.path, "jsonl", "gzip")
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), len(DATA))
+        self.assertEqual(json.loads(lines[0]), [next(iter(DATA)), next(iter(DATA.values()))])
+
+    def test_failure_keeps_previous_file(self):
+        '''Test a failing write leaves the previous file in place and removes the temporary file.'''
+        write_output({"old": 1}, self.path)
+        with patch("prox_imager.output.os.fsync", side_effect=OSError("disk gone")):
+            with self.assertRaises(OSError):
+                write_output(DATA, self.path, "compact", "gzip")
+        self.assertEqual(read_output(self.path), {"old": 1})
+        self.assertEqual(os.listdir(self.tmp.name), ["images.json"])
+
+    def test_atomic_write(self):
+        '''Test atomic_write creates parent directories and only replaces the target on success.'''
+        path = os.path.join(self.tmp.name, "state", "cache.json")
+        with atomic_write(path, "w", makedirs=True) as f:
+            f.write("first")
+        with self.assertRaises(RuntimeError):
+            with atomic_write(path, "w") as f:
+                f.write("second")
+                raise RuntimeError("interrupted")
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "first")
+        self.assertEqual(os.listdir(os.path.dirname(path)), ["cache.json"])
+
+    def test_output_settings(self):
+        '''Test [files] format and compression validation.'''
+        self.assertEqual(output_settings({"files": {}}), {"format": "json", "compression": "none"})
+        self.assertEqual(output_settings({"files": {"format": "jsonl", "compression": "gzip"}}),
+                         {"format": "jsonl", "compression": "gzip"})
+        with self.assertRaises(ValueError):
+            output_settings({"files": {"format": "yaml"}})
+        with self.assertRaises(ValueError):
+            output_settings({"files": {"compression": "bz2"}})
+        if not has_zstandard():
+            with self.assertRaises(ValueError):
+                output_settings({"files": {"compression": "zstd"}})
+
+
+if __name__ == '__main__':
+    unittest.main()
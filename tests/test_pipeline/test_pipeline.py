@@ -0,0 +1,299 @@
+'''Test cases for the pipeline module.'''
+import hashlib
+import os
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import closing
+from unittest.mock import Mock, patch
+
+from prox_imager.pipeline import (
+    DEFAULT_PIPELINE_CONFIG,
+    Pipeline,
+    ProxmoxBackend,
+    QmBackend,
+    build_templates,
+    load_backend,
+    template_name,
+)
+from tests.http_server import LocalServer
+
+
+class StubBackend(ProxmoxBackend):
+    '''Records created templates instead of talking to Proxmox.'''
+
+    def __init__(self, existing=(), fail=()):
+        self.existing = set(existing)
+        self.fail = set(fail)
+        self.created = {}
+        self.lock = threading.Lock()
+
+    def template_exists(self, name: str) -> bool:
+        return name in self.existing
+
+    def create_template(self, name: str, disk: str, settings: dict) -> int:
+        if name in self.fail:
+            raise RuntimeError("storage full")
+        with open(disk, "rb") as f:
+            data = f.read()
+        with self.lock:
+            vmid = 9000 + len(self.created)
+            self.created[name] = (vmid, data)
+        return vmid
+
+
+class TestPipeline(unittest.TestCase):
+    '''Test cases for the Pipeline engine.'''
+
+    def test_stages_overlap_and_failures_are_isolated(self):
+        '''Test jobs run through every stage concurrently and a failing job does not stop the others.'''
+        active = {"slow": 0, "max": 0}
+        lock = threading.Lock()
+
+        def slow(job):
+            with lock:
+                active["slow"] += 1
+                active["max"] = max(active["max"], active["slow"])
+            time.sleep(0.05)
+            with lock:
+                active["slow"] -= 1
+            if job["n"] == 3:
+                raise ValueError("bad image")
+            return True
+
+        def tag(job):
+            job["tagged"] = True
+            return job["n"] != 5
+
+        pipeline = Pipeline([("slow", slow, 3), ("tag", tag, 1)], queue_size=1)
+        start = time.monotonic()
+        results = pipeline.run({"n": n, "error": None} for n in range(9))
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual(active["max"], 3)
+        self.assertEqual(sorted(job["n"] for job in results), list(range(9)))
+        errors = {job["n"]: job["error"] for job in results if job["error"]}
+        self.assertEqual(errors, {3: "slow: bad image", 5: "tag failed"})
+        self.assertTrue(all(job.get("tagged") for job in results if job["n"] != 3))
+
+    def test_empty(self):
+        '''Test a pipeline without jobs finishes.'''
+        self.assertEqual(Pipeline([("a", bool, 2), ("b", bool, 2)]).run([]), [])
+
+
+class TestBuildTemplates(unittest.TestCase):
+    '''Test cases for build_templates.'''
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = {"download": {"directory": os.path.join(self.tmp.name, "images")},
+                       "verify": {"cache_file": os.path.join(self.tmp.name, "hashes.json")},
+                       "pipeline": {"work_dir": os.path.join(self.tmp.name, "work")}}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def images(self, server, files: dict) -> dict:
+        '''Builds extract_image_data records for files served by server.'''
+        return {f"product-{name}": {"release": name, "version": "1", "build_date": "20250101",
+                                    "image_url": f"{server.url}/{name}.img",
+                                    "sha256": hashlib.sha256(data).hexdigest()}
+                for name, data in files.items()}
+
+    def test_build_templates(self):
+        '''Test templates are created, existing ones skipped and failures reported per image.'''
+        files = {"jammy": b"j" * 5000, "noble": b"n" * 5000, "focal": b"f" * 5000, "bionic": b"b" * 5000}
+        backend = StubBackend(existing={"focal-20250101"}, fail={"bionic-20250101"})
+        with LocalServer({f"/{name}.img": data for name, data in files.items()}) as server:
+            images = self.images(server, files)
+            images["product-jammy"]["sha256"] = "0" * 64  # corrupt checksum: fails in download
+            results = build_templates(images, self.config, backend)
+
+        self.assertEqual(results, {"product-jammy": None, "product-noble": 9000,
+                                   "product-focal": None, "product-bionic": None})
+        self.assertEqual(backend.created, {"noble-20250101": (9000, files["noble"])})
+
+    def test_templates_reference_store(self):
+        '''Test a created template is recorded as a reference to its image in the store.'''
+        files = {"jammy": b"j" * 5000}
+        store_dir = os.path.join(self.tmp.name, "store")
+        self.config["store"] = {"directory": store_dir}
+        with LocalServer({"/jammy.img": files["jammy"]}) as server:
+            images = self.images(server, files)
+            build_templates(images, self.config, StubBackend())
+        with closing(sqlite3.connect(os.path.join(store_dir, "index.sqlite"))) as db:
+            refs = db.execute("SELECT name, sha256 FROM refs").fetchall()
+        self.assertEqual(refs, [("jammy-20250101", images["product-jammy"]["sha256"])])
+
+    def test_downloads_use_store(self):
+        '''Test an image already in the store is linked instead of downloaded.'''
+        data = b"j" * 5000
+        self.config["store"] = {"directory": os.path.join(self.tmp.name, "store")}
+        backend = StubBackend()
+        with LocalServer({"/jammy.img": data, "/other/jammy-copy.img": data}) as server:
+            images = self.images(server, {"jammy": data})
+            build_templates(images, self.config, backend)
+            images["product-jammy"]["image_url"] = f"{server.url}/other/jammy-copy.img"
+            images["product-jammy"]["build_date"] = "20250102"
+            build_templates(images, self.config, backend)
+            gets = [path for method, path, _, _ in server.requests if method == "GET"]
+        self.assertNotIn("/other/jammy-copy.img", gets)
+        self.assertEqual(backend.created["jammy-20250102"], (9001, data))
+
+    @patch("prox_imager.pipeline.subprocess.run")
+    def test_convert_and_resize(self, mock_run):
+        '''Test qemu-img converts into the work directory and the copy is removed after import.'''
+        files = {"jammy": b"j" * 5000}
+        self.config["pipeline"].update({"format": "raw", "disk_size": "20G"})
+        disks = []
+
+        def fake_run(args, **_kwargs):
+            if args[1] == "convert":
+                with open(args[-1], "wb") as f:
+                    f.write(b"converted")
+            return Mock(returncode=0)
+        mock_run.side_effect = fake_run
+
+        backend = StubBackend()
+        backend.create_template = lambda name, disk, settings: disks.append(disk) or 100
+        with LocalServer({"/jammy.img": files["jammy"]}) as server:
+            results = build_templates(self.images(server, files), self.config, backend)
+
+        work_disk = os.path.join(self.tmp.name, "work", "jammy-20250101.raw")
+        self.assertEqual(results, {"product-jammy": 100})
+        self.assertEqual(disks, [work_disk])
+        self.assertEqual([call.args[0][1] for call in mock_run.call_args_list], ["convert", "resize"])
+        self.assertEqual(mock_run.call_args_list[1].args[0], ["qemu-img", "resize", work_disk, "20G"])
+        self.assertFalse(os.path.exists(work_disk))
+
+    @patch("prox_imager.pipeline.subprocess.run")
+    def test_resize_copies_download(self, mock_run):
+        '''Test a resize works on a copy of the download, which is removed after import.'''
+        files = {"jammy": b"j" * 5000}
+        self.config["pipeline"]["disk_size"] = "20G"
+        mock_run.return_value = Mock(returncode=0)
+        disks = []
+
+        def create_template(name, disk, settings):
+            with open(disk, "rb") as f:
+                disks.append((disk, f.read()))
+            return 100
+        backend = StubBackend()
+        backend.create_template = create_template
+        with LocalServer({"/jammy.img": files["jammy"]}) as server:
+            results = build_templates(self.images(server, files), self.config, backend)
+
+        work_disk = os.path.join(self.tmp.name, "work", "jammy.img")
+        self.assertEqual(results, {"product-jammy": 100})
+        self.assertEqual(mock_run.call_args_list[0].args[0], ["qemu-img", "resize", work_disk, "20G"])
+        self.assertEqual(disks, [(work_disk, files["jammy"])])
+        self.assertFalse(os.path.exists(work_disk))
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, "images", "jammy.img")))
+
+    def test_invalid_backend(self):
+        '''Test an unknown backend is reported instead of raised.'''
+        self.config["pipeline"]["backend"] = "nope"
+        self.assertEqual(build_templates({}, self.config), {})
+
+    def test_load_backend(self):
+        '''Test backends load by short name or module path.'''
+        self.assertIsInstance(load_backend("qm"), QmBackend)
+        self.assertIsInstance(load_backend("tests.test_pipeline.test_pipeline:StubBackend"), StubBackend)
+
+    def test_template_name(self):
+        '''Test template names are reduced to characters Proxmox accepts.'''
+        self.assertEqual(template_name("p", {"release": "jammy", "build_date": "20250101.1"},
+                                       "ubuntu {release}_{build_date}"), "ubuntu-jammy-20250101.1")
+
+    def test_default_template_name(self):
+        '''Test the default name tells arches and artifacts apart.'''
+        image = {"release": "jammy", "build_date": "20250101"}
+        name_template = DEFAULT_PIPELINE_CONFIG["name_template"]
+        self.assertEqual(template_name("com.ubuntu.cloud:server:22.04:arm64", image, name_template),
+                         "jammy-arm64-20250101")
+        self.assertEqual(template_name("com.ubuntu.cloud:server:22.04:amd64:disk1.img", image, name_template),
+                         "jammy-amd64-20250101-disk1.img")
+
+    def test_duplicate_names_are_rejected(self):
+        '''Test products that would get the same template name are reported and not built.'''
+        image = {"release": "jammy", "version": "22.04", "build_date": "20250101",
+                 "image_url": "http://a/jammy.img", "sha256": "0" * 64}
+        self.config["pipeline"]["name_template"] = "{release}-{build_date}"
+        backend = StubBackend()
+        images = {"com.ubuntu.cloud:server:22.04:amd64": image, "com.ubuntu.cloud:server:22.04:arm64": image}
+        with self.assertLogs("prox_imager.pipeline", level="ERROR") as logs:
+            results = build_templates(images, self.config, backend)
+        self.assertEqual(results, dict.fromkeys(images))
+        self.assertIn("jammy-20250101", logs.output[0])
+        self.assertEqual(backend.created, {})
+
+
+class TestQmBackend(unittest.TestCase):
+    '''Test cases for the QmBackend class.'''
+
+    def test_create_template(self):
+        '''Test the qm commands issued for a template, and the cleanup when the import fails.'''
+        calls = []
+
+        def runner(args, **_kwargs):
+            calls.append(args)
+            if args[:2] == ["pvesh", "get"]:
+                return Mock(stdout="9001\n")
+            if args[:2] == ["qm", "set"] and len(calls) > 4:
+                raise subprocess.CalledProcessError(1, args)
+            return Mock(stdout="")
+
+        backend = QmBackend(runner)
+        settings = {"memory": 1024, "cores": 1, "bridge": "vmbr1", "storage": "tank"}
+        self.assertEqual(backend.create_template("jammy", "/images/a.img", settings), 9001)
+        self.assertEqual([call[:2] for call in calls],
+                         [["pvesh", "get"], ["qm", "create"], ["qm", "set"], ["qm", "template"]])
+        self.assertIn("tank:0,import-from=/images/a.img", calls[2])
+
+        with self.assertRaises(subprocess.CalledProcessError):
+            backend.create_template("noble", "/images/b.img", settings)
+        self.assertEqual(calls[-1], ["qm", "destroy", "9001", "--purge"])
+
+    def test_create_template_on_directory_storage(self):
+        '''Test the disk is staged as the VM's volume and attached by volume ID instead of imported.'''
+        calls = []
+
+        def runner(args, **_kwargs):
+            calls.append(args)
+            if args[:2] == ["pvesh", "get"]:
+                return Mock(stdout="9001\n")
+            if args[:2] == ["qm", "template"] and len(calls) > 4:
+                raise subprocess.CalledProcessError(1, args)
+            return Mock(stdout="")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            disk = os.path.join(tmp, "jammy.img")
+            with open(disk, "wb") as f:
+                f.write(b"qcow2")
+            settings = {"memory": 1024, "cores": 1, "bridge": "vmbr1", "storage": "local",
+                        "staging_dir": os.path.join(tmp, "vz"), "format": ""}
+            volume_path = os.path.join(tmp, "vz", "images", "9001", "vm-9001-disk-0.qcow2")
+            backend = QmBackend(runner)
+            self.assertEqual(backend.create_template("jammy", disk, settings), 9001)
+            self.assertEqual(calls[2][:5], ["qm", "set", "9001", "--scsi0", "local:9001/vm-9001-disk-0.qcow2"])
+            with open(volume_path, "rb") as f:
+                self.assertEqual(f.read(), b"qcow2")
+
+            with self.assertRaises(subprocess.CalledProcessError):
+                backend.create_template("noble", disk, settings)
+            self.assertEqual(calls[-1], ["qm", "destroy", "9001", "--purge"])
+            self.assertFalse(os.path.exists(volume_path))
+
+    def test_template_exists(self):
+        '''Test existing names are read from qm list.'''
+        output = ("      VMID NAME                 STATUS     MEM(MB)    BOOTDISK(GB) PID\n"
+                  "      9000 jammy-20250101       stopped    2048               3.50 0\n")
+        backend = QmBackend(lambda args, **kwargs: Mock(stdout=output))
+        self.assertTrue(backend.template_exists("jammy-20250101"))
+        self.assertFalse(backend.template_exists("noble-20250101"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+'''Test cases for the staging module.'''
+import errno
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from prox_imager.staging import copy_methods, data_extents, stage_file
+
+
+MIB = 1024 * 1024
+
+
+def unsupported(*_args):
+    '''Copy method failing like copy_file_range across filesystems.'''
+    raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+
+class TestStaging(unittest.TestCase):
+    '''Test cases for stage_file and data_extents.'''
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, "image.img")
+        self.dest = os.path.join(self.tmp.name, "staged.img")
+        with open(self.src, "wb") as f:
+            f.write(b"head" * 1024)
+            f.seek(8 * MIB)
+            f.write(b"tail" * 1024)
+            f.truncate(16 * MIB)
+        with open(self.src, "rb") as f:
+            self.data = f.read()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_dest(self) -> bytes:
+        '''Returns the staged bytes.'''
+        with open(self.dest, "rb") as f:
+            return f.read()
+
+    def test_stage_sparse_file(self):
+        '''Test only the allocated extents are copied and the result is identical.'''
+        result = stage_file(self.src, self.dest)
+        self.assertEqual(self.read_dest(), self.data)
+        self.assertEqual(result["bytes"], 16 * MIB)
+        self.assertLess(result["copied"], 2 * MIB)
+        self.assertIn(result["method"], [name for name, _ in copy_methods()])
+        self.assertLess(os.stat(self.dest).st_blocks * 512, 2 * MIB)
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ["image.img", "staged.img"])
+
+    def test_fallback(self):
+        '''Test unsupported methods fall back to the next one, down to a read/write loop skipping zeros.'''
+        methods = [("copy_file_range", unsupported), ("sendfile", unsupported), copy_methods()[-1]]
+        with self.assertLogs("prox_imager.staging", level="WARNING") as logs:
+            result = stage_file(self.src, self.dest, methods)
+        self.assertEqual(len(logs.output), 2)
+        self.assertEqual(result["method"], "read_write")
+        self.assertEqual(self.read_dest(), self.data)
+        self.assertLess(result["copied"], 2 * MIB)
+
+    def test_without_seek_data(self):
+        '''Test the whole file is one extent when SEEK_DATA is not supported, and zeros still become holes.'''
+        with open(self.src, "rb") as f, \
+                patch("prox_imager.staging.os.lseek", side_effect=OSError(errno.EINVAL, "Invalid argument")):
+            self.assertEqual(list(data_extents(f.fileno(), 16 * MIB)), [(0, 16 * MIB)])
+        with patch("prox_imager.staging.data_extents", return_value=iter([(0, 16 * MIB)])):
+            result = stage_file(self.src, self.dest, copy_methods()[-1:])
+        self.assertEqual(self.read_dest(), self.data)
+        self.assertEqual(result["copied"], 2 * MIB)  # the two 1 MiB blocks holding data
+
+    def test_failure_leaves_dest_untouched(self):
+        '''Test a failing copy removes its temporary file and keeps the previous target.'''
+        with open(self.dest, "wb") as f:
+            f.write(b"old")
+
+        def broken(*_args):
+            raise OSError(errno.EIO, "Input/output error")
+        with self.assertRaises(OSError):
+            stage_file(self.src, self.dest, [("broken", broken), copy_methods()[-1]])
+        self.assertEqual(self.read_dest(), b"old")
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ["image.img", "staged.img"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+'''Test cases for the stream_index module and index-driven refreshes.'''
+import json
+import os
+import tempfile
+import unittest
+
+from prox_imager.fetch_ubuntu_images import fetch_sources_indexed
+from prox_imager.stream_index import IndexState, stream_updated
+from tests.http_server import LocalServer
+
+
+DAILY = "/streams/v1/com.ubuntu.cloud:daily:download.json"
+RELEASED = "/streams/v1/com.ubuntu.cloud:released:download.json"
+
+
+def stream(build_date: str) -> bytes:
+    '''Builds a products document with one jammy build.'''
+    items = {"disk1.img": {"path": f"server/jammy/{build_date}/jammy.img", "sha256": build_date}}
+    product = {"arch": "amd64", "release": "jammy", "version": "22.04",
+               "versions": {build_date: {"items": items}}}
+    return json.dumps({"products": {"com.ubuntu.cloud:server:22.04:amd64": product}}).encode()
+
+
+def index(daily: str, released: str) -> bytes:
+    '''Builds an index.json listing both streams with their updated values.'''
+    return json.dumps({"format": "index:1.0", "index": {
+        "com.ubuntu.cloud:daily:download": {"path": DAILY.lstrip("/"), "updated": daily},
+        "com.ubuntu.cloud:released:download": {"path": RELEASED.lstrip("/"), "updated": released},
+    }}).encode()
+
+
+class TestStreamIndex(unittest.TestCase):
+    '''Test cases for the index lookups and IndexState.'''
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.state_file = os.path.join(self.tmp.name, "state", "index.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_stream_updated(self):
+        '''Test streams are looked up by path, with or without the leading slash.'''
+        document = json.loads(index("Mon, 01 Sep 2025", "Tue, 02 Sep 2025"))
+        self.assertEqual(stream_updated(document, DAILY), "Mon, 01 Sep 2025")
+        self.assertEqual(stream_updated(document, RELEASED.lstrip("/")), "Tue, 02 Sep 2025")
+        self.assertIsNone(stream_updated(document, "/streams/v1/other.json"))
+        self.assertIsNone(stream_updated({}, DAILY))
+        self.assertIsNone(stream_updated({"index": []}, DAILY))
+
+    def test_state_round_trip(self):
+        '''Test stored images are only returned for the same updated value and extract key.'''
+        state = IndexState(self.state_file)
+        state.put("http://a/x.json", "key", "t1", {"p": {"sha256": "1"}})
+        state.save()
+
+        state = IndexState(self.state_file)
+        self.assertEqual(state.unchanged("http://a/x.json", "key", "t1"), {"p": {"sha256": "1"}})
+        self.assertIsNone(state.unchanged("http://a/x.json", "key", "t2"))
+        self.assertIsNone(state.unchanged("http://a/x.json", "other", "t1"))
+        self.assertIsNone(state.unchanged("http://a/x.json", "key", None))
+        self.assertIsNone(state.unchanged("http://a/y.json", "key", "t1"))
+
+    def test_corrupt_state(self):
+        '''Test an unreadable state file is treated as empty.'''
+        os.makedirs(os.path.dirname(self.state_file))
+        with open(self.state_file, "w", encoding="utf-8") as f:
+            f.write("{")
+        self.assertIsNone(IndexState(self.state_file).unchanged("http://a/x.json", "key", "t1"))
+
+    def test_fetch_sources_indexed(self):
+        '''Test only the streams updated since the last run are downloaded.'''
+        files = {"/streams/v1/index.json": index("t1", "t1"), DAILY: stream("20250901"),
+                 RELEASED: stream("20250801")}
+        with LocalServer(files) as server:
+            sources = [{"name": "daily", "base_url": server.url, "metadata_url": DAILY, "timeout": 5},
+                       {"name": "released", "base_url": server.url, "metadata_url": RELEASED, "timeout": 5}]
+
+            first = fetch_sources_indexed(sources, IndexState(self.state_file))
+            first_gets = [path for method, path, _, _ in server.requests if method == "GET"]
+            del server.requests[:]
+
+            files[DAILY] = stream("20250902")
+            files["/streams/v1/index.json"] = index("t2", "t1")
+            second = fetch_sources_indexed(sources, IndexState(self.state_file))
+            second_gets = [path for method, path, _, _ in server.requests if method == "GET"]
+
+        self.assertEqual(first_gets[0], "/streams/v1/index.json")
+        self.assertEqual(sorted(first_gets[1:]), sorted([DAILY, RELEASED]))  # fetched concurrently
+        self.assertEqual(second_gets, ["/streams/v1/index.json", DAILY])
+        self.assertEqual([name for name, _ in second], ["daily", "released"])
+        self.assertEqual(second[1], first[1])
+        self.assertEqual(second[0][1]["com.ubuntu.cloud:server:22.04:amd64"]["build_date"], "20250902")
+
+    def test_missing_index_fetches_everything(self):
+        '''Test sources are fetched as usual when the index is unavailable, and nothing is remembered.'''
+        with LocalServer({DAILY: stream("20250901")}) as server:
+            sources = [{"name": "daily", "base_url": server.url, "metadata_url": DAILY, "timeout": 5}]
+            state = IndexState(self.state_file)
+            results = fetch_sources_indexed(sources, state)
+        self.assertEqual(len(results[0][1]), 1)
+        self.assertFalse(os.path.exists(self.state_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
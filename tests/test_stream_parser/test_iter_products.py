@@ -0,0 +1,68 @@
+'''Test cases for the iter_products function in stream_parser module.'''
+import json
+import unittest
+
+from prox_imager.stream_parser import iter_object, iter_products
+
+
+def chunked(data: bytes, size: int):
+    '''Splits data into chunks of the given size.'''
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestIterProducts(unittest.TestCase):
+    '''Test cases for the iter_products function.'''
+
+    document = {
+        "content_id": "com.ubuntu.cloud:daily:download",
+        "format": "products:1.0",
+        "datatype": "image-downloads",
+        "_aliases": {"nested": [1, 2.5, True, None, "a}b"]},
+        "products": {
+            "p1": {"arch": "amd64", "release": "jammy",
+                   "versions": {"20250101": {"items": {"disk1.img": {"path": "/a\\\"b{c[.img"}}}}},
+            "pé 2": {"arch": "arm64", "versions": {}},
+        },
+        "updated": "Tue, 01 Apr 2025 00:00:00 +0000",
+    }
+
+    def test_iter_products_chunk_sizes(self):
+        '''Test iter_products yields every product whatever the chunk boundaries.'''
+        data = json.dumps(self.document, indent=2, ensure_ascii=False).encode("utf-8")
+        expected = list(self.document["products"].items())
+        for size in (1, 2, 7, 64, len(data)):
+            with self.subTest(size=size):
+                self.assertEqual(list(iter_products(chunked(data, size))), expected)
+
+    def test_iter_products_compact(self):
+        '''Test iter_products with a document without any whitespace.'''
+        data = json.dumps(self.document, separators=(",", ":")).encode("utf-8")
+        self.assertEqual(dict(iter_products([data])), self.document["products"])
+
+    def test_iter_products_empty(self):
+        '''Test iter_products with empty and missing products.'''
+        self.assertEqual(list(iter_products([b'{"products": {}}'])), [])
+        self.assertEqual(list(iter_products([b'{}'])), [])
+        self.assertEqual(list(iter_products([b'{"count": 3}'])), [])
+
+    def test_iter_products_truncated(self):
+        '''Test iter_products raises ValueError on a truncated document.'''
+        data = json.dumps(self.document).encode("utf-8")
+        with self.assertRaises(ValueError):
+            list(iter_products(chunked(data[:-20], 16)))
+
+    def test_iter_products_invalid(self):
+        '''Test iter_products raises ValueError on a document that is not an object.'''
+        with self.assertRaises(ValueError):
+            list(iter_products([b'[1, 2]']))
+
+    def test_iter_object(self):
+        '''Test iter_object yields every top-level member whatever the chunk boundaries.'''
+        data = json.dumps(self.document, indent=4).encode("utf-8")
+        for size in (3, len(data)):
+            with self.subTest(size=size):
+                self.assertEqual(list(iter_object(chunked(data, size))), list(self.document.items()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+'''Test cases for the hash_file function in verify module.'''
+import hashlib
+import os
+import tempfile
+import unittest
+
+from prox_imager.verify import hash_file
+
+
+class TestHashFile(unittest.TestCase):
+    '''Test cases for the hash_file function.'''
+
+    def test_hash_file(self):
+        '''Test hash_file matches hashlib for several chunk sizes.'''
+        data = os.urandom(100_003)
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(data)
+            f.flush()
+            for chunk_size in (1024, 65536, 1 << 20):
+                with self.subTest(chunk_size=chunk_size):
+                    self.assertEqual(hash_file(f.name, chunk_size), hashlib.sha256(data).hexdigest())
+
+    def test_hash_empty_file(self):
+        '''Test hash_file with an empty file.'''
+        with tempfile.NamedTemporaryFile() as f:
+            self.assertEqual(hash_file(f.name), hashlib.sha256(b"").hexdigest())
+
+
+if __name__ == '__main__':
+    unittest.main()
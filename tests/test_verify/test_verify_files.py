@@ -0,0 +1,80 @@
+'''Test cases for the verify_files and verify_images functions in verify module.'''
+import hashlib
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from prox_imager.verify import HashCache, verify_files, verify_images
+
+
+class TestVerifyFiles(unittest.TestCase):
+    '''Test cases for the verify_files function.'''
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.files = {}
+        for name in ("a.img", "b.img", "c.img"):
+            path = os.path.join(self.tmp.name, name)
+            data = name.encode() * 1000
+            with open(path, "wb") as f:
+                f.write(data)
+            self.files[path] = hashlib.sha256(data).hexdigest()
+        self.cache_file = os.path.join(self.tmp.name, "cache", "hashes.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_verify_files(self):
+        '''Test matching, mismatching and missing files.'''
+        expected = dict(self.files)
+        bad = os.path.join(self.tmp.name, "b.img")
+        expected[bad] = "0" * 64
+        missing = os.path.join(self.tmp.name, "missing.img")
+        expected[missing] = "0" * 64
+        results = verify_files(expected, workers=2)
+        self.assertEqual(results, {os.path.join(self.tmp.name, "a.img"): True, bad: False,
+                                   os.path.join(self.tmp.name, "c.img"): True, missing: False})
+
+    def test_verify_files_unreadable(self):
+        '''Test a directory or missing path fails alone, and is logged once.'''
+        expected = dict(self.files)
+        directory = os.path.join(self.tmp.name, "cache")
+        os.makedirs(directory)
+        expected[directory] = "0" * 64
+        missing = os.path.join(self.tmp.name, "missing.img")
+        expected[missing] = "0" * 64
+        with self.assertLogs("prox_imager.verify", level="INFO") as logs:
+            results = verify_files(expected, workers=2)
+        self.assertEqual(results, {**{path: True for path in self.files}, directory: False, missing: False})
+        self.assertEqual(len([line for line in logs.output if "missing.img" in line]), 1)
+        self.assertFalse([line for line in logs.output if "mismatch" in line])
+
+    def test_verify_files_uses_cache(self):
+        '''Test unchanged files are not rehashed once cached.'''
+        self.assertTrue(all(verify_files(self.files, HashCache(self.cache_file), workers=2).values()))
+        with patch("prox_imager.verify.hash_file") as mock_hash_file:
+            results = verify_files(self.files, HashCache(self.cache_file))
+        mock_hash_file.assert_not_called()
+        self.assertTrue(all(results.values()))
+
+    def test_verify_files_detects_change(self):
+        '''Test a modified file is rehashed even if it is cached.'''
+        verify_files(self.files, HashCache(self.cache_file), workers=2)
+        path = os.path.join(self.tmp.name, "a.img")
+        with open(path, "ab") as f:
+            f.write(b"tampered")
+        results = verify_files(self.files, HashCache(self.cache_file), workers=2)
+        self.assertFalse(results[path])
+
+    def test_verify_images(self):
+        '''Test verify_images maps products to their verification result.'''
+        images = {
+            "good": {"image_url": "http://x/a.img", "sha256": self.files[os.path.join(self.tmp.name, "a.img")]},
+            "missing": {"image_url": "http://x/z.img", "sha256": "0" * 64},
+        }
+        self.assertEqual(verify_images(images, self.tmp.name), {"good": True, "missing": False})
+
+
+if __name__ == '__main__':
+    unittest.main()